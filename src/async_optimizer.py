@@ -0,0 +1,172 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit
+from src.cost_models import get_cost_model
+from src.functions import with_fanout_cnots, without_fanout_cnots
+from src.optimizer import _init_worker, _optimize_chain, _optimize_chain_in_worker, _plan_chains
+from src.stats import OptimizerStats
+from src.transposition_cache import TranspositionCache
+
+def _start_circuit(circuit, backend):
+    """Returns the circuit the chains of backend start from"""
+    return with_fanout_cnots(circuit) if backend == 'cirq' else CompactCircuit.from_circuit(circuit)
+
+def _to_circuit(circuit, input_circuit):
+    """Returns a chain result as a cirq.Circuit that is not the input circuit"""
+    if isinstance(circuit, CompactCircuit):
+        return circuit.to_circuit()
+    circuit = without_fanout_cnots(circuit)
+    return circuit.copy() if circuit is input_circuit else circuit
+
+async def _chain_results(circuit, initial_probs, transition_probs, n_iter, n_opt_circuits, n_workers, seed, backend,
+                         time_budget, grace, return_stats, detect_fixed_point, patience, precheck, reweight, cache_size,
+                         temperature, cooling, registry, cost):
+    """Optimizes the chains of optimize in an executor and yields (chain, opt_circuit, stats)
+    for each chain as soon as it finishes. With n_workers == 1 the chains run one after the
+    other in a thread, and with n_workers > 1 in a process pool. At the deadline the chains
+    stop after their current transformer and return the best circuit they visited, and chains
+    that have not returned grace seconds later are dropped. If the consumer stops iterating or
+    is cancelled, the chains that have not started are cancelled and the running ones are told
+    to stop.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.time() + time_budget if time_budget is not None else None
+    # drawing the schedules of long chains takes a while, so it does not run in the event loop either
+    registry, seeds, schedules, reweight_probs = await loop.run_in_executor(
+        None, _plan_chains, initial_probs, transition_probs, n_iter, n_opt_circuits, seed, backend, reweight,
+        cache_size, temperature, registry)
+    stop_event = threading.Event()
+    if n_workers == 1:
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        compact_circuit = await loop.run_in_executor(None, CompactCircuit.from_circuit, circuit)
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                       initargs=(compact_circuit, backend, cache_size, registry))
+    futures = {}
+    try:
+        if n_workers == 1:
+            start_circuit = await loop.run_in_executor(executor, _start_circuit, circuit, backend)
+            cache = TranspositionCache(cache_size) if cache_size else None
+
+            def run_chain(schedule, chain_seed):
+                stats = OptimizerStats() if return_stats else None
+                opt_circuit = _optimize_chain(start_circuit, schedule, chain_seed, backend, registry, stats,
+                                              detect_fixed_point, patience, deadline, precheck, reweight_probs, cache,
+                                              temperature, cooling, stop_event, cost)
+                return opt_circuit, stats
+
+            for chain, (schedule, chain_seed) in enumerate(zip(schedules, seeds)):
+                futures[loop.run_in_executor(executor, run_chain, schedule, chain_seed)] = chain
+        else:
+            for chain, (schedule, chain_seed) in enumerate(zip(schedules, seeds)):
+                futures[loop.run_in_executor(executor, _optimize_chain_in_worker,
+                                             (schedule, chain_seed, backend, return_stats, detect_fixed_point,
+                                              patience, deadline, precheck, reweight_probs, temperature,
+                                              cooling, cost))] = chain
+
+        pending = set(futures)
+        while pending:
+            timeout = None if deadline is None else max(deadline + grace - time.time(), 0)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in sorted(done, key=lambda future: futures[future]):
+                opt_circuit, stats = future.result()
+                yield futures[future], opt_circuit, stats
+    finally:
+        stop_event.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def optimize_progressively(circuit, initial_probs, transition_probs, n_iter=50, n_opt_circuits=20, n_workers=1,
+                                 seed=None, backend='cirq', time_budget=None, grace=0.5, detect_fixed_point=True,
+                                 patience=None, precheck=True, reweight=False, cache_size=0, temperature=None,
+                                 cooling=0.95, registry=None, cost=None):
+    """Asynchronous version of optimize that yields every circuit that is shorter (cheaper
+    according to cost) than the ones yielded before as soon as the chain that found it finishes, so a caller can use an
+    improved circuit while the other chains are still running. The chains run in an
+    executor and do not block the event loop. See optimize_async for the arguments.
+
+    Yields:
+        chain (int): index of the chain that found the circuit
+        opt_circuit (cirq.Circuit): the shortest (cheapest) circuit found so far
+    """
+    cost = get_cost_model(cost, picklable=n_workers != 1)
+    best_cost = None
+    results = _chain_results(circuit, initial_probs, transition_probs, n_iter, n_opt_circuits, n_workers, seed, backend,
+                             time_budget, grace, False, detect_fixed_point, patience, precheck, reweight, cache_size,
+                             temperature, cooling, registry, cost)
+    try:
+        async for chain, opt_circuit, _ in results:
+            opt_cost = cost(opt_circuit)
+            if best_cost is None or opt_cost < best_cost:
+                best_cost = opt_cost
+                yield chain, await asyncio.get_running_loop().run_in_executor(None, _to_circuit, opt_circuit, circuit)
+    finally:
+        await results.aclose()
+
+async def optimize_async(circuit, initial_probs, transition_probs, n_iter=50, n_opt_circuits=20, n_workers=1,
+                         seed=None, backend='cirq', time_budget=None, grace=0.5, return_stats=False,
+                         detect_fixed_point=True, patience=None, precheck=True, reweight=False, cache_size=0,
+                         temperature=None, cooling=0.95, registry=None, cost=None):
+    """Asynchronous version of optimize for event loops. The chains run in an executor, so
+    the event loop is not blocked, and without a deadline the result is the same as the
+    result of optimize with the same arguments. Cancelling the awaiting task cancels the
+    chains that have not started and stops the running ones at their next transformer, for
+    n_workers == 1 immediately and for n_workers > 1 at the end of the chain or the deadline.
+
+    Args:
+        circuit (cirq.Circuit): circuit that is optimized
+        initial_probs, transition_probs, n_iter, n_opt_circuits, seed, backend, return_stats,
+        detect_fixed_point, patience, precheck, reweight, cache_size, temperature, cooling,
+        registry, cost: the arguments of optimize
+        n_workers (int): 1 runs the chains one after the other in a thread and more runs
+                         them in a process pool of that many processes
+        time_budget (float): if given, the chains stop this many seconds after the call and
+                             the best circuit found so far is returned instead of an error.
+                             The input circuit is returned if no chain has finished.
+        grace (float): how many seconds after the deadline the running chains get to return
+                       the best circuit they visited before they are dropped
+
+    Returns:
+        best_opt_circuit (cirq.Circuit): the shortest (cheapest) optimized circuit
+        stats (OptimizerStats): statistics of the finished chains in chain order, only returned if
+                                return_stats is True
+    """
+    start_time = time.perf_counter()
+    cost = get_cost_model(cost, picklable=n_workers != 1)
+    chain_stats = {}
+    best_chain, best_opt_circuit, best_cost = None, None, None
+    results = _chain_results(circuit, initial_probs, transition_probs, n_iter, n_opt_circuits, n_workers, seed, backend,
+                             time_budget, grace, return_stats, detect_fixed_point, patience, precheck, reweight,
+                             cache_size, temperature, cooling, registry, cost)
+    try:
+        async for chain, opt_circuit, stats in results:
+            # ties go to the lowest chain like in optimize, whatever the order in which the chains finish
+            opt_cost = cost(opt_circuit)
+            if best_opt_circuit is None or (opt_cost, chain) < (best_cost, best_chain):
+                best_chain, best_opt_circuit, best_cost = chain, opt_circuit, opt_cost
+            if return_stats:
+                chain_stats[chain] = stats
+    finally:
+        await results.aclose()
+
+    best_opt_circuit = circuit if best_opt_circuit is None else best_opt_circuit
+    best_opt_circuit = await asyncio.get_running_loop().run_in_executor(None, _to_circuit, best_opt_circuit, circuit)
+    if not return_stats:
+        return best_opt_circuit
+
+    # the chains finish in any order, so they are merged in chain order like in optimize and
+    # best_chain is the position of the returned chain among the finished ones
+    stats = OptimizerStats()
+    finished_chains = sorted(chain_stats)
+    for chain in finished_chains:
+        stats.merge(chain_stats[chain])
+    stats.best_chain = None if best_chain is None else finished_chains.index(best_chain)
+    stats.time_s = time.perf_counter() - start_time
+    return best_opt_circuit, stats
@@ -0,0 +1,100 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit
+from src.cost_models import get_cost_model
+from src.optimizer import optimize
+
+def _circuit_seed(seed, circuit_ind):
+    """Returns the optimize seed of the circuit_ind-th circuit of the stream"""
+    return None if seed is None else seed * 1000003 + circuit_ind
+
+def _optimize_in_worker(args):
+    """Optimizes one circuit of the stream in a worker process. The circuits are sent
+    between the processes as CompactCircuits, which are smaller to pickle.
+    """
+    compact_circuit, initial_probs, transition_probs, seed, return_stats, optimize_kwargs = args
+    result = optimize(compact_circuit.to_circuit(), initial_probs, transition_probs, seed=seed,
+                      return_stats=return_stats, **optimize_kwargs)
+    opt_circuit, stats = result if return_stats else (result, None)
+    return CompactCircuit.from_circuit(opt_circuit), stats
+
+def optimize_many(circuits, initial_probs, transition_probs, n_workers=1, window=None, ordered=True, seed=None,
+                  return_stats=True, **optimize_kwargs):
+    """Optimizes a stream of circuits with optimize and yields the results lazily. The
+    circuits are read from the iterable only when there is room for them, so at most
+    window circuits are being optimized or waiting to be yielded at any time and memory
+    does not grow with the number of circuits.
+
+    Args:
+        circuits (iterable(cirq.Circuit)): circuits that are optimized, for example a generator
+        initial_probs (lis(float)): initial_probs argument of optimize
+        transition_probs (lis(lis(float))): transition_probs argument of optimize
+        n_workers (int): how many processes optimize circuits in parallel. 1 optimizes them
+                         one at a time in the calling process and None uses all available cores.
+                         The copies of a single circuit are optimized in the same process.
+        window (int): at most how many circuits are in flight with n_workers > 1,
+                      twice the number of workers if None
+        ordered (bool): if True the results are yielded in the order of the circuits, otherwise
+                        in the order in which they are finished
+        seed (int): seed from which each circuit gets its own optimize seed. With the same seed
+                    the results are the same regardless of n_workers and window.
+        return_stats (bool): if True the OptimizerStats of each circuit are yielded with it
+        optimize_kwargs: other arguments of optimize, for example n_iter, n_opt_circuits
+                         and backend
+
+    Yields:
+        circuit_ind (int): position of the circuit in the stream
+        opt_circuit (cirq.Circuit): the optimized circuit
+        stats (OptimizerStats): statistics of the circuit, None if return_stats is False
+    """
+    if window is not None and window < 1:
+        raise ValueError(f"window must be positive, got {window}")
+
+    if n_workers == 1:
+        for circuit_ind, circuit in enumerate(circuits):
+            result = optimize(circuit, initial_probs, transition_probs, seed=_circuit_seed(seed, circuit_ind),
+                              return_stats=return_stats, **optimize_kwargs)
+            opt_circuit, stats = result if return_stats else (result, None)
+            yield circuit_ind, opt_circuit, stats
+        return
+
+    if optimize_kwargs.get('cost') is not None:
+        # the cost model is sent to the worker processes with each circuit
+        get_cost_model(optimize_kwargs['cost'], picklable=True)
+    if window is None:
+        window = 2 * (n_workers or os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=n_workers)
+    # futures in submission order, each with the position of its circuit
+    in_flight = deque()
+    try:
+        circuit_iter = enumerate(circuits)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < window:
+                next_circuit = next(circuit_iter, None)
+                if next_circuit is None:
+                    exhausted = True
+                    break
+                circuit_ind, circuit = next_circuit
+                future = executor.submit(_optimize_in_worker, (
+                    CompactCircuit.from_circuit(circuit), initial_probs, transition_probs,
+                    _circuit_seed(seed, circuit_ind), return_stats, optimize_kwargs))
+                in_flight.append((circuit_ind, future))
+
+            if not in_flight:
+                break
+            if ordered:
+                circuit_ind, future = in_flight.popleft()
+            else:
+                done, _ = wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+                circuit_ind, future = next((circuit_ind, future) for circuit_ind, future in in_flight
+                                           if future in done)
+                in_flight.remove((circuit_ind, future))
+
+            compact_circuit, stats = future.result()
+            yield circuit_ind, compact_circuit.to_circuit(), stats
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,119 @@
+import sys
+import time
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit
+from src.cost_models import get_cost_model
+from src.functions import circuit_fingerprint, n_operations, with_fanout_cnots, without_fanout_cnots
+from src.optimizer import _count_matches
+from src.registry import DEFAULT_REGISTRY
+from src.stats import OptimizerStats
+from src.wire_index import WireIndex
+
+# backends whose transformers return a new circuit, so one circuit can be expanded by all of them
+_BEAM_SEARCH_BACKENDS = ('cirq', 'compact')
+
+def _expand(state, backend, registry, precheck, seen, stats):
+    """Applies every transformer of registry to state and returns the results not seen
+    before. With precheck the transformers without matches are skipped.
+    """
+    function_list = registry.function_list(backend)
+    match_counter_list = registry.match_counter_list(backend)
+    wire_index = WireIndex(state) if precheck and backend == 'cirq' else None
+    children = []
+    for function, match_counter in zip(function_list, match_counter_list):
+        if precheck and _count_matches(match_counter, state, wire_index) == 0:
+            if stats is not None:
+                stats.skip(function, state)
+            continue
+
+        child = function(state) if stats is None else stats.apply(function, state)
+        fingerprint = circuit_fingerprint(child)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            children.append(child)
+
+    return children
+
+def beam_search(circuit, beam_width=4, depth=30, backend='cirq', return_stats=False, precheck=True,
+                time_budget=None, registry=None, cost=None):
+    """Cirq circuit optimizer that searches the sequences of circuit identities breadth first
+    instead of choosing them randomly. At each step every transformer is applied to each
+    circuit of the beam, and the beam_width shortest (cheapest according to cost) circuits
+    that were not seen at an earlier step form the next beam. The search stops after depth
+    steps or when no new circuits are found and outputs the shortest circuit seen.
+
+    Args:
+        circuit (cirq.Circuit): circuit that is optimized
+        beam_width (int): how many circuits are kept at each step
+        depth (int): at most how many steps are taken
+        backend (str): 'cirq' applies the transformers of src/transformers.py and 'compact'
+                       converts the circuit once to a CompactCircuit and applies the
+                       transformers of src/compact_transformers.py
+        return_stats (bool): if True every transformer call is recorded and returned.
+                             The chain lengths hold the length after each call in the
+                             order of the calls.
+        precheck (bool): if True the matches of a transformer are counted before it is
+                         applied and it is skipped if there are none
+        time_budget (float): if given, no step is started after this many seconds
+        registry (TransformerRegistry): identities that are applied, the six identities of
+                                        the problem description (src/registry.py) if None
+        cost (str, CostModel or function): cost argument of optimize
+
+    Returns:
+        best_opt_circuit (cirq.Circuit): the shortest (cheapest) optimized circuit
+        stats (OptimizerStats): statistics of the run, only returned if return_stats is True
+    """
+    registry = DEFAULT_REGISTRY if registry is None else registry
+    if backend not in _BEAM_SEARCH_BACKENDS or backend not in registry.backends:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of "
+                         f"{[backend for backend in _BEAM_SEARCH_BACKENDS if backend in registry.backends]}")
+    if beam_width < 1:
+        raise ValueError(f"beam_width must be positive, got {beam_width}")
+
+    start_time = time.perf_counter()
+    cost = get_cost_model(cost)
+    deadline = time.time() + time_budget if time_budget is not None else None
+    stats = OptimizerStats() if return_stats else None
+    start_circuit = with_fanout_cnots(circuit) if backend == 'cirq' else CompactCircuit.from_circuit(circuit)
+    if stats is not None:
+        stats.start_chain(start_circuit)
+
+    # circuits are ranked by cost and then by number of operations
+    def rank(state):
+        return cost(state), n_operations(state)
+
+    seen = {circuit_fingerprint(start_circuit)}
+    beam = [start_circuit]
+    best_opt_circuit = start_circuit
+    stop_reason = 'depth'
+    for step in range(depth):
+        if deadline is not None and time.time() >= deadline:
+            stop_reason = 'time_budget'
+            break
+
+        candidates = []
+        for state in beam:
+            candidates.extend(_expand(state, backend, registry, precheck, seen, stats))
+        if not candidates:
+            stop_reason = 'fixed_point'
+            break
+
+        # sorted is stable, so circuits of the same rank keep the order of the transformers
+        beam = sorted(candidates, key=rank)[:beam_width]
+        if rank(beam[0]) < rank(best_opt_circuit):
+            best_opt_circuit = beam[0]
+
+    if isinstance(best_opt_circuit, CompactCircuit):
+        best_opt_circuit = best_opt_circuit.to_circuit()
+    else:
+        best_opt_circuit = without_fanout_cnots(best_opt_circuit)
+        if best_opt_circuit is circuit:
+            best_opt_circuit = circuit.copy()
+
+    if stats is None:
+        return best_opt_circuit
+
+    stats.stop_reasons.append(stop_reason)
+    stats.best_chain = 0
+    stats.time_s = time.perf_counter() - start_time
+    return best_opt_circuit, stats
@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import sys
+import time
+import tracemalloc
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit
+from src.functions import flat_probs_to_matrix
+from src.beam_search import beam_search
+from src.optimizer import optimize, _BACKEND_FUNCTION_LISTS
+from src.random_circuit_generator import create_random_circuits
+from src.registry import DEFAULT_REGISTRY
+from src.worklist_engine import WorklistEngine
+
+_FIELDS = ['backend', 'n_qubits', 'n_templates', 'name', 'time_s', 'peak_memory_bytes',
+           'input_length', 'output_length']
+# fields of the results of compare_strategies
+_STRATEGY_FIELDS = ['n_qubits', 'n_templates', 'strategy', 'time_s', 'transformer_calls', 'input_length',
+                    'output_length']
+
+def _circuit_seed(seed, n_qubits, n_templates):
+    """Returns the seed used for creating the circuit of one grid point"""
+    return seed * 1000003 + n_qubits * 1009 + n_templates
+
+def _measure(function, argument, n_repeats):
+    """Runs function(argument) n_repeats times and once more with tracemalloc on.
+
+    Returns:
+        result: return value of the last call
+        best_time (float): shortest wall time in seconds
+        peak_memory (int): peak memory allocated during the call in bytes
+    """
+    best_time = float('inf')
+    for i in range(n_repeats):
+        start_time = time.perf_counter()
+        result = function(argument)
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    function(argument)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best_time, peak_memory
+
+def benchmark_grid(n_qubits_list, n_templates_list, seed=0, n_repeats=3, n_iter=50, n_opt_circuits=20,
+                   backend='cirq'):
+    """Times each transformer and the optimizer on a random circuit for every
+    combination of qubit count and template count.
+
+    Args:
+        n_qubits_list (list(int)): qubit counts of the circuits
+        n_templates_list (list(int)): template counts of the circuits
+        seed (int): seed from which the circuits and the optimizer seeds are derived
+        n_repeats (int): the shortest time of this many runs is recorded
+        n_iter (int): n_iter argument of optimize
+        n_opt_circuits (int): n_opt_circuits argument of optimize
+        backend (str): backend whose transformers are timed and that optimize uses
+
+    Returns:
+        results (list(dict)): one record per grid point and transformer/optimizer
+                              with the keys listed in _FIELDS
+    """
+    if n_repeats < 1:
+        raise ValueError(f"n_repeats must be at least 1, got {n_repeats}")
+    initial_probs = [1 for i in range(6)]
+    transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+    results = []
+    for n_qubits in n_qubits_list:
+        for n_templates in n_templates_list:
+            circuit_seed = _circuit_seed(seed, n_qubits, n_templates)
+            circuit = next(create_random_circuits(n_qubits, n_templates, seed=circuit_seed))
+            transformer_input = circuit if backend == 'cirq' else CompactCircuit.from_circuit(circuit)
+            functions = list(zip(DEFAULT_REGISTRY.names, _BACKEND_FUNCTION_LISTS[backend]))
+            if backend == 'worklist':
+                # the engine rewrites in place, so every run starts a new engine with all operations on its worklists
+                functions = [(name, lambda circuit, transformer=transformer: transformer(WorklistEngine(circuit)))
+                             for name, transformer in functions]
+            functions.append(('optimize', lambda circuit: optimize(circuit, initial_probs, transition_probs,
+                                                                   n_iter=n_iter, n_opt_circuits=n_opt_circuits,
+                                                                   seed=circuit_seed, backend=backend)))
+            for name, function in functions:
+                argument = circuit if name == 'optimize' else transformer_input
+                output, best_time, peak_memory = _measure(function, argument, n_repeats)
+                results.append({
+                    'backend': backend,
+                    'n_qubits': n_qubits,
+                    'n_templates': n_templates,
+                    'name': name,
+                    'time_s': best_time,
+                    'peak_memory_bytes': peak_memory,
+                    'input_length': len(circuit),
+                    'output_length': len(output)
+                })
+
+    return results
+
+def compare_strategies(n_qubits_list, n_templates_list, seed=0, n_circuits=3, n_iter=50, n_opt_circuits=20,
+                       beam_width=4, depth=30, backend='compact'):
+    """Compares the random chains of optimize with beam_search on random circuits for every
+    combination of qubit count and template count.
+
+    Args:
+        n_qubits_list (list(int)): qubit counts of the circuits
+        n_templates_list (list(int)): template counts of the circuits
+        seed (int): seed from which the circuits and the optimizer seeds are derived
+        n_circuits (int): how many circuits are optimized per grid point
+        n_iter (int): n_iter argument of optimize
+        n_opt_circuits (int): n_opt_circuits argument of optimize
+        beam_width (int): beam_width argument of beam_search
+        depth (int): depth argument of beam_search
+        backend (str): backend both strategies use
+
+    Returns:
+        results (list(dict)): one record per grid point and strategy with the keys n_qubits,
+                              n_templates, strategy, time_s, transformer_calls, input_length
+                              and output_length, where the last four are summed over the circuits
+    """
+    initial_probs = [1 for i in range(6)]
+    transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+    results = []
+    for n_qubits in n_qubits_list:
+        for n_templates in n_templates_list:
+            circuit_seed = _circuit_seed(seed, n_qubits, n_templates)
+            circuits = list(create_random_circuits(n_qubits, n_templates, n_circuits=n_circuits, seed=circuit_seed))
+            strategies = [
+                ('random', lambda circuit: optimize(circuit, initial_probs, transition_probs, n_iter=n_iter,
+                                                    n_opt_circuits=n_opt_circuits, seed=circuit_seed,
+                                                    backend=backend, return_stats=True)),
+                ('beam', lambda circuit: beam_search(circuit, beam_width=beam_width, depth=depth, backend=backend,
+                                                    return_stats=True))
+            ]
+            for strategy, function in strategies:
+                result = {'n_qubits': n_qubits, 'n_templates': n_templates, 'strategy': strategy, 'time_s': 0.0,
+                          'transformer_calls': 0, 'input_length': 0, 'output_length': 0}
+                for circuit in circuits:
+                    start_time = time.perf_counter()
+                    opt_circuit, stats = function(circuit)
+                    result['time_s'] += time.perf_counter() - start_time
+                    result['transformer_calls'] += sum(transformer_stats.n_calls
+                                                       for transformer_stats in stats.transformers.values())
+                    result['input_length'] += len(circuit)
+                    result['output_length'] += len(opt_circuit)
+                results.append(result)
+
+    return results
+
+def write_results(results, path):
+    """Writes the results of benchmark_grid or compare_strategies to a .json or a .csv file"""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            fields = _STRATEGY_FIELDS if results and 'strategy' in results[0] else _FIELDS
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+def load_results(path):
+    """Reads results written by write_results"""
+    if not path.endswith('.csv'):
+        with open(path) as file:
+            return json.load(file)
+
+    with open(path, newline='') as file:
+        results = list(csv.DictReader(file))
+
+    for result in results:
+        for field in ('n_qubits', 'n_templates', 'peak_memory_bytes', 'transformer_calls', 'input_length',
+                      'output_length'):
+            if field in result:
+                result[field] = int(result[field])
+        result['time_s'] = float(result['time_s'])
+
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """Finds the results that are slower or use more memory than the baseline.
+
+    Args:
+        results (list(dict)): results of benchmark_grid
+        baseline (list(dict)): earlier results of benchmark_grid
+        tolerance (float): allowed relative increase of time and peak memory
+
+    Returns:
+        regressions (list(dict)): one record per regressed metric with the keys
+                                  backend, n_qubits, n_templates, name, metric,
+                                  baseline, value and ratio
+    """
+    def record_key(result):
+        return result['backend'], result['n_qubits'], result['n_templates'], result['name']
+
+    baseline_by_key = {record_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_by_key.get(record_key(result))
+        if baseline_result is None:
+            continue
+
+        for metric in ('time_s', 'peak_memory_bytes'):
+            if baseline_result[metric] > 0 and result[metric] > (1 + tolerance) * baseline_result[metric]:
+                regressions.append({
+                    'backend': result['backend'],
+                    'n_qubits': result['n_qubits'],
+                    'n_templates': result['n_templates'],
+                    'name': result['name'],
+                    'metric': metric,
+                    'baseline': baseline_result[metric],
+                    'value': result[metric],
+                    'ratio': result[metric] / baseline_result[metric]
+                })
+
+    return regressions
+
+def main(argv=None):
+    """Command line entry point, returns 1 if regressions were found and 0 otherwise"""
+    parser = argparse.ArgumentParser(description='Benchmark the transformers and the optimizer.')
+    parser.add_argument('--n-qubits', type=int, nargs='+', default=[3, 5, 7])
+    parser.add_argument('--n-templates', type=int, nargs='+', default=[10, 40, 70])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--n-iter', type=int, default=50)
+    parser.add_argument('--n-opt-circuits', type=int, default=20)
+    parser.add_argument('--backend', choices=list(_BACKEND_FUNCTION_LISTS), default='cirq')
+    parser.add_argument('--output', help='file (.json or .csv) the results are written to')
+    parser.add_argument('--baseline', help='earlier results (.json or .csv) to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative increase of time and memory compared to the baseline')
+    parser.add_argument('--compare-strategies', action='store_true',
+                        help='compare the random chains of optimize with beam_search instead')
+    parser.add_argument('--n-circuits', type=int, default=3)
+    parser.add_argument('--beam-width', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=30)
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    if args.compare_strategies and args.baseline is not None:
+        parser.error("--baseline can not be used with --compare-strategies")
+
+    if args.compare_strategies:
+        results = compare_strategies(args.n_qubits, args.n_templates, seed=args.seed, n_circuits=args.n_circuits,
+                                     n_iter=args.n_iter, n_opt_circuits=args.n_opt_circuits,
+                                     beam_width=args.beam_width, depth=args.depth, backend=args.backend)
+        for result in results:
+            print(f"{result['n_qubits']:>4} qubits {result['n_templates']:>6} templates  {result['strategy']:<8}"
+                  f"{result['time_s']:>10.4f} s {result['transformer_calls']:>8} calls "
+                  f"{result['input_length']:>8} -> {result['output_length']:>8} moments")
+        if args.output:
+            write_results(results, args.output)
+        return 0
+
+    results = benchmark_grid(args.n_qubits, args.n_templates, seed=args.seed, n_repeats=args.repeats,
+                             n_iter=args.n_iter, n_opt_circuits=args.n_opt_circuits, backend=args.backend)
+    for result in results:
+        print(f"{result['n_qubits']:>4} qubits {result['n_templates']:>6} templates  {result['name']:<52}"
+              f"{result['time_s']:>10.4f} s {result['peak_memory_bytes'] / 2**20:>9.2f} MiB")
+
+    if args.output:
+        write_results(results, args.output)
+
+    if args.baseline is None:
+        return 0
+
+    regressions = compare_to_baseline(results, load_results(args.baseline), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']} ({regression['n_qubits']} qubits, "
+              f"{regression['n_templates']} templates): {regression['metric']} "
+              f"{regression['baseline']:.4g} -> {regression['value']:.4g} ({regression['ratio']:.2f}x)")
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import sys
+import cirq
+import numpy as np
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit, GateKind
+
+_MAGIC = b'CQOPTBIN'
+_VERSION = 1
+# magic, version, padding, number of circuits, operations, qubit incidences and qubits
+_HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('padding', '<u4'), ('n_circuits', '<u8'),
+                          ('n_ops', '<u8'), ('n_incs', '<u8'), ('n_qubits', '<u8')])
+# the sections that follow the header in this order, each padded to a multiple of 8 bytes:
+# name, dtype and the header field that gives its length
+_SECTIONS = [
+    ('circuit_op_start', '<i8', 'n_circuits+1'),
+    ('circuit_inc_start', '<i8', 'n_circuits+1'),
+    ('circuit_qubit_start', '<i8', 'n_circuits+1'),
+    ('n_moments', '<i8', 'n_circuits'),
+    ('qubits', '<i8', 'n_qubits'),
+    ('moment', '<u4', 'n_ops'),
+    ('kind', '<u1', 'n_ops'),
+    ('qubit_count', '<u2', 'n_ops'),
+    ('qubit_ind', '<u2', 'n_incs')
+]
+
+def _section_length(header, length_field):
+    """Returns the number of entries of a section from the header"""
+    if length_field == 'n_circuits+1':
+        return int(header['n_circuits']) + 1
+    return int(header[length_field])
+
+def _packed_circuit(circuit):
+    """Returns the arrays a circuit is stored with: LineQubit indices of its qubits, number of
+    moments, and moment index, GateKind, qubit count and qubit indices of its operations
+    """
+    compact_circuit = circuit if isinstance(circuit, CompactCircuit) else CompactCircuit.from_circuit(circuit)
+    if not all(isinstance(qubit, cirq.LineQubit) for qubit in compact_circuit.qubits):
+        raise ValueError("Only circuits on cirq.LineQubits can be written")
+    if len(compact_circuit.qubits) > 2**16:
+        raise ValueError(f"Circuits with more than {2**16} qubits can not be written")
+    ops, moment_inds, qubit_counts, qubit_inds = compact_circuit.packed_operations()
+    kind = compact_circuit.kind[ops]
+    if (kind == int(GateKind.OTHER)).any():
+        raise ValueError("Only circuits of H, CNOT and multi-target CNOT gates can be written")
+    qubits = np.array([qubit.x for qubit in compact_circuit.qubits], dtype=np.int64)
+    return qubits, len(compact_circuit), moment_inds, kind, qubit_counts, qubit_inds
+
+def write_circuits(path, circuits):
+    """Writes circuits of H, CNOT and multi-target CNOT gates on LineQubits to a binary file.
+    The file holds packed arrays of the moment index, gate kind, qubit count and qubit
+    indices of all operations of all circuits, which read_circuits maps into memory.
+
+    Args:
+        path (str): path of the file
+        circuits (iterable(cirq.Circuit or CompactCircuit)): circuits that are written
+    """
+    packed_circuits = [_packed_circuit(circuit) for circuit in circuits]
+    arrays = {
+        'circuit_op_start': np.cumsum([0] + [len(packed[2]) for packed in packed_circuits]),
+        'circuit_inc_start': np.cumsum([0] + [len(packed[5]) for packed in packed_circuits]),
+        'circuit_qubit_start': np.cumsum([0] + [len(packed[0]) for packed in packed_circuits]),
+        'n_moments': np.array([packed[1] for packed in packed_circuits]),
+    }
+    for name, position in (('qubits', 0), ('moment', 2), ('kind', 3), ('qubit_count', 4), ('qubit_ind', 5)):
+        arrays[name] = np.concatenate([packed[position] for packed in packed_circuits]) if packed_circuits else []
+
+    header = np.zeros(1, dtype=_HEADER_DTYPE)
+    header['magic'] = _MAGIC
+    header['version'] = _VERSION
+    header['n_circuits'] = len(packed_circuits)
+    header['n_ops'] = len(arrays['moment'])
+    header['n_incs'] = len(arrays['qubit_ind'])
+    header['n_qubits'] = len(arrays['qubits'])
+    with open(path, 'wb') as file:
+        file.write(header.tobytes())
+        for name, dtype, _ in _SECTIONS:
+            data = np.asarray(arrays[name]).astype(dtype).tobytes()
+            file.write(data)
+            file.write(bytes(-len(data) % 8))
+
+class CircuitBatch:
+    """Circuits of a file written by write_circuits. The arrays of the file are memory mapped,
+    so opening a file does not read it, and a circuit is only read when it is converted.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): path of a file written by write_circuits
+        """
+        self._memory_map = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self._memory_map) < _HEADER_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a circuit file")
+        header = np.frombuffer(self._memory_map, dtype=_HEADER_DTYPE, count=1)[0]
+        if header['magic'] != _MAGIC or header['version'] != _VERSION:
+            raise ValueError(f"{path} is not a circuit file of version {_VERSION}")
+
+        offset = _HEADER_DTYPE.itemsize
+        self._arrays = {}
+        for name, dtype, length_field in _SECTIONS:
+            length = _section_length(header, length_field)
+            array = np.frombuffer(self._memory_map, dtype=dtype, count=length, offset=offset)
+            self._arrays[name] = array
+            offset += array.nbytes + (-array.nbytes % 8)
+
+    def __len__(self):
+        return len(self._arrays['n_moments'])
+
+    def arrays(self, ind):
+        """Returns the stored arrays of a circuit, which are views of the memory mapped file
+
+        Args:
+            ind (int): index of the circuit in the file
+
+        Returns:
+            arrays (dict(str, np.ndarray)): qubits (LineQubit indices), moment, kind,
+                                            qubit_count and qubit_ind
+        """
+        if not -len(self) <= ind < len(self):
+            raise IndexError(f"circuit index {ind} out of range for {len(self)} circuits")
+        ind %= len(self)
+        op_start, op_end = self._arrays['circuit_op_start'][ind:ind+2]
+        inc_start, inc_end = self._arrays['circuit_inc_start'][ind:ind+2]
+        qubit_start, qubit_end = self._arrays['circuit_qubit_start'][ind:ind+2]
+        return {
+            'qubits': self._arrays['qubits'][qubit_start:qubit_end],
+            'moment': self._arrays['moment'][op_start:op_end],
+            'kind': self._arrays['kind'][op_start:op_end],
+            'qubit_count': self._arrays['qubit_count'][op_start:op_end],
+            'qubit_ind': self._arrays['qubit_ind'][inc_start:inc_end]
+        }
+
+    def compact_circuit(self, ind):
+        """Returns a circuit of the file as a CompactCircuit"""
+        arrays = self.arrays(ind)
+        n_moments = int(self._arrays['n_moments'][ind])
+        empty_keys = np.setdiff1d(np.arange(n_moments), arrays['moment'])
+        return CompactCircuit([cirq.LineQubit(x) for x in arrays['qubits'].tolist()],
+                              arrays['kind'], arrays['moment'], arrays['qubit_count'], arrays['qubit_ind'],
+                              empty_keys=empty_keys.tolist())
+
+    def __getitem__(self, ind):
+        """Returns a circuit of the file as a cirq.Circuit"""
+        return self.compact_circuit(ind).to_circuit()
+
+    def __iter__(self):
+        for ind in range(len(self)):
+            yield self[ind]
+
+def read_circuits(path):
+    """Opens a file written by write_circuits without reading it
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        batch (CircuitBatch): the circuits of the file, converted one at a time when accessed
+    """
+    return CircuitBatch(path)
@@ -0,0 +1,509 @@
+import enum
+from bisect import bisect_left, insort
+import cirq
+import numpy as np
+import sys
+sys.path.append('../')
+from src.functions import (
+    FanoutCNOT,
+    is_fanout_cnot,
+    create_cnot_with_multiple_targets
+)
+
+class GateKind(enum.IntEnum):
+    """Kinds of operations stored in a CompactCircuit"""
+    H = 0
+    CNOT = 1
+    MULTI_CNOT = 2
+    OTHER = 3
+
+# plain int copies of the gate kinds, comparing NumPy scalars to them is much faster than to enum members
+_H = int(GateKind.H)
+_CNOT = int(GateKind.CNOT)
+_OTHER = int(GateKind.OTHER)
+
+# names of the NumPy arrays of a CompactCircuit, copies share them until one is modified
+_ARRAY_NAMES = ('kind', 'key', 'alive', 'inc_count', 'inc_start', 'inc_qubit', 'inc_op',
+                'inc_next', 'inc_prev', 'wire_first', 'wire_last')
+
+def _operation_kind(operation):
+    """Returns the GateKind of a Cirq operation"""
+    if type(operation) is FanoutCNOT:
+        return GateKind.MULTI_CNOT
+    if operation.gate == cirq.H:
+        return GateKind.H
+    if operation.gate == cirq.CNOT:
+        return GateKind.CNOT
+    # other controlled operations, like Toffolis or 0-controlled CNOTs, are kept as OTHER
+    if is_fanout_cnot(operation):
+        return GateKind.MULTI_CNOT
+    return GateKind.OTHER
+
+def _grow(array, capacity):
+    """Returns a copy of array extended with zeros to the given capacity"""
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _smallest_int_array(array):
+    """Returns a copy of an integer valued array with the smallest integer type holding its values"""
+    if len(array) == 0:
+        return array.astype(np.int8)
+    return array.astype(np.result_type(np.min_scalar_type(int(array.min())), np.min_scalar_type(int(array.max()))))
+
+class CompactCircuit:
+    """Array-backed representation of a circuit used by the rewrite engine.
+
+    Each operation is a row in the NumPy arrays kind, key and alive. The key is the
+    position of the operation in time and operations with the same key form a moment.
+    The qubits of operation op are the incidences inc_start[op]...inc_start[op]+inc_count[op]-1
+    (control qubit first for CNOTs). Every incidence is linked to the previous and the next
+    incidence on the same qubit (inc_prev, inc_next), so the arrays also hold the gate
+    timeline of every qubit. Removed operations are only marked dead until compact is called.
+    """
+
+    def __init__(self, qubits, kind, key, qubit_counts, qubit_inds, other_operations=None, empty_keys=()):
+        """
+        Args:
+            qubits (list(cirq.Qid)): qubits of the circuit, indexed by qubit_inds
+            kind (np.ndarray): GateKind of each operation
+            key (np.ndarray): position of each operation in time
+            qubit_counts (np.ndarray): number of qubits of each operation
+            qubit_inds (np.ndarray): qubit indices of all operations concatenated
+            other_operations (dict(int, cirq.Operation)): Cirq operations of the
+                                                          operations of kind OTHER
+            empty_keys (list(float)): keys of moments that contain no operations
+        """
+        self.qubits = tuple(qubits)
+        n_ops = len(kind)
+        n_incs = len(qubit_inds)
+        self.kind = np.asarray(kind, dtype=np.int8).copy()
+        self.key = np.asarray(key, dtype=np.float64).copy()
+        self.alive = np.ones(n_ops, dtype=bool)
+        self.inc_count = np.asarray(qubit_counts, dtype=np.int32).copy()
+        self.inc_start = np.zeros(n_ops, dtype=np.int64)
+        if n_ops > 0:
+            self.inc_start[1:] = np.cumsum(self.inc_count)[:-1]
+
+        self.inc_qubit = np.asarray(qubit_inds, dtype=np.int32).copy()
+        self.inc_op = np.repeat(np.arange(n_ops, dtype=np.int64), self.inc_count)
+        self.inc_next = np.full(n_incs, -1, dtype=np.int64)
+        self.inc_prev = np.full(n_incs, -1, dtype=np.int64)
+        self.wire_first = np.full(len(self.qubits), -1, dtype=np.int64)
+        self.wire_last = np.full(len(self.qubits), -1, dtype=np.int64)
+        self.other_operations = dict(other_operations) if other_operations else {}
+        self._n_ops = n_ops
+        self._n_incs = n_incs
+        self._n_alive = n_ops
+        self._shares_arrays = False
+        # sorted keys of the non-empty moments, only kept up to date after track_moment_order
+        self._moment_keys = None
+        self._link_wires()
+        keys, counts = np.unique(self.key, return_counts=True)
+        self._moment_sizes = dict(zip(keys.tolist(), counts.tolist()))
+        for empty_key in empty_keys:
+            self._moment_sizes.setdefault(float(empty_key), 0)
+
+    def _link_wires(self):
+        """Links every incidence to its neighbours on the same qubit"""
+        if self._n_incs == 0:
+            return
+
+        order = np.lexsort((self.key[self.inc_op], self.inc_qubit))
+        sorted_qubits = self.inc_qubit[order]
+        same_qubit = sorted_qubits[1:] == sorted_qubits[:-1]
+        self.inc_next[order[:-1][same_qubit]] = order[1:][same_qubit]
+        self.inc_prev[order[1:][same_qubit]] = order[:-1][same_qubit]
+        first = np.concatenate(([True], ~same_qubit))
+        last = np.concatenate((~same_qubit, [True]))
+        self.wire_first[sorted_qubits[first]] = order[first]
+        self.wire_last[sorted_qubits[last]] = order[last]
+
+    @classmethod
+    def from_circuit(cls, circuit):
+        """Converts a Cirq circuit to a CompactCircuit
+
+        Args:
+            circuit (cirq.AbstractCircuit): circuit to be converted
+
+        Returns:
+            compact_circuit (CompactCircuit): the converted circuit
+        """
+        qubits = sorted(circuit.all_qubits())
+        qubit_inds = {qubit: ind for ind, qubit in enumerate(qubits)}
+        kind = []
+        key = []
+        qubit_counts = []
+        op_qubit_inds = []
+        other_operations = {}
+        empty_keys = []
+        for moment_ind, moment in enumerate(circuit):
+            if len(moment) == 0:
+                empty_keys.append(moment_ind)
+
+            for operation in moment:
+                operation_kind = _operation_kind(operation)
+                if operation_kind == GateKind.OTHER:
+                    other_operations[len(kind)] = operation
+
+                kind.append(operation_kind)
+                key.append(moment_ind)
+                qubit_counts.append(len(operation.qubits))
+                op_qubit_inds.extend(qubit_inds[qubit] for qubit in operation.qubits)
+
+        return cls(qubits, kind, key, qubit_counts, op_qubit_inds, other_operations, empty_keys)
+
+    def to_circuit(self):
+        """Converts the CompactCircuit back to a Cirq circuit
+
+        Returns:
+            circuit (cirq.Circuit): the converted circuit
+        """
+        ops = self.operations_in_order()
+        op_keys = self.key[ops].tolist()
+        moment_operations = {moment_key: [] for moment_key in sorted(self._moment_sizes)}
+        for op, op_key in zip(ops.tolist(), op_keys):
+            moment_operations[op_key].append(self.operation(op))
+
+        return cirq.Circuit.from_moments(*[cirq.Moment(operations) for operations in moment_operations.values()])
+
+    def operation(self, op):
+        """Returns the Cirq operation of operation op"""
+        op_kind = self.kind[op]
+        if op_kind == _OTHER:
+            return self.other_operations[op]
+
+        qubits = [self.qubits[qubit_ind] for qubit_ind in self.qubits_of(op)]
+        if op_kind == _H:
+            return cirq.H(qubits[0])
+        if op_kind == _CNOT:
+            return cirq.CNOT(qubits[0], qubits[1])
+        return create_cnot_with_multiple_targets(target_qubits=qubits[1:], control_qubit=qubits[0])
+
+    def __reduce__(self):
+        """Pickles only the live operations with the smallest sufficient integer types,
+        the wire links are rebuilt when unpickling
+        """
+        ops = np.flatnonzero(self.alive[:self._n_ops])
+        incs = np.flatnonzero(self.alive[self.inc_op[:self._n_incs]])
+        key = self.key[ops]
+        if np.array_equal(key, np.round(key)):
+            key = _smallest_int_array(key)
+        new_ids = {op: new_op for new_op, op in enumerate(ops.tolist())}
+        other_operations = {new_ids[op]: operation for op, operation in self.other_operations.items()
+                            if op in new_ids}
+        empty_keys = [moment_key for moment_key, size in self._moment_sizes.items() if size == 0]
+        return (CompactCircuit, (self.qubits, self.kind[ops], key, _smallest_int_array(self.inc_count[ops]),
+                                 _smallest_int_array(self.inc_qubit[incs]), other_operations, empty_keys))
+
+    def __len__(self):
+        """Number of moments in the circuit"""
+        return len(self._moment_sizes)
+
+    @property
+    def n_empty_moments(self):
+        """Number of moments without operations"""
+        return sum(1 for size in self._moment_sizes.values() if size == 0)
+
+    @property
+    def n_nonempty_moments(self):
+        """Number of moments with operations"""
+        if self._moment_keys is not None:
+            return len(self._moment_keys)
+        return len(self._moment_sizes) - self.n_empty_moments
+
+    @property
+    def n_operations(self):
+        """Number of operations in the circuit"""
+        return self._n_alive
+
+    def gate_counts(self):
+        """Counts the operations of the circuit with NumPy in one pass over the arrays
+
+        Returns:
+            kind_counts (list(int)): number of operations of each GateKind, indexed by the GateKind
+            n_two_qubit_gates (int): number of two-qubit gates when every multi-target CNOT is
+                                     split into one CNOT per target
+        """
+        ops = np.flatnonzero(self.alive[:self._n_ops])
+        kind = self.kind[ops]
+        qubit_counts = self.inc_count[ops].astype(np.int64)
+        n_two_qubit_gates = np.where(kind == _OTHER, qubit_counts == 2, np.where(kind == _H, 0, qubit_counts - 1))
+        return np.bincount(kind, minlength=len(GateKind)).tolist(), int(n_two_qubit_gates.sum())
+
+    @property
+    def n_op_ids(self):
+        """Number of operation indices in use, including the indices of removed operations.
+        New operations get indices from n_op_ids on.
+        """
+        return self._n_ops
+
+    def track_moment_order(self):
+        """Keeps a sorted list of the keys of the non-empty moments up to date from now on.
+        Then moment_key_before and moment_key_after find the neighbouring non-empty moments
+        also in a circuit that is modified many times without being compacted.
+        """
+        if self._moment_keys is None:
+            self._moment_keys = sorted(moment_key for moment_key, size in self._moment_sizes.items() if size > 0)
+
+    def moment_key_before(self, key):
+        """Returns the key of the moment before key or None if there is none. Without
+        track_moment_order the moment before key is key - 1, which is the previous moment
+        of a compacted circuit, and with it the previous non-empty moment.
+        """
+        if self._moment_keys is None:
+            return key - 1 if key - 1 in self._moment_sizes else None
+        ind = bisect_left(self._moment_keys, key)
+        return self._moment_keys[ind-1] if ind > 0 else None
+
+    def moment_key_after(self, key):
+        """Returns the key of the moment after key or None if there is none, see moment_key_before"""
+        if self._moment_keys is None:
+            return key + 1 if key + 1 in self._moment_sizes else None
+        ind = bisect_left(self._moment_keys, key)
+        if ind < len(self._moment_keys) and self._moment_keys[ind] == key:
+            ind += 1
+        return self._moment_keys[ind] if ind < len(self._moment_keys) else None
+
+    def operations_in_order(self, kinds=None):
+        """Returns the indices of the operations sorted by their position in time
+
+        Args:
+            kinds (list(GateKind)): if given, only operations of these kinds are returned
+
+        Returns:
+            ops (np.ndarray): indices of the operations
+        """
+        mask = self.alive[:self._n_ops]
+        if kinds is not None:
+            mask = mask & np.isin(self.kind[:self._n_ops], kinds)
+        ops = np.flatnonzero(mask)
+        return ops[np.argsort(self.key[ops], kind='stable')]
+
+    def packed_operations(self):
+        """Returns the live operations in a canonical order, sorted by moment index and then by
+        their first qubit, as flat arrays. The order does not depend on the order of the
+        operations in the arrays or on the keys other than through the moment indices.
+
+        Returns:
+            ops (np.ndarray): indices of the operations
+            moment_inds (np.ndarray): index of the moment of each operation
+            qubit_counts (np.ndarray): number of qubits of each operation
+            qubit_inds (np.ndarray): qubit indices of all operations concatenated, control qubit first
+        """
+        ops = self.operations_in_order()
+        moment_inds = np.searchsorted(np.array(sorted(self._moment_sizes)), self.key[ops])
+        first_qubits = self.inc_qubit[self.inc_start[ops]]
+        order = np.lexsort((first_qubits, moment_inds))
+        ops = ops[order]
+        counts = self.inc_count[ops]
+        ends = np.cumsum(counts)
+        incs = np.arange(ends[-1] if len(ends) else 0) + np.repeat(self.inc_start[ops] - (ends - counts), counts)
+        return ops, moment_inds[order], counts, self.inc_qubit[incs]
+
+    def structure(self):
+        """Returns the structure of the circuit as a hashable tuple: the moment index, kind and
+        qubits of every operation. It does not depend on the order of the operations in the
+        arrays or on the keys other than through the moment indices, so a circuit and its
+        compacted copy have equal structures.
+        """
+        ops, moment_inds, counts, qubit_inds = self.packed_operations()
+        other_operations = tuple(self.other_operations[op] for op in ops.tolist() if self.kind[op] == _OTHER)
+        return (len(self._moment_sizes), moment_inds.astype(np.int64).tobytes(), self.kind[ops].tobytes(),
+                counts.tobytes(), qubit_inds.tobytes(), other_operations)
+
+    def fingerprint(self):
+        """Returns the hash of structure()"""
+        return hash(self.structure())
+
+    def qubits_of(self, op):
+        """Returns the qubit indices of operation op, control qubit first"""
+        start = self.inc_start[op]
+        return self.inc_qubit[start:start+self.inc_count[op]].tolist()
+
+    def next_on(self, op, qubit_pos=0):
+        """Returns the next operation on the qubit_pos'th qubit of op or -1 if there is none"""
+        inc = self.inc_next[self.inc_start[op] + qubit_pos]
+        return -1 if inc < 0 else int(self.inc_op[inc])
+
+    def prev_on(self, op, qubit_pos=0):
+        """Returns the previous operation on the qubit_pos'th qubit of op or -1 if there is none"""
+        inc = self.inc_prev[self.inc_start[op] + qubit_pos]
+        return -1 if inc < 0 else int(self.inc_op[inc])
+
+    def copy(self):
+        """Returns a copy of the circuit. The copy shares the arrays with the circuit
+        until either of them is modified, so copying a circuit that is only read does
+        not copy the arrays.
+        """
+        new = CompactCircuit.__new__(CompactCircuit)
+        new.__dict__.update(self.__dict__)
+        new.other_operations = dict(self.other_operations)
+        new._moment_sizes = dict(self._moment_sizes)
+        if self._moment_keys is not None:
+            new._moment_keys = list(self._moment_keys)
+        self._shares_arrays = True
+        new._shares_arrays = True
+        return new
+
+    def _own_arrays(self):
+        """Copies the arrays shared with other circuits before they are modified"""
+        if self._shares_arrays:
+            for name in _ARRAY_NAMES:
+                setattr(self, name, getattr(self, name).copy())
+            self._shares_arrays = False
+
+    def _is_compact(self):
+        """Checks if the circuit has no removed operations, no spare capacity and no empty
+        moments and if its moments are numbered 0, 1, 2, ...
+        """
+        if (len(self.kind) != self._n_ops or len(self.inc_qubit) != self._n_incs or
+            not self.alive.all() or self.n_empty_moments > 0):
+            return False
+
+        moment_keys = self._moment_sizes.keys()
+        return (len(moment_keys) == 0 or
+                (min(moment_keys) == 0 and max(moment_keys) == len(moment_keys) - 1 and
+                 all(float(moment_key).is_integer() for moment_key in moment_keys)))
+
+    def compact(self):
+        """Returns a copy of the circuit without removed operations and empty moments
+        and with the moments renumbered 0, 1, 2, ...
+        """
+        if self._is_compact():
+            return self.copy()
+
+        ops = np.flatnonzero(self.alive[:self._n_ops])
+        _, new_key = np.unique(self.key[ops], return_inverse=True)
+        incs = np.flatnonzero(self.alive[self.inc_op[:self._n_incs]])
+        new_ids = {op: new_op for new_op, op in enumerate(ops.tolist())}
+        other_operations = {new_ids[op]: operation for op, operation in self.other_operations.items()
+                            if op in new_ids}
+        return CompactCircuit(self.qubits, self.kind[ops], new_key, self.inc_count[ops],
+                              self.inc_qubit[incs], other_operations)
+
+    def _append_operation(self, kind, qubit_inds, key):
+        """Appends a new unlinked operation to the arrays and returns its index"""
+        if self._n_ops == len(self.kind):
+            capacity = max(2 * self._n_ops, 16)
+            for name in ('kind', 'key', 'alive', 'inc_count', 'inc_start'):
+                setattr(self, name, _grow(getattr(self, name), capacity))
+
+        n_new_incs = len(qubit_inds)
+        if self._n_incs + n_new_incs > len(self.inc_qubit):
+            capacity = max(2 * (self._n_incs + n_new_incs), 16)
+            for name in ('inc_qubit', 'inc_op', 'inc_next', 'inc_prev'):
+                setattr(self, name, _grow(getattr(self, name), capacity))
+
+        op = self._n_ops
+        self.kind[op] = kind
+        self.key[op] = key
+        self.alive[op] = True
+        self.inc_start[op] = self._n_incs
+        self.inc_count[op] = n_new_incs
+        self.inc_qubit[self._n_incs:self._n_incs+n_new_incs] = qubit_inds
+        self.inc_op[self._n_incs:self._n_incs+n_new_incs] = op
+        self._n_ops += 1
+        self._n_incs += n_new_incs
+        self._n_alive += 1
+        moment_size = self._moment_sizes.get(key, 0)
+        self._moment_sizes[key] = moment_size + 1
+        if moment_size == 0 and self._moment_keys is not None:
+            insort(self._moment_keys, key)
+        return op
+
+    def replace(self, old_ops, new_ops=()):
+        """Replaces operations of the circuit with new operations.
+
+        On every qubit the replaced operations must be consecutive and the new
+        operations acting on that qubit are placed in their place in the given order.
+        The new operations may only act on qubits of the replaced operations and the
+        caller is responsible for choosing keys that keep the circuit valid.
+
+        Args:
+            old_ops (list(int)): indices of the operations that are removed
+            new_ops (list(tuple)): (kind, qubit_inds, key) of each new operation
+                                   in time order
+
+        Returns:
+            new_op_inds (list(int)): indices of the new operations
+        """
+        self._own_arrays()
+        old_set = set(old_ops)
+        bounds = {}
+        for op in old_ops:
+            start = self.inc_start[op]
+            for inc in range(start, start + self.inc_count[op]):
+                qubit_ind = int(self.inc_qubit[inc])
+                qubit_bounds = bounds.setdefault(qubit_ind, [-1, -1])
+                prev_inc = int(self.inc_prev[inc])
+                next_inc = int(self.inc_next[inc])
+                if prev_inc < 0 or int(self.inc_op[prev_inc]) not in old_set:
+                    qubit_bounds[0] = prev_inc
+                if next_inc < 0 or int(self.inc_op[next_inc]) not in old_set:
+                    qubit_bounds[1] = next_inc
+
+        for op in old_ops:
+            self.alive[op] = False
+            self._n_alive -= 1
+            op_key = float(self.key[op])
+            self._moment_sizes[op_key] -= 1
+            if self._moment_sizes[op_key] == 0 and self._moment_keys is not None:
+                del self._moment_keys[bisect_left(self._moment_keys, op_key)]
+            self.other_operations.pop(op, None)
+
+        new_op_inds = []
+        chains = {}
+        for kind, qubit_inds, key in new_ops:
+            op = self._append_operation(kind, qubit_inds, float(key))
+            new_op_inds.append(op)
+            for qubit_pos, qubit_ind in enumerate(qubit_inds):
+                chains.setdefault(qubit_ind, []).append(self.inc_start[op] + qubit_pos)
+
+        for qubit_ind, (prev_inc, next_inc) in bounds.items():
+            chain = [prev_inc] + chains.pop(qubit_ind, []) + [next_inc]
+            for inc1, inc2 in zip(chain[:-1], chain[1:]):
+                if inc1 >= 0:
+                    self.inc_next[inc1] = inc2
+                else:
+                    self.wire_first[qubit_ind] = inc2
+                if inc2 >= 0:
+                    self.inc_prev[inc2] = inc1
+                else:
+                    self.wire_last[qubit_ind] = inc1
+
+        if chains:
+            raise ValueError("New operations can only act on qubits of the replaced operations")
+
+        return new_op_inds
+
+    def free_key_before(self, op, qubit_pos):
+        """Returns a key before operation op at which its qubit_pos'th qubit is free.
+        Joins the previous moment if the qubit is free there and otherwise returns
+        the key of a new moment between op and the previous operation on the qubit.
+        """
+        key = self.key[op]
+        prev_op = self.prev_on(op, qubit_pos)
+        prev_key = None if prev_op < 0 else self.key[prev_op]
+        moment_key = self.moment_key_before(key)
+        if moment_key is not None and (prev_key is None or prev_key < moment_key):
+            return moment_key
+        if prev_key is None:
+            return key - 0.5
+        return (prev_key + key) / 2
+
+    def free_key_after(self, op, qubit_pos, key=None):
+        """Returns a key after key (default key of op) at which the qubit_pos'th qubit
+        of op is free, considering only the operations after op on that qubit. Joins
+        the next moment if the qubit is free there and otherwise returns the key of
+        a new moment between key and the next operation on the qubit.
+        """
+        key = self.key[op] if key is None else key
+        next_op = self.next_on(op, qubit_pos)
+        next_key = None if next_op < 0 else self.key[next_op]
+        moment_key = self.moment_key_after(key)
+        if moment_key is not None and (next_key is None or next_key > moment_key):
+            return moment_key
+        if next_key is None:
+            return key + 0.5
+        return (key + next_key) / 2
@@ -0,0 +1,405 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from src.compact_circuit import GateKind, CompactCircuit
+
+# plain int copies of the gate kinds, comparing NumPy scalars to them is much faster than to enum members
+_H = int(GateKind.H)
+_CNOT = int(GateKind.CNOT)
+_MULTI_CNOT = int(GateKind.MULTI_CNOT)
+
+def _is_cnot(compact_circuit, op):
+    """Checks if operation op is a CNOT or a multi-target-qubit CNOT"""
+    op_kind = compact_circuit.kind[op]
+    return op_kind == _CNOT or op_kind == _MULTI_CNOT
+
+def _same_operation(compact_circuit, op1, op2):
+    """Checks if two operations are the same gate acting on the same qubits"""
+    if compact_circuit.kind[op1] != compact_circuit.kind[op2]:
+        return False
+
+    qubits1 = compact_circuit.qubits_of(op1)
+    qubits2 = compact_circuit.qubits_of(op2)
+    if compact_circuit.kind[op1] == _MULTI_CNOT:
+        return qubits1[0] == qubits2[0] and sorted(qubits1[1:]) == sorted(qubits2[1:])
+    return qubits1 == qubits2
+
+def _combine_cnots_with_controls_surrounded_by_hadamards_at(mutated_circuit, op):
+    """Applies circuit identity a) to the CNOT op and the CNOTs after it on its target qubit
+    if the identity permits it
+
+    Args:
+        mutated_circuit (CompactCircuit): circuit that is modified in place
+        op (int): index of a live CNOT of the circuit
+
+    Returns:
+        removed_ops (list(int)): indices of the removed operations or None if there is no match
+        new_ops (list(int)): indices of the new operations
+    """
+    control_qubit, target_qubit = mutated_circuit.qubits_of(op)
+    first_h = mutated_circuit.prev_on(op, 0)
+    next_h = mutated_circuit.next_on(op, 0)
+    if (first_h < 0 or mutated_circuit.kind[first_h] != _H or
+        next_h < 0 or mutated_circuit.kind[next_h] != _H):
+        return None, []
+
+    control_qubits = [control_qubit]
+    removals = [first_h, op, next_h]
+    cnot = op
+    while True:
+        next_cnot = mutated_circuit.next_on(cnot, 1)
+        if next_cnot < 0 or mutated_circuit.kind[next_cnot] != _CNOT:
+            break
+
+        control_qubit, target_qubit_2 = mutated_circuit.qubits_of(next_cnot)
+        if target_qubit_2 != target_qubit or control_qubit in control_qubits:
+            break
+
+        prev_h = mutated_circuit.prev_on(next_cnot, 0)
+        next_h = mutated_circuit.next_on(next_cnot, 0)
+        if (prev_h < 0 or mutated_circuit.kind[prev_h] != _H or
+            mutated_circuit.key[prev_h] > mutated_circuit.key[op] or
+            next_h < 0 or mutated_circuit.kind[next_h] != _H):
+            break
+
+        control_qubits.append(control_qubit)
+        removals.extend([prev_h, next_cnot, next_h])
+        cnot = next_cnot
+
+    if len(control_qubits) < 2:
+        return None, []
+
+    key = mutated_circuit.key[op]
+    first_h_key = mutated_circuit.free_key_before(op, 1)
+    last_h_key = mutated_circuit.free_key_after(cnot, 1, key=key)
+    new_ops = mutated_circuit.replace(removals, [(GateKind.H, [target_qubit], first_h_key),
+                                                 (GateKind.MULTI_CNOT, [target_qubit] + control_qubits, key),
+                                                 (GateKind.H, [target_qubit], last_h_key)])
+    return removals, new_ops
+
+def _remove_double_hadamards_at(mutated_circuit, op):
+    """Applies circuit identity b) to the Hadamard op and the next operation on its qubit
+    if the identity permits it, see _combine_cnots_with_controls_surrounded_by_hadamards_at
+    """
+    next_op = mutated_circuit.next_on(op)
+    if next_op < 0 or mutated_circuit.kind[next_op] != _H:
+        return None, []
+
+    removals = [op, next_op]
+    return removals, mutated_circuit.replace(removals)
+
+def _remove_double_cnots_at(mutated_circuit, op):
+    """Applies circuit identity c) to the (multi-target-qubit) CNOT op and the next operation
+    on its control qubit if the identity permits it, see
+    _combine_cnots_with_controls_surrounded_by_hadamards_at
+    """
+    next_op = mutated_circuit.next_on(op, 0)
+    if (next_op < 0 or not _same_operation(mutated_circuit, op, next_op) or
+        any(mutated_circuit.next_on(op, qubit_pos) != next_op
+            for qubit_pos in range(1, mutated_circuit.inc_count[op]))):
+        return None, []
+
+    removals = [op, next_op]
+    return removals, mutated_circuit.replace(removals)
+
+def _combine_cnots_at(mutated_circuit, op):
+    """Applies circuit identity d) to the (multi-target-qubit) CNOT op and the CNOTs after it
+    on its control qubit if the identity permits it, see
+    _combine_cnots_with_controls_surrounded_by_hadamards_at
+    """
+    op_qubits = mutated_circuit.qubits_of(op)
+    control_qubit = op_qubits[0]
+    target_qubits = op_qubits[1:]
+    removals = [op]
+    cnot = op
+    while True:
+        next_cnot = mutated_circuit.next_on(cnot, 0)
+        if next_cnot < 0 or not _is_cnot(mutated_circuit, next_cnot):
+            break
+
+        next_qubits = mutated_circuit.qubits_of(next_cnot)
+        if next_qubits[0] != control_qubit or set(next_qubits[1:]).intersection(target_qubits):
+            break
+
+        prev_ops = [mutated_circuit.prev_on(next_cnot, qubit_pos) for qubit_pos in range(1, len(next_qubits))]
+        if any(prev_op >= 0 and mutated_circuit.key[prev_op] >= mutated_circuit.key[op] for prev_op in prev_ops):
+            break
+
+        target_qubits.extend(next_qubits[1:])
+        removals.append(next_cnot)
+        cnot = next_cnot
+
+    if len(removals) <= 1:
+        return None, []
+
+    return removals, mutated_circuit.replace(removals, [(GateKind.MULTI_CNOT, [control_qubit] + target_qubits,
+                                                         mutated_circuit.key[op])])
+
+def _hadamards_and_cnot_to_cnot_at(mutated_circuit, op):
+    """Applies circuit identity f) to the Hadamard op and the CNOT after it if the identity
+    permits it, see _combine_cnots_with_controls_surrounded_by_hadamards_at
+    """
+    qubit1 = mutated_circuit.qubits_of(op)[0]
+    cnot = mutated_circuit.next_on(op)
+    if cnot < 0 or mutated_circuit.kind[cnot] != _CNOT:
+        return None, []
+
+    control_qubit, target_qubit = mutated_circuit.qubits_of(cnot)
+    qubit1_pos = 0 if control_qubit == qubit1 else 1
+    second_h = mutated_circuit.prev_on(cnot, 1 - qubit1_pos)
+    next_h1 = mutated_circuit.next_on(cnot, qubit1_pos)
+    next_h2 = mutated_circuit.next_on(cnot, 1 - qubit1_pos)
+    if any(h_op < 0 or mutated_circuit.kind[h_op] != _H for h_op in (second_h, next_h1, next_h2)):
+        return None, []
+
+    removals = [op, second_h, cnot, next_h1, next_h2]
+    return removals, mutated_circuit.replace(removals, [(GateKind.CNOT, [target_qubit, control_qubit],
+                                                         mutated_circuit.key[cnot])])
+
+def _apply_everywhere(compact_circuit, rewrite_at, kinds):
+    """Tries rewrite_at at every operation of the given kinds in time order on a
+    compacted copy of the circuit, skipping the operations removed by earlier rewrites
+
+    Returns:
+        mutated_circuit (CompactCircuit): compacted result
+    """
+    mutated_circuit = compact_circuit.compact()
+    for op in mutated_circuit.operations_in_order(kinds).tolist():
+        if mutated_circuit.alive[op]:
+            rewrite_at(mutated_circuit, op)
+
+    return mutated_circuit.compact()
+
+def combine_cnots_with_controls_surrounded_by_hadamards(compact_circuit):
+    """Applies circuit identity a) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    return _apply_everywhere(compact_circuit, _combine_cnots_with_controls_surrounded_by_hadamards_at, [_CNOT])
+
+def remove_double_hadamards(compact_circuit):
+    """Applies circuit identity b) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    return _apply_everywhere(compact_circuit, _remove_double_hadamards_at, [_H])
+
+def remove_double_cnots(compact_circuit):
+    """Applies circuit identity c) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    return _apply_everywhere(compact_circuit, _remove_double_cnots_at, [_CNOT, _MULTI_CNOT])
+
+def combine_cnots(compact_circuit):
+    """Applies circuit identity d) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    return _apply_everywhere(compact_circuit, _combine_cnots_at, [_CNOT, _MULTI_CNOT])
+
+def cnot_to_hadamards_and_cnot(compact_circuit):
+    """Applies circuit identity e) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    circuit = compact_circuit.compact()
+    is_cnot = circuit.kind == _CNOT
+    kept_ops = np.flatnonzero(~is_cnot)
+    cnots = np.flatnonzero(is_cnot)
+    control_qubits = circuit.inc_qubit[circuit.inc_start[cnots]]
+    target_qubits = circuit.inc_qubit[circuit.inc_start[cnots] + 1]
+    cnot_keys = circuit.key[cnots]
+    n_cnots = len(cnots)
+    kind = np.concatenate((circuit.kind[kept_ops], np.full(4 * n_cnots, _H), np.full(n_cnots, _CNOT)))
+    key = np.concatenate((circuit.key[kept_ops], 
+                          np.repeat(cnot_keys - 1/3, 2), np.repeat(cnot_keys + 1/3, 2), cnot_keys))
+    qubit_counts = np.concatenate((circuit.inc_count[kept_ops], np.ones(4 * n_cnots), np.full(n_cnots, 2)))
+    hadamard_qubits = np.stack((control_qubits, target_qubits), axis=1).ravel()
+    qubit_inds = np.concatenate((circuit.inc_qubit[~is_cnot[circuit.inc_op]], hadamard_qubits, hadamard_qubits,
+                                 np.stack((target_qubits, control_qubits), axis=1).ravel()))
+    new_ids = {op: new_op for new_op, op in enumerate(kept_ops.tolist())}
+    other_operations = {new_ids[op]: operation for op, operation in circuit.other_operations.items()}
+    return CompactCircuit(circuit.qubits, kind, key, qubit_counts, qubit_inds, other_operations).compact()
+
+def hadamards_and_cnot_to_cnot(compact_circuit):
+    """Applies circuit identity f) to all locations of the circuit that permit it
+
+    Args:
+        compact_circuit (CompactCircuit): original circuit
+
+    Returns:
+        mutated_circuit (CompactCircuit): circuit gotten by applying the identity
+    """
+    return _apply_everywhere(compact_circuit, _hadamards_and_cnot_to_cnot_at, [_H])
+
+def _neighbours(compact_circuit, ops, qubit_pos, links):
+    """Returns the operations linked by links (inc_next or inc_prev) to the qubit_pos'th
+    qubit of each operation of ops, -1 where there is none
+    """
+    incs = links[compact_circuit.inc_start[ops] + qubit_pos]
+    return np.where(incs >= 0, compact_circuit.inc_op[np.maximum(incs, 0)], -1)
+
+def _kinds(compact_circuit, ops):
+    """Returns the kinds of the operations of ops, -1 where ops is -1"""
+    return np.where(ops >= 0, compact_circuit.kind[np.maximum(ops, 0)], -1)
+
+def _is_first_qubit_of(compact_circuit, ops, qubit_pos, next_ops):
+    """Checks for each operation of ops if its qubit_pos'th qubit is the control
+    (first) qubit of the corresponding operation of next_ops
+    """
+    incs = compact_circuit.inc_next[compact_circuit.inc_start[ops] + qubit_pos]
+    return (next_ops >= 0) & (incs == compact_circuit.inc_start[np.maximum(next_ops, 0)])
+
+def count_combinable_cnots_with_controls_surrounded_by_hadamards(compact_circuit):
+    """Counts the locations where circuit identity a) applies. Empty moments are counted
+    too because combine_cnots_with_controls_surrounded_by_hadamards drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of CNOTs that can be combined with the next CNOT on their
+                         target qubit plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    cnots = compact_circuit.operations_in_order([_CNOT])
+    prev_kinds = _kinds(compact_circuit, _neighbours(compact_circuit, cnots, 0, compact_circuit.inc_prev))
+    next_kinds = _kinds(compact_circuit, _neighbours(compact_circuit, cnots, 0, compact_circuit.inc_next))
+    cnots = cnots[(prev_kinds == _H) & (next_kinds == _H)]
+    next_cnots = _neighbours(compact_circuit, cnots, 1, compact_circuit.inc_next)
+    existing_next_cnots = np.maximum(next_cnots, 0)
+    is_candidate = ((_kinds(compact_circuit, next_cnots) == _CNOT) &
+                    (compact_circuit.inc_next[compact_circuit.inc_start[cnots] + 1] ==
+                     compact_circuit.inc_start[existing_next_cnots] + 1) &
+                    (compact_circuit.inc_qubit[compact_circuit.inc_start[cnots]] !=
+                     compact_circuit.inc_qubit[compact_circuit.inc_start[existing_next_cnots]]))
+    cnots = cnots[is_candidate]
+    next_cnots = next_cnots[is_candidate]
+    prev_hs = _neighbours(compact_circuit, next_cnots, 0, compact_circuit.inc_prev)
+    next_hs = _neighbours(compact_circuit, next_cnots, 0, compact_circuit.inc_next)
+    is_match = ((_kinds(compact_circuit, prev_hs) == _H) & (_kinds(compact_circuit, next_hs) == _H) &
+                (compact_circuit.key[np.maximum(prev_hs, 0)] <= compact_circuit.key[cnots]))
+    return int(np.count_nonzero(is_match)) + compact_circuit.n_empty_moments
+
+def count_double_hadamards(compact_circuit):
+    """Counts the locations where circuit identity b) applies. Empty moments are counted
+    too because remove_double_hadamards drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of Hadamards followed by a Hadamard on the same qubit
+                         plus the number of empty moments. If zero the transformer
+                         returns the circuit unchanged.
+    """
+    hadamards = compact_circuit.operations_in_order([_H])
+    next_kinds = _kinds(compact_circuit, _neighbours(compact_circuit, hadamards, 0, compact_circuit.inc_next))
+    return int(np.count_nonzero(next_kinds == _H)) + compact_circuit.n_empty_moments
+
+def count_double_cnots(compact_circuit):
+    """Counts the locations where circuit identity c) applies. Empty moments are counted
+    too because remove_double_cnots drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of (multi-target-qubit) CNOTs directly followed by the
+                         same CNOT plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    cnots = compact_circuit.operations_in_order([_CNOT, _MULTI_CNOT])
+    next_ops = _neighbours(compact_circuit, cnots, 0, compact_circuit.inc_next)
+    is_candidate = (_is_first_qubit_of(compact_circuit, cnots, 0, next_ops) &
+                    (_kinds(compact_circuit, next_ops) == compact_circuit.kind[cnots]))
+    n_matches = compact_circuit.n_empty_moments
+    for op, next_op in zip(cnots[is_candidate].tolist(), next_ops[is_candidate].tolist()):
+        if (_same_operation(compact_circuit, op, next_op) and
+            all(compact_circuit.next_on(op, qubit_pos) == next_op
+                for qubit_pos in range(1, compact_circuit.inc_count[op]))):
+            n_matches += 1
+
+    return n_matches
+
+def count_combinable_cnots(compact_circuit):
+    """Counts the locations where circuit identity d) applies. Empty moments are counted
+    too because combine_cnots drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of (multi-target-qubit) CNOTs that can be combined with
+                         the next CNOT on their control qubit plus the number of empty
+                         moments. If zero the transformer returns the circuit unchanged.
+    """
+    cnots = compact_circuit.operations_in_order([_CNOT, _MULTI_CNOT])
+    next_cnots = _neighbours(compact_circuit, cnots, 0, compact_circuit.inc_next)
+    next_kinds = _kinds(compact_circuit, next_cnots)
+    is_candidate = (_is_first_qubit_of(compact_circuit, cnots, 0, next_cnots) &
+                    ((next_kinds == _CNOT) | (next_kinds == _MULTI_CNOT)))
+    n_matches = compact_circuit.n_empty_moments
+    for op, next_cnot in zip(cnots[is_candidate].tolist(), next_cnots[is_candidate].tolist()):
+        next_qubits = compact_circuit.qubits_of(next_cnot)
+        if set(next_qubits[1:]).intersection(compact_circuit.qubits_of(op)[1:]):
+            continue
+
+        prev_ops = [compact_circuit.prev_on(next_cnot, qubit_pos) for qubit_pos in range(1, len(next_qubits))]
+        if all(prev_op < 0 or compact_circuit.key[prev_op] < compact_circuit.key[op] for prev_op in prev_ops):
+            n_matches += 1
+
+    return n_matches
+
+def count_cnots(compact_circuit):
+    """Counts the locations where circuit identity e) applies. Empty moments are counted
+    too because cnot_to_hadamards_and_cnot drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of CNOTs plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    return len(compact_circuit.operations_in_order([_CNOT])) + compact_circuit.n_empty_moments
+
+def count_cnots_surrounded_by_hadamards(compact_circuit):
+    """Counts the locations where circuit identity f) applies. Empty moments are counted
+    too because hadamards_and_cnot_to_cnot drops them.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit that is searched
+
+    Returns:
+        n_matches (int): number of CNOTs with Hadamards directly before and after them on
+                         both qubits plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    cnots = compact_circuit.operations_in_order([_CNOT])
+    is_match = np.ones(len(cnots), dtype=bool)
+    for qubit_pos in (0, 1):
+        for links in (compact_circuit.inc_prev, compact_circuit.inc_next):
+            is_match &= _kinds(compact_circuit, _neighbours(compact_circuit, cnots, qubit_pos, links)) == _H
+    return int(np.count_nonzero(is_match)) + compact_circuit.n_empty_moments
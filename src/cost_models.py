@@ -0,0 +1,137 @@
+import pickle
+import sys
+import cirq
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit, GateKind
+from src.functions import is_cnot_with_multiple_targets
+from src.worklist_engine import WorklistEngine
+
+# the metrics of a circuit that cost models weigh, see circuit_metrics
+METRICS = ('depth', 'gates', 'cnots', 'two_qubit_gates')
+
+def circuit_metrics(circuit):
+    """Returns the metrics of a circuit that cost models weigh. The operations of a
+    CompactCircuit are counted with NumPy in one pass over its arrays and the operations of
+    a Cirq circuit in one pass over its moments.
+
+    Args:
+        circuit (cirq.AbstractCircuit, CompactCircuit or WorklistEngine): circuit whose metrics are computed
+
+    Returns:
+        metrics (dict(str, int)): depth (number of moments), gates (number of operations),
+                                  cnots (number of CNOTs and multi-target CNOTs) and
+                                  two_qubit_gates (number of two-qubit gates when every
+                                  multi-target CNOT is split into one CNOT per target)
+    """
+    if isinstance(circuit, (CompactCircuit, WorklistEngine)):
+        compact_circuit = circuit.circuit if isinstance(circuit, WorklistEngine) else circuit
+        kind_counts, n_two_qubit_gates = compact_circuit.gate_counts()
+        return {'depth': len(circuit), 'gates': compact_circuit.n_operations,
+                'cnots': kind_counts[GateKind.CNOT] + kind_counts[GateKind.MULTI_CNOT],
+                'two_qubit_gates': n_two_qubit_gates}
+
+    n_gates = n_cnots = n_two_qubit_gates = 0
+    for operation in circuit.all_operations():
+        n_gates += 1
+        n_qubits = len(operation.qubits)
+        if n_qubits >= 2 and (is_cnot_with_multiple_targets(operation) or operation.gate == cirq.CNOT):
+            n_cnots += 1
+            n_two_qubit_gates += n_qubits - 1
+        elif n_qubits == 2:
+            n_two_qubit_gates += 1
+    return {'depth': len(circuit), 'gates': n_gates, 'cnots': n_cnots, 'two_qubit_gates': n_two_qubit_gates}
+
+class CostModel:
+    """Weighted sum of the metrics of circuit_metrics. The optimizers keep the circuit with
+    the lowest cost, so a cost model decides what an optimized circuit is. Any function that
+    takes a circuit and returns a number can be used as a cost model as well.
+    """
+
+    def __init__(self, depth=0, gates=0, cnots=0, two_qubit_gates=0):
+        """
+        Args:
+            depth (float): weight of the number of moments
+            gates (float): weight of the number of operations
+            cnots (float): weight of the number of CNOTs and multi-target CNOTs
+            two_qubit_gates (float): weight of the number of two-qubit gates when every
+                                     multi-target CNOT is split into one CNOT per target
+        """
+        self.weights = {'depth': depth, 'gates': gates, 'cnots': cnots, 'two_qubit_gates': two_qubit_gates}
+        if any(weight < 0 for weight in self.weights.values()):
+            raise ValueError("The weights of a cost model must not be negative")
+
+    def __repr__(self):
+        weights = ', '.join(f"{metric}={weight}" for metric, weight in self.weights.items() if weight)
+        return f"CostModel({weights})"
+
+    def __call__(self, circuit):
+        """Returns the cost of a cirq.AbstractCircuit, CompactCircuit or WorklistEngine"""
+        cost = self.weights['depth'] * len(circuit)
+        # the depth is known without counting the operations of a Cirq circuit
+        if any(self.weights[metric] for metric in METRICS[1:]):
+            metrics = circuit_metrics(circuit)
+            cost += sum(self.weights[metric] * metrics[metric] for metric in METRICS[1:])
+        return cost
+
+DEPTH = CostModel(depth=1)
+GATE_COUNT = CostModel(gates=1)
+CNOT_COUNT = CostModel(cnots=1)
+TWO_QUBIT_GATE_COUNT = CostModel(two_qubit_gates=1)
+# the built-in cost models by the names the optimizers accept
+COST_MODELS = {'depth': DEPTH, 'gate_count': GATE_COUNT, 'cnot_count': CNOT_COUNT,
+               'two_qubit_gate_count': TWO_QUBIT_GATE_COUNT}
+
+class CircuitCost:
+    """Cost model of a function from a cirq.Circuit to a number. The optimizers keep circuits
+    as CompactCircuits or WorklistEngines on the compact and worklist backends, which are
+    converted to a cirq.Circuit before the function is called, so a CostModel is faster there.
+    """
+
+    def __init__(self, function):
+        """
+        Args:
+            function (function): function from a cirq.Circuit to its cost
+        """
+        self.function = function
+
+    def __repr__(self):
+        return f"CircuitCost({self.function!r})"
+
+    def __call__(self, circuit):
+        """Returns the cost of a cirq.AbstractCircuit, CompactCircuit or WorklistEngine"""
+        if isinstance(circuit, WorklistEngine):
+            circuit = circuit.circuit
+        if isinstance(circuit, CompactCircuit):
+            circuit = circuit.to_circuit()
+        return self.function(circuit)
+
+def get_cost_model(cost, picklable=False):
+    """Returns the cost model given to an optimizer
+
+    Args:
+        cost (str, CostModel or function): name of a built-in cost model ('depth', 'gate_count',
+                                           'cnot_count' or 'two_qubit_gate_count'), a
+                                           CostModel or a function from a cirq.Circuit to a
+                                           number. None is 'depth'.
+        picklable (bool): if True the cost model is checked to be picklable, which it has to be
+                          when it is sent to worker processes
+
+    Returns:
+        cost_model (function): function from a circuit of any backend to its cost, a function
+                               given as cost is wrapped in a CircuitCost
+    """
+    if cost is None:
+        return DEPTH
+    if isinstance(cost, str):
+        if cost not in COST_MODELS:
+            raise ValueError(f"Unknown cost model {cost!r}, expected one of {list(COST_MODELS)}")
+        return COST_MODELS[cost]
+    if not callable(cost):
+        raise ValueError(f"cost must be the name of a cost model or a function, got {cost!r}")
+    if picklable:
+        try:
+            pickle.dumps(cost)
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            raise ValueError(f"With n_workers != 1 the cost function must be picklable, e.g. defined at "
+                             f"module level instead of a lambda, got {cost!r}") from error
+    return cost if isinstance(cost, (CostModel, CircuitCost)) else CircuitCost(cost)
@@ -0,0 +1,113 @@
+import sys
+import numpy as np
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit, GateKind
+
+_H = int(GateKind.H)
+_OTHER = int(GateKind.OTHER)
+
+def _gate_layers(compact_circuit, qubit_map):
+    """Splits the gates of a circuit into layers of gates on distinct qubits in time order.
+    The targets of a multi-target CNOT are split over consecutive layers, because the CNOTs
+    with a common control commute and each layer may only touch a qubit once.
+
+    Args:
+        compact_circuit (CompactCircuit): circuit of H, CNOT and multi-target CNOT gates
+        qubit_map (np.ndarray): tableau column of each qubit of the circuit
+
+    Yields:
+        is_hadamard (bool): True for a layer of Hadamards and False for a layer of CNOTs
+        qubits (np.ndarray): the qubits of the Hadamards or the control qubits of the CNOTs
+        targets (np.ndarray): the target qubits of the CNOTs, None for Hadamards
+    """
+    ops, moment_inds, qubit_counts, qubit_inds = compact_circuit.packed_operations()
+    kinds = compact_circuit.kind[ops]
+    if (kinds == _OTHER).any():
+        raise ValueError("Only circuits of H, CNOT and multi-target CNOT gates can be checked")
+    if len(ops) == 0:
+        return
+
+    qubit_inds = qubit_map[qubit_inds]
+    op_starts = np.cumsum(qubit_counts) - qubit_counts
+    inc_op = np.repeat(np.arange(len(ops)), qubit_counts)
+    positions = np.arange(len(qubit_inds)) - op_starts[inc_op]
+    controls = qubit_inds[op_starts[inc_op]]
+    is_hadamard = kinds[inc_op] == _H
+    # a Hadamard is layer 0 of its moment and the k'th target of a CNOT is layer k
+    selected = np.flatnonzero(is_hadamard | (positions > 0))
+    layers = moment_inds[inc_op[selected]].astype(np.int64) * (int(qubit_counts.max()) + 1) + positions[selected]
+    order = np.argsort(layers, kind='stable')
+    selected, layers = selected[order], layers[order]
+    bounds = np.concatenate(([0], np.flatnonzero(layers[1:] != layers[:-1]) + 1, [len(layers)]))
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        incs = selected[start:end]
+        if is_hadamard[incs[0]]:
+            yield True, qubit_inds[incs], None
+        else:
+            yield False, controls[incs], qubit_inds[incs]
+
+def clifford_tableau(circuit, qubits=None):
+    """Computes the stabilizer tableau of a circuit of H, CNOT and multi-target CNOT gates,
+    i.e. the Pauli operators the circuit maps each X_i and Z_i to. Two such circuits are
+    equal up to a global phase exactly when their tableaux are equal. The gates are applied
+    one layer of gates on distinct qubits at a time with NumPy, so the time grows with the
+    number of layers times the number of qubits.
+
+    Args:
+        circuit (cirq.AbstractCircuit or CompactCircuit): circuit whose tableau is computed
+        qubits (list(cirq.Qid)): qubits in the order of the tableau columns, the sorted
+                                 qubits of the circuit if None
+
+    Returns:
+        x (np.ndarray): x[i, j] is True if the image of generator i has an X or Y on qubit j,
+                        where generators 0...n-1 are X_0...X_n-1 and n...2n-1 are Z_0...Z_n-1
+        z (np.ndarray): z[i, j] is True if the image of generator i has a Z or Y on qubit j
+        r (np.ndarray): r[i] is True if the image of generator i has a minus sign
+    """
+    compact_circuit = circuit if isinstance(circuit, CompactCircuit) else CompactCircuit.from_circuit(circuit)
+    qubits = sorted(compact_circuit.qubits) if qubits is None else list(qubits)
+    qubit_index = {qubit: ind for ind, qubit in enumerate(qubits)}
+    if any(qubit not in qubit_index for qubit in compact_circuit.qubits):
+        raise ValueError("qubits must contain all qubits of the circuit")
+    qubit_map = np.array([qubit_index[qubit] for qubit in compact_circuit.qubits], dtype=np.int64)
+
+    n_qubits = len(qubits)
+    identity = np.eye(n_qubits, dtype=bool)
+    zeros = np.zeros((n_qubits, n_qubits), dtype=bool)
+    x = np.vstack([identity, zeros])
+    z = np.vstack([zeros, identity])
+    r = np.zeros(2 * n_qubits, dtype=bool)
+    for is_hadamard, layer_qubits, targets in _gate_layers(compact_circuit, qubit_map):
+        if is_hadamard:
+            # H maps X to Z, Z to X and Y to -Y
+            x_columns, z_columns = x[:, layer_qubits], z[:, layer_qubits]
+            r ^= np.logical_xor.reduce(x_columns & z_columns, axis=1)
+            x[:, layer_qubits], z[:, layer_qubits] = z_columns, x_columns
+        else:
+            x_controls, z_controls = x[:, layer_qubits], z[:, layer_qubits]
+            x_targets, z_targets = x[:, targets], z[:, targets]
+            r ^= np.logical_xor.reduce(x_controls & z_targets & ~(x_targets ^ z_controls), axis=1)
+            x[:, targets] = x_targets ^ x_controls
+            z[:, layer_qubits] = z_controls ^ z_targets
+
+    return x, z, r
+
+def circuits_are_equivalent(circuit1, circuit2):
+    """Checks if two circuits of H, CNOT and multi-target CNOT gates have the same effect up
+    to a global phase by comparing their stabilizer tableaux. This works for circuits far
+    beyond the size for which unitaries can be compared. A qubit that only one of the
+    circuits acts on is treated as idle in the other.
+
+    Args:
+        circuit1 (cirq.AbstractCircuit or CompactCircuit): first circuit
+        circuit2 (cirq.AbstractCircuit or CompactCircuit): second circuit
+
+    Returns:
+        True if the circuits are equivalent
+        False if not
+    """
+    compact_circuit1 = circuit1 if isinstance(circuit1, CompactCircuit) else CompactCircuit.from_circuit(circuit1)
+    compact_circuit2 = circuit2 if isinstance(circuit2, CompactCircuit) else CompactCircuit.from_circuit(circuit2)
+    qubits = sorted(set(compact_circuit1.qubits) | set(compact_circuit2.qubits))
+    return all(np.array_equal(array1, array2) for array1, array2 in
+               zip(clifford_tableau(compact_circuit1, qubits), clifford_tableau(compact_circuit2, qubits)))
@@ -1,5 +1,24 @@
+import math
 import cirq
 
+class FanoutCNOT(cirq.ControlledOperation):
+    """Multi-target-qubit CNOT created by the transformers. It is the same
+    cirq.ControlledOperation as the one create_cnot_with_multiple_targets returns, and the
+    two are equal, but it is built without Cirq's Pauli products and keeps its control and
+    target qubits. So recognising it and reading its targets does not build Cirq gates.
+    Cirq cannot serialize it, so the optimizers convert it back with without_fanout_cnots.
+    """
+
+    def __init__(self, control_qubit, target_qubits):
+        """
+        Args:
+            control_qubit (cirq.Qid): control qubit
+            target_qubits (tuple(cirq.Qid)): at least two target qubits
+        """
+        super().__init__([control_qubit], cirq.PauliString({target_qubit: cirq.X for target_qubit in target_qubits}))
+        self.control_qubit = control_qubit
+        self.target_qubits = tuple(target_qubits)
+
 def is_cnot_with_multiple_targets(operation):
     """Checks if a Cirq operation is a multi-target-qubit CNOT
 
@@ -10,6 +29,8 @@ def is_cnot_with_multiple_targets(operation):
         True if operation is multi-target-qubit CNOT
         False if not    
     """
+    if type(operation) is FanoutCNOT:
+        return True
     if type(operation.gate) != cirq.ControlledGate:
         return False
     
@@ -19,10 +40,28 @@ def is_cnot_with_multiple_targets(operation):
         
     return True
 
+def is_fanout_cnot(operation):
+    """Checks if a Cirq operation is a multi-target-qubit CNOT that a FanoutCNOT can replace,
+    that is one with a single control qubit that is active in state 1
+
+    Args:
+        operation: Cirq operation
+
+    Returns:
+        True if operation is such a multi-target-qubit CNOT
+        False if not
+    """
+    if type(operation) is FanoutCNOT:
+        return True
+    return (isinstance(operation, cirq.ControlledOperation) and len(operation.controls) == 1 and
+            operation.control_values == cirq.ProductOfSums(((1,),)) and
+            isinstance(operation.sub_operation, cirq.PauliString) and operation.sub_operation.coefficient == 1 and
+            all(pauli == cirq.X for pauli in operation.sub_operation.values()))
+
 def flat_probs_to_matrix(flatprobs):
     """Creates a square matrix from vector values and adds 0 to
-       diagonal entries. Currently assumes that the result should
-       be a 6x6 matrix.
+       diagonal entries. The vector holds the off-diagonal entries
+       row by row, so n*(n-1) values give an nxn matrix.
 
     Args:
         flatprobs (list(float)): list of probabilities
@@ -32,16 +71,14 @@ def flat_probs_to_matrix(flatprobs):
                      with 0 on diagonal elements
 
     """
-    probs_matrix = []
-    for i in range(6):
-        temp_list = []
-        if i > 0:
-            temp_list.extend(flatprobs[i*5:i*5+i])
-
-        temp_list.extend([0])
-        if i < 5:
-            temp_list.extend(flatprobs[i*5+i+1:i*5+6])
+    n = (1 + math.isqrt(1 + 4*len(flatprobs))) // 2
+    if n*(n-1) != len(flatprobs):
+        raise ValueError(f"{len(flatprobs)} probabilities do not fill the off-diagonal entries of a square matrix")
 
+    probs_matrix = []
+    for i in range(n):
+        temp_list = list(flatprobs[i*(n-1):(i+1)*(n-1)])
+        temp_list.insert(i, 0)
         probs_matrix.append(temp_list)
 
     return probs_matrix
@@ -57,9 +94,91 @@ def create_cnot_with_multiple_targets(target_qubits, control_qubit):
         op (Cirq's ControlleOperation): multi-target-qubit CNOT operation
 
     """
-    op = 1
-    for target_qubit in target_qubits:
-        op *= cirq.X(target_qubit)
+    # the same operation as the product of the X gates controlled by control_qubit
+    return cirq.ControlledOperation([control_qubit],
+                                    cirq.PauliString({target_qubit: cirq.X for target_qubit in target_qubits}))
+
+def _replace_operations(circuit, replacement):
+    """Returns circuit with every operation replaced by replacement(operation), which returns
+    None to keep an operation. Moments without replaced operations are shared and circuit
+    itself is returned if no operation is replaced.
+    """
+    moments = []
+    replaced = False
+    for moment in circuit:
+        new_operations = [replacement(operation) for operation in moment.operations]
+        if all(new_operation is None for new_operation in new_operations):
+            moments.append(moment)
+            continue
+        replaced = True
+        moments.append(cirq.Moment(operation if new_operation is None else new_operation
+                                   for operation, new_operation in zip(moment.operations, new_operations)))
+    return cirq.Circuit.from_moments(*moments) if replaced else circuit
+
+def with_fanout_cnots(circuit):
+    """Replaces the multi-target-qubit CNOTs with a single control qubit of a circuit
+    with FanoutCNOTs, see is_fanout_cnot
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is converted
+
+    Returns:
+        circuit (cirq.Circuit): the converted circuit, or circuit if it has no other
+                                multi-target-qubit CNOTs
+    """
+    def replacement(operation):
+        if type(operation) is FanoutCNOT or len(operation.qubits) < 3 or not is_fanout_cnot(operation):
+            return None
+        return FanoutCNOT(operation.qubits[0], operation.qubits[1:])
 
-    op = op.controlled_by(control_qubit)    
-    return op
\ No newline at end of file
+    return _replace_operations(circuit.unfreeze(copy=False), replacement)
+
+def without_fanout_cnots(circuit):
+    """Replaces the FanoutCNOTs of a circuit with the operations of create_cnot_with_multiple_targets
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is converted
+
+    Returns:
+        circuit (cirq.Circuit): the converted circuit, or circuit if it has no FanoutCNOTs
+    """
+    def replacement(operation):
+        if type(operation) is not FanoutCNOT:
+            return None
+        return create_cnot_with_multiple_targets(operation.target_qubits, operation.control_qubit)
+
+    return _replace_operations(circuit.unfreeze(copy=False), replacement)
+
+def n_operations(circuit):
+    """Returns the number of operations of a cirq.Circuit or a CompactCircuit"""
+    if hasattr(circuit, 'n_operations'):
+        return circuit.n_operations
+    return sum(len(moment) for moment in circuit)
+
+def circuit_structure(circuit):
+    """Hashable structure of a circuit. Equal circuits have equal structures and, unlike
+    their fingerprints, different circuits never do, so results computed for a circuit can
+    be stored by its structure.
+
+    Args:
+        circuit (cirq.AbstractCircuit or CompactCircuit): circuit whose structure is returned
+
+    Returns:
+        structure (tuple): the moments of a Cirq circuit or CompactCircuit.structure()
+    """
+    if hasattr(circuit, 'structure'):
+        return circuit.structure()
+    return tuple(circuit.moments)
+
+def circuit_fingerprint(circuit):
+    """Cheap structural hash of a circuit. Equal circuits have equal fingerprints, so a
+    transformer that returns a circuit with the same fingerprint as its input did not
+    change the circuit.
+
+    Args:
+        circuit (cirq.AbstractCircuit or CompactCircuit): circuit that is hashed
+
+    Returns:
+        fingerprint (int): hash of the circuit
+    """
+    return hash(circuit_structure(circuit))
\ No newline at end of file
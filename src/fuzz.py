@@ -0,0 +1,276 @@
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import cirq
+import numpy as np
+sys.path.append('../')
+from src.compact_circuit import CompactCircuit
+from src.equivalence import clifford_tableau
+from src.functions import circuit_fingerprint, create_cnot_with_multiple_targets, is_cnot_with_multiple_targets
+from src.random_circuit_generator import create_random_circuits
+from src.registry import DEFAULT_REGISTRY
+from src.worklist_engine import WorklistEngine
+
+# fuzzing arguments of a worker process, set once per worker by _init_worker
+_worker_settings = None
+
+def _start_state(circuit, backend):
+    """Returns what the transformers of backend are applied to for a cirq.Circuit"""
+    if backend == 'cirq':
+        return circuit.unfreeze(copy=True)
+    compact_circuit = CompactCircuit.from_circuit(circuit)
+    return WorklistEngine(compact_circuit) if backend == 'worklist' else compact_circuit
+
+def _state_circuit(state):
+    """Returns the circuit of a transformer input or output"""
+    return state.compact_circuit() if isinstance(state, WorklistEngine) else state
+
+def _tableaux_equal(tableau, circuit, qubits):
+    """Returns True if circuit on qubits has the stabilizer tableau tableau"""
+    try:
+        new_tableau = clifford_tableau(circuit, qubits)
+    except ValueError:
+        # the circuit acts on a qubit that the input circuit does not act on
+        return False
+    return all(np.array_equal(array, new_array) for array, new_array in zip(tableau, new_tableau))
+
+def check_schedule(circuit, schedule, backend='compact', registry=None):
+    """Applies the transformers of schedule to circuit one after the other and checks after
+    each of them that
+        - the transformer did not raise an exception,
+        - the transformer did not modify its input (except on the worklist backend, which
+          rewrites in place by design),
+        - the transformer did not change the circuit if its match counter returned zero,
+        - the circuit still has the same effect as the input circuit (src/equivalence.py).
+
+    Args:
+        circuit (cirq.Circuit): circuit of H, CNOT and multi-target CNOT gates
+        schedule (list(int)): indices of the transformers in registry
+        backend (str): backend whose transformers are checked
+        registry (TransformerRegistry): transformers that are checked, the six identities of
+                                        the problem description (src/registry.py) if None
+
+    Returns:
+        failure (dict): the first violated check, None if all checks pass. It has the keys
+                        kind ('exception', 'modified_input', 'changed_with_zero_matches' or
+                        'not_equivalent'), step (position in schedule), transformer (name)
+                        and message.
+    """
+    registry = DEFAULT_REGISTRY if registry is None else registry
+    function_list = registry.function_list(backend)
+    match_counter_list = registry.match_counter_list(backend)
+    state = _start_state(circuit, backend)
+    qubits = sorted(circuit.all_qubits())
+    # the tableau of the input is compared with the tableau after each transformer
+    tableau = clifford_tableau(_state_circuit(state), qubits)
+    for step, function_ind in enumerate(schedule):
+        failure = {'step': step, 'transformer': registry.names[function_ind]}
+        input_fingerprint = circuit_fingerprint(_state_circuit(state))
+        try:
+            n_matches = match_counter_list[function_ind](state)
+            new_state = function_list[function_ind](state)
+            new_circuit = _state_circuit(new_state)
+        except Exception as error:
+            return {'kind': 'exception', **failure, 'message': f"{type(error).__name__}: {error}"}
+
+        if backend != 'worklist' and circuit_fingerprint(state) != input_fingerprint:
+            return {'kind': 'modified_input', **failure, 'message': "The transformer modified its input circuit"}
+        if n_matches == 0 and circuit_fingerprint(new_circuit) != input_fingerprint:
+            return {'kind': 'changed_with_zero_matches', **failure,
+                    'message': "The match counter returned 0 but the transformer changed the circuit"}
+        if not _tableaux_equal(tableau, new_circuit, qubits):
+            return {'kind': 'not_equivalent', **failure,
+                    'message': "The circuit no longer has the same effect as the input circuit"}
+        state = new_state
+    return None
+
+def _without_operations(moments, removed):
+    """Returns a circuit of moments (list(list(cirq.Operation))) without the operations whose
+    (moment index, position) is in removed
+    """
+    return cirq.Circuit(cirq.Moment(op for position, op in enumerate(moment) if (moment_ind, position) not in removed)
+                        for moment_ind, moment in enumerate(moments))
+
+def _smaller_circuits(circuit):
+    """Yields circuits with fewer operations, moments or CNOT targets than circuit, the
+    largest reductions first
+    """
+    moments = [list(moment) for moment in circuit]
+    positions = [(moment_ind, position) for moment_ind, moment in enumerate(moments) for position in range(len(moment))]
+    # halves, quarters and so on of the operations, down to single operations
+    chunk_size = len(positions) // 2
+    while chunk_size >= 1:
+        for start in range(0, len(positions), chunk_size):
+            yield _without_operations(moments, set(positions[start:start+chunk_size]))
+        chunk_size //= 2
+
+    if any(not moment for moment in moments):
+        yield cirq.Circuit(cirq.Moment(moment) for moment in moments if moment)
+
+    for moment_ind, position in positions:
+        op = moments[moment_ind][position]
+        if is_cnot_with_multiple_targets(op):
+            control_qubit, target_qubits = op.qubits[0], op.qubits[1:]
+            for target_ind in range(len(target_qubits)):
+                remaining = target_qubits[:target_ind] + target_qubits[target_ind+1:]
+                smaller_op = (cirq.CNOT(control_qubit, remaining[0]) if len(remaining) == 1 else
+                              create_cnot_with_multiple_targets(remaining, control_qubit))
+                smaller_moments = [list(moment) for moment in moments]
+                smaller_moments[moment_ind][position] = smaller_op
+                yield cirq.Circuit(cirq.Moment(moment) for moment in smaller_moments)
+
+def shrink_failure(circuit, schedule, backend='compact', registry=None):
+    """Shrinks a circuit and a schedule for which check_schedule fails to a small reproducer.
+    Steps of the schedule, groups of operations, single operations, empty moments and
+    targets of multi-target CNOTs are removed greedily as long as the check still fails in
+    the same way (same kind and transformer), until no single removal keeps it failing.
+
+    Args:
+        circuit (cirq.Circuit): circuit for which check_schedule fails
+        schedule (list(int)): transformer indices for which check_schedule fails
+        backend (str): backend argument of check_schedule
+        registry (TransformerRegistry): registry argument of check_schedule
+
+    Returns:
+        circuit (cirq.Circuit): the shrunk circuit
+        schedule (list(int)): the shrunk schedule
+        failure (dict): the failure of check_schedule for the shrunk circuit and schedule
+    """
+    failure = check_schedule(circuit, schedule, backend, registry)
+    if failure is None:
+        raise ValueError("check_schedule does not fail for the circuit and the schedule")
+
+    def fails_alike(candidate_circuit, candidate_schedule):
+        candidate_failure = check_schedule(candidate_circuit, candidate_schedule, backend, registry)
+        if (candidate_failure is None or candidate_failure['kind'] != failure['kind'] or
+            candidate_failure['transformer'] != failure['transformer']):
+            return None
+        return candidate_failure
+
+    schedule = list(schedule[:failure['step']+1])
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for step in range(len(schedule) - 1):
+            candidate_failure = fails_alike(circuit, schedule[:step] + schedule[step+1:])
+            if candidate_failure is not None:
+                schedule = schedule[:step] + schedule[step+1:]
+                schedule = schedule[:candidate_failure['step']+1]
+                failure = candidate_failure
+                shrunk = True
+                break
+        if shrunk:
+            continue
+        for candidate_circuit in _smaller_circuits(circuit):
+            candidate_failure = fails_alike(candidate_circuit, schedule)
+            if candidate_failure is not None:
+                circuit, failure = candidate_circuit, candidate_failure
+                schedule = schedule[:failure['step']+1]
+                shrunk = True
+                break
+    return circuit, schedule, failure
+
+def _fuzz_circuit(circuit_ind, settings):
+    """Checks the single transformers and random chains of one fuzzing circuit on every backend
+    and returns its failures, see fuzz_transformers
+    """
+    seed, n_qubits, n_templates, n_chains, chain_length, backends, registry, shrink = settings
+    rng = np.random.default_rng([seed, circuit_ind])
+    circuit = next(create_random_circuits(n_qubits, n_templates, seed=rng))
+    schedules = [[function_ind] for function_ind in range(len(registry))]
+    schedules += rng.integers(len(registry), size=(n_chains, chain_length)).tolist()
+    failures = []
+    for backend in backends:
+        for schedule in schedules:
+            failure = check_schedule(circuit, schedule, backend, registry)
+            if failure is None:
+                continue
+            failure_circuit, failure_schedule = circuit, schedule
+            if shrink:
+                failure_circuit, failure_schedule, failure = shrink_failure(circuit, schedule, backend, registry)
+            failures.append({'circuit_ind': circuit_ind, 'backend': backend, 'schedule': failure_schedule,
+                             'circuit': failure_circuit, **failure})
+            # the first failure of a backend is enough, the other schedules usually hit the same bug
+            break
+    return failures
+
+def _init_worker(settings):
+    """Stores the fuzzing arguments in a worker process"""
+    global _worker_settings
+    _worker_settings = settings
+
+def _fuzz_circuit_in_worker(circuit_ind):
+    """Checks one fuzzing circuit in a worker process, see _fuzz_circuit"""
+    return _fuzz_circuit(circuit_ind, _worker_settings)
+
+def fuzz_transformers(n_circuits=1000, n_qubits=4, n_templates=10, seed=0, n_chains=2, chain_length=5, backends=None,
+                      n_workers=1, registry=None, shrink=True):
+    """Differential fuzzing of the transformers. Each of n_circuits random circuits is
+    created with create_random_circuits from seed and its position, and every transformer
+    of registry as well as n_chains random chains of chain_length transformers are applied
+    to it on every backend and checked with check_schedule. The first failing schedule of
+    a circuit and backend is shrunk to a small reproducer with shrink_failure. The results
+    do not depend on n_workers.
+
+    Args:
+        n_circuits (int): how many random circuits are checked
+        n_qubits (int): n_qubits argument of create_random_circuits
+        n_templates (int): n_templates argument of create_random_circuits
+        seed (int): seed of the circuits and the chains
+        n_chains (int): how many random chains are applied to each circuit
+        chain_length (int): how many transformers each random chain applies
+        backends (list(str)): backends whose transformers are checked, all backends of
+                              registry if None
+        n_workers (int): how many processes check circuits in parallel. 1 checks them in
+                         the calling process and None uses all available cores.
+        registry (TransformerRegistry): transformers that are checked, the six identities of
+                                        the problem description (src/registry.py) if None
+        shrink (bool): if True the failing circuits and schedules are shrunk
+
+    Returns:
+        failures (list(dict)): the failures of check_schedule in the order of the circuits,
+                               each with the circuit_ind, backend, schedule and circuit
+                               (shrunk if shrink is True) that reproduce it
+    """
+    registry = DEFAULT_REGISTRY if registry is None else registry
+    backends = registry.backends if backends is None else list(backends)
+    for backend in backends:
+        if backend not in registry.backends:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {registry.backends}")
+    settings = (seed, n_qubits, n_templates, n_chains, chain_length, backends, registry, shrink)
+
+    if n_workers == 1:
+        return [failure for circuit_ind in range(n_circuits) for failure in _fuzz_circuit(circuit_ind, settings)]
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(settings,)) as executor:
+        results = executor.map(_fuzz_circuit_in_worker, range(n_circuits), chunksize=max(n_circuits // 64, 1))
+        return [failure for circuit_failures in results for failure in circuit_failures]
+
+def main(argv=None):
+    """Command line entry point, fuzzes the transformers and prints a reproducer of each failure"""
+    parser = argparse.ArgumentParser(description='Check the transformers on random circuits.')
+    parser.add_argument('--n-circuits', type=int, default=1000)
+    parser.add_argument('--n-qubits', type=int, default=4)
+    parser.add_argument('--n-templates', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n-chains', type=int, default=2)
+    parser.add_argument('--chain-length', type=int, default=5)
+    parser.add_argument('--backend', action='append', choices=DEFAULT_REGISTRY.backends,
+                        help='backend to check, can be repeated (all backends by default)')
+    parser.add_argument('--n-workers', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    failures = fuzz_transformers(args.n_circuits, args.n_qubits, args.n_templates, seed=args.seed,
+                                 n_chains=args.n_chains, chain_length=args.chain_length, backends=args.backend,
+                                 n_workers=args.n_workers)
+    for failure in failures:
+        names = [DEFAULT_REGISTRY.names[function_ind] for function_ind in failure['schedule']]
+        print(f"circuit {failure['circuit_ind']} backend {failure['backend']}: {failure['kind']} "
+              f"in {failure['transformer']}: {failure['message']}")
+        print(f"schedule {names}")
+        print(failure['circuit'])
+        print()
+    print(f"{len(failures)} failures in {args.n_circuits} circuits")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
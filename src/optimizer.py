@@ -1,56 +1,459 @@
+import math
 import random
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 sys.path.append('../')
-from src.transformers import (
-    remove_double_hadamards,
-    combine_cnots, 
-    remove_double_cnots,
-    hadamards_and_cnot_to_cnot, 
-    cnot_to_hadamards_and_cnot, 
-    combine_cnots_with_controls_surrounded_by_hadamards
-)
-
-_FUNCTION_LIST = [
-    remove_double_hadamards, 
-    combine_cnots, 
-    remove_double_cnots,
-    hadamards_and_cnot_to_cnot, 
-    cnot_to_hadamards_and_cnot, 
-    combine_cnots_with_controls_surrounded_by_hadamards
-]
-
-def optimize(circuit, initial_probs, transition_probs, n_iter=50, n_opt_circuits=20):
+from src.compact_circuit import CompactCircuit
+from src.cost_models import DEPTH, get_cost_model
+from src.equivalence import circuits_are_equivalent
+from src.functions import circuit_structure, n_operations, with_fanout_cnots, without_fanout_cnots
+from src.registry import DEFAULT_REGISTRY
+from src.stats import OptimizerStats
+from src.transposition_cache import TranspositionCache
+from src.wire_index import WireIndex
+from src.worklist_engine import WorklistEngine
+
+# transformers and match counters of the default identities for each backend, in the order
+# of the transition matrices
+_BACKEND_FUNCTION_LISTS = {backend: DEFAULT_REGISTRY.function_list(backend) for backend in DEFAULT_REGISTRY.backends}
+_BACKEND_MATCH_COUNTER_LISTS = {backend: DEFAULT_REGISTRY.match_counter_list(backend)
+                                for backend in DEFAULT_REGISTRY.backends}
+
+# circuit being optimized by a worker process, the transposition cache shared by the
+# chains of the worker and the registry of the identities, set once per worker by _init_worker
+_worker_circuit = None
+_worker_cache = None
+_worker_registry = None
+
+def _chain_seeds(seed, n_opt_circuits):
+    """Draws a seed for each optimized circuit. If seed is None the seeds are drawn
+    from the global random state.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    return [rng.getrandbits(64) for _ in range(n_opt_circuits)]
+
+def _cumulative_tables(initial_probs, transition_probs, n_transformers):
+    """Normalizes the probability distributions of optimize once into cumulative tables.
+    A row with zero total weight is all zeros, so no uniform number selects a transformer
+    from it.
+
+    Returns:
+        initial_table (numpy.ndarray): cumulative distribution of the first transformer
+        transition_table (numpy.ndarray): cumulative distribution of the next transformer
+                                          for each previous transformer
+    """
+    initial_weights = np.asarray(initial_probs, dtype=float)
+    transition_weights = np.asarray(transition_probs, dtype=float)
+    if initial_weights.shape != (n_transformers,) or transition_weights.shape != (n_transformers, n_transformers):
+        raise ValueError(f"initial_probs must have {n_transformers} entries and transition_probs must be a "
+                         f"{n_transformers}x{n_transformers} matrix, one entry for each registered identity")
+    if (initial_weights < 0).any() or (transition_weights < 0).any():
+        raise ValueError("The probabilities must not be negative")
+    if initial_weights.sum() <= 0:
+        raise ValueError("initial_probs must have a positive entry")
+
+    weights = np.vstack([initial_weights, transition_weights])
+    totals = weights.sum(axis=1, keepdims=True)
+    tables = np.divide(np.cumsum(weights, axis=1), totals, out=np.zeros_like(weights), where=totals > 0)
+    # the entries from the last positive weight on are exactly 1, so rounding can never
+    # select a transformer with zero weight
+    positive = weights > 0
+    last_positive = n_transformers - 1 - np.argmax(positive[:, ::-1], axis=1)
+    tables[(np.arange(n_transformers) >= last_positive[:, None]) & positive.any(axis=1, keepdims=True)] = 1.0
+    return tables[0], tables[1:]
+
+def _draw_schedules(initial_table, transition_table, uniforms):
+    """Turns uniform numbers into the transformers chosen by every chain. The transformer
+    that a uniform number selects from a cumulative row is the number of entries not above
+    it, which NumPy computes for all uniform numbers and all previous transformers at once.
+    What is left is following each chain through these choices, which is a list lookup
+    per iteration.
+
+    Args:
+        initial_table (numpy.ndarray): cumulative distribution of the first transformer
+        transition_table (numpy.ndarray): cumulative transition distributions
+        uniforms (numpy.ndarray): uniform numbers in [0, 1), one row per chain and one column
+                                  per iteration
+
+    Returns:
+        schedules (numpy.ndarray): index of the transformer of each chain and iteration
+    """
+    n_transformers = len(initial_table)
+    n_chains, n_steps = uniforms.shape
+    first_inds = np.searchsorted(initial_table, uniforms[:, 0], side='right').tolist()
+    # next_inds[p, chain, i] is the transformer chosen at iteration i of chain after transformer p
+    next_inds = np.stack([np.searchsorted(row, uniforms, side='right') for row in transition_table])
+    schedules = np.empty(uniforms.shape, dtype=np.int64)
+    for chain in range(n_chains):
+        # a row without positive entries selects n_transformers, which then stays selected
+        rows = next_inds[:, chain, :].tolist() + [[n_transformers] * n_steps]
+        function_ind = first_inds[chain]
+        schedule = [function_ind]
+        for i in range(1, n_steps):
+            function_ind = rows[function_ind][i]
+            schedule.append(function_ind)
+        schedules[chain] = schedule
+
+    if (schedules == n_transformers).any():
+        raise ValueError("A row of transition_probs that can be reached has no positive entry")
+    return schedules
+
+def _choose(weights, uniform):
+    """Chooses an index with probability proportional to weights using a uniform number
+    in [0, 1), or returns None if no weight is positive
+    """
+    threshold = uniform * sum(weights)
+    total = 0
+    chosen = None
+    for j, weight in enumerate(weights):
+        if weight > 0:
+            total += weight
+            chosen = j
+            if threshold < total:
+                break
+    return chosen
+
+def _optimize_chain(circuit, schedule, seed, backend, registry=DEFAULT_REGISTRY, stats=None,
+                    detect_fixed_point=True, patience=None, deadline=None, precheck=True, reweight_probs=None,
+                    cache=None, temperature=None, cooling=0.95, stop_event=None, cost=DEPTH):
+    """Optimizes a single copy of the circuit by applying one transformer of registry
+    (TransformerRegistry) for each entry of schedule, which holds the pre-drawn transformer
+    indices. With reweight_probs (initial_probs, transition_probs) the schedule instead
+    holds uniform numbers from which the transformers with matches are chosen, see reweight
+    of optimize. The annealing decisions use a random generator seeded with seed.
+    The circuit is a cirq.Circuit for the cirq backend and a CompactCircuit for the
+    compact and worklist backends. The worklist backend rewrites a WorklistEngine of the
+    circuit in place and returns its circuit as a CompactCircuit. If stats (OptimizerStats)
+    is given every transformer call is recorded in it. See optimize for detect_fixed_point,
+    patience and precheck. The chain also stops when time.time() passes deadline or when
+    stop_event (threading.Event) is set.
+    If cache (TranspositionCache) is given, transformer results stored in it are reused and
+    new results are stored. With a temperature the chain anneals, see optimize, and returns
+    the circuit with the lowest cost (function from a circuit to a number) it visited.
+    """
+    function_list = registry.function_list(backend)
+    match_counter_list = registry.match_counter_list(backend)
+    rng = random.Random(seed)
+    function_inds_list = [j for j in range(len(function_list))]
+    non_expanding_inds = registry.non_expanding_inds()
+    schedule = schedule.tolist()
+    opt_circuit = WorklistEngine(circuit) if backend == 'worklist' else circuit
+    if stats is not None:
+        stats.start_chain(opt_circuit)
+
+    # the non-expanding transformers remove operations whenever they change the circuit, so
+    # the structures are only computed when a transformer kept the number of operations
+    n_ops = n_operations(opt_circuit) if detect_fixed_point else None
+    structure = None
+    # transformers known to leave the current circuit unchanged
+    unchanged_by = set()
+    # match counts of the current circuit and the wire index the cirq counters share
+    match_counts = {}
+    wire_index = None
+    current_cost = cost(opt_circuit)
+    best_cost = current_cost
+    best_circuit = opt_circuit
+    n_stalled = 0
+    stop_reason = 'n_iter'
+    function_ind = None
+    for i in range(len(schedule)):
+        if deadline is not None and time.time() >= deadline:
+            stop_reason = 'time_budget'
+            break
+        if stop_event is not None and stop_event.is_set():
+            stop_reason = 'cancelled'
+            break
+
+        if reweight_probs is None:
+            function_ind = schedule[i]
+        else:
+            weights = reweight_probs[0] if function_ind is None else reweight_probs[1][function_ind]
+            for j in function_inds_list:
+                if weights[j] > 0 and j not in unchanged_by and j not in match_counts:
+                    if backend == 'cirq' and wire_index is None:
+                        wire_index = WireIndex(opt_circuit)
+                    match_counts[j] = _count_matches(match_counter_list[j], opt_circuit, wire_index)
+                    if match_counts[j] == 0:
+                        unchanged_by.add(j)
+
+            function_ind = _choose([0 if j in unchanged_by else weights[j] for j in function_inds_list], schedule[i])
+            if function_ind is None:
+                stop_reason = 'fixed_point'
+                break
+
+        function = function_list[function_ind]
+        if precheck and function_ind not in unchanged_by and function_ind not in match_counts:
+            if backend == 'cirq' and wire_index is None:
+                wire_index = WireIndex(opt_circuit)
+            match_counts[function_ind] = _count_matches(match_counter_list[function_ind], opt_circuit, wire_index)
+            if match_counts[function_ind] == 0:
+                unchanged_by.add(function_ind)
+
+        if function_ind in unchanged_by:
+            if stats is not None:
+                stats.skip(function, opt_circuit)
+        else:
+            entry = None
+            if cache is not None:
+                if structure is None:
+                    structure = circuit_structure(opt_circuit)
+                entry = cache.get(structure, function_ind)
+                if stats is not None:
+                    stats.cache_lookups += 1
+
+            if entry is not None:
+                new_circuit, new_structure = entry[0], entry[1]
+                if stats is not None:
+                    stats.reuse(function, opt_circuit, new_circuit)
+            else:
+                new_circuit = function(opt_circuit) if stats is None else stats.apply(function, opt_circuit)
+                new_structure = None
+                if cache is not None:
+                    new_structure = circuit_structure(new_circuit)
+                    cache.put(structure, function_ind, new_circuit, new_structure)
+
+            changed = True
+            if detect_fixed_point:
+                new_n_ops = n_operations(new_circuit)
+                if new_n_ops == n_ops and new_structure is None:
+                    if structure is None:
+                        structure = circuit_structure(opt_circuit)
+                    new_structure = circuit_structure(new_circuit)
+
+                changed = new_n_ops != n_ops or new_structure != structure
+
+            new_cost = cost(new_circuit) if changed else current_cost
+            if (changed and temperature is not None and
+                not _metropolis_accept((new_cost - current_cost) / max(current_cost, 1),
+                                       temperature * cooling ** i, rng)):
+                # the rejected circuit is dropped and the chain goes on from the current one
+                if stats is not None:
+                    stats.reject(function, opt_circuit)
+            else:
+                if detect_fixed_point:
+                    n_ops = new_n_ops
+                structure = new_structure
+
+                if changed:
+                    unchanged_by = set()
+                    match_counts = {}
+                    wire_index = None
+                else:
+                    unchanged_by.add(function_ind)
+
+                opt_circuit = new_circuit
+                current_cost = new_cost
+
+        if detect_fixed_point and non_expanding_inds <= unchanged_by:
+            stop_reason = 'fixed_point'
+            break
+
+        if current_cost < best_cost:
+            best_cost = current_cost
+            best_circuit = opt_circuit
+            n_stalled = 0
+        else:
+            n_stalled += 1
+            if patience is not None and n_stalled >= patience:
+                stop_reason = 'patience'
+                break
+
+    if stats is not None:
+        stats.stop_reasons.append(stop_reason)
+    if backend == 'worklist':
+        return opt_circuit.compact_circuit()
+    return opt_circuit if temperature is None else best_circuit
+
+def _metropolis_accept(relative_increase, temperature, rng):
+    """Decides if a chain moves to a circuit whose cost is relative_increase times the
+    current cost higher: cheaper circuits and circuits of equal cost are always accepted and
+    costlier ones with probability exp(-relative_increase / temperature), never at temperature
+    zero. The increase is relative because identity e) lengthens a circuit in proportion to its size.
+    """
+    if relative_increase <= 0:
+        return True
+    if temperature <= 0:
+        return False
+    return rng.random() < math.exp(-relative_increase / temperature)
+
+def _count_matches(match_counter, circuit, wire_index):
+    """Returns the match count of a transformer on circuit, wire_index is the shared
+    WireIndex of a Cirq circuit and None for a CompactCircuit
+    """
+    if wire_index is None:
+        return match_counter(circuit)
+    return match_counter(circuit, wire_index)
+
+def _init_worker(compact_circuit, backend, cache_size, registry):
+    """Stores the circuit being optimized and the registry and creates the transposition
+    cache once per worker process
+    """
+    global _worker_circuit, _worker_cache, _worker_registry
+    _worker_circuit = with_fanout_cnots(compact_circuit.to_circuit()) if backend == 'cirq' else compact_circuit
+    _worker_cache = TranspositionCache(cache_size) if cache_size else None
+    _worker_registry = registry
+
+def _optimize_chain_in_worker(args):
+    """Optimizes a single copy of the worker's circuit and returns it as a CompactCircuit
+    together with the statistics of the copy, which are None unless return_stats is True
+    """
+    (schedule, seed, backend, return_stats, detect_fixed_point, patience, deadline, precheck, reweight_probs,
+     temperature, cooling, cost) = args
+    stats = OptimizerStats() if return_stats else None
+    opt_circuit = _optimize_chain(_worker_circuit, schedule, seed, backend, _worker_registry, stats,
+                                  detect_fixed_point, patience, deadline, precheck, reweight_probs, _worker_cache,
+                                  temperature, cooling, cost=cost)
+    return (CompactCircuit.from_circuit(opt_circuit) if backend == 'cirq' else opt_circuit), stats
+
+def _plan_chains(initial_probs, transition_probs, n_iter, n_opt_circuits, seed, backend, reweight, cache_size,
+                 temperature, registry):
+    """Checks the arguments of optimize and draws the seeds and schedules of the chains
+
+    Returns:
+        registry (TransformerRegistry): the given registry or DEFAULT_REGISTRY
+        seeds (list(int)): seed of each chain
+        schedules (numpy.ndarray): schedule of each chain, see _optimize_chain
+        reweight_probs (tuple): the probabilities with reweight and None otherwise
+    """
+    registry = DEFAULT_REGISTRY if registry is None else registry
+    if backend not in registry.backends:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {registry.backends}")
+    if cache_size and backend == 'worklist':
+        raise ValueError("The worklist backend does not support a transposition cache")
+    if temperature is not None and backend == 'worklist':
+        raise ValueError("The worklist backend does not support annealing")
+
+    seeds = _chain_seeds(seed, n_opt_circuits)
+    initial_table, transition_table = _cumulative_tables(initial_probs, transition_probs, len(registry))
+    uniforms = np.random.default_rng(seeds).random((n_opt_circuits, n_iter + 1))
+    if reweight:
+        # the transformers are chosen from the ones with matches while the copies are optimized
+        return registry, seeds, uniforms, (list(initial_probs), [list(row) for row in transition_probs])
+    return registry, seeds, _draw_schedules(initial_table, transition_table, uniforms), None
+
+def optimize(circuit, initial_probs, transition_probs, n_iter=50, n_opt_circuits=20,
+             n_workers=1, seed=None, backend='cirq', return_stats=False, detect_fixed_point=True,
+             patience=None, time_budget=None, precheck=True, reweight=False, cache_size=0,
+             temperature=None, cooling=0.95, registry=None, verify=False, cost=None):
     """Cirq circuit optimizer. Makes multiple copies of the original circuit, randomly 
     applies the circuit identities specified in the problem description on the circuits
-    and outputs the shortest one.
+    and outputs the shortest one, or the cheapest one according to cost.
 
     Args:
         cirucit (cirq.Circuit): circuit that is optimized
         initial_probs (lis(float)): probability distribution for choosing the first transformer
         transition_probs (lis(lis(float))): probability distribution for choosing next transformer
                                             depending on which transformer was previously applied.
-        n_iter (int): how many transformers are applied to a single circuit
+                                            The distributions are normalized once and the
+                                            transformers of all copies are drawn before
+                                            the first one is applied.
+        n_iter (int): at most how many transformers are applied to a single circuit
         n_opt_circuits (int): how many copies of the original circuit are optimized.
+        n_workers (int): how many processes optimize the copies in parallel. 1 optimizes
+                         them in the calling process and None uses all available cores.
+        seed (int): seed from which each copy gets its own seed. With the same seed the
+                    result is the same regardless of n_workers. If None the seeds are drawn
+                    from the global random state.
+        backend (str): 'cirq' applies the transformers of src/transformers.py, 'compact'
+                       converts the circuit once to a CompactCircuit and applies the
+                       transformers of src/compact_transformers.py and 'worklist' rewrites
+                       the CompactCircuit in place with a WorklistEngine, which only
+                       revisits the parts of the circuit changed by earlier rewrites
+        return_stats (bool): if True the call count, time and circuit sizes of every
+                             transformer call and the length of each copy after every
+                             call are recorded and returned
+        detect_fixed_point (bool): if True a transformer is not applied again to a circuit
+                                   it did not change, and a circuit stops being optimized
+                                   once none of the non-expanding transformers change it
+        patience (int): if given, a circuit stops being optimized after this many
+                        transformers in a row did not make it shorter than before
+        time_budget (float): if given, no transformers are applied after this many seconds
+                             and the best circuit found so far is returned
+        precheck (bool): if True the matches of a transformer are counted before it is
+                         applied and it is skipped if there are none, which gives the
+                         same result without copying the circuit
+        reweight (bool): if True the transformers with no matches get zero probability,
+                         so every iteration applies a transformer that changes the circuit.
+                         This changes which transformers are chosen.
+        cache_size (int): if positive, up to this many transformer results are stored by the
+                          structure of the input circuit and reused when another copy
+                          reaches the same circuit. With n_workers > 1 each worker has its
+                          own cache. The result is the same as without the cache. Not
+                          supported by the worklist backend, which rewrites in place.
+        temperature (float): if given, the copies are optimized by simulated annealing: a
+                             transformer result that is longer than the current circuit by
+                             the fraction x of its length is accepted with probability
+                             exp(-x / temperature) and otherwise dropped, and each copy
+                             returns the shortest circuit it visited. 0 rejects every
+                             lengthening. Not supported by the worklist backend.
+        cooling (float): the temperature after i transformers is temperature * cooling ** i
+        registry (TransformerRegistry): identities to choose from in the order of the
+                                        probabilities, the six identities of the problem
+                                        description (src/registry.py) if None
+        verify (bool): if True the result is checked to have the same effect as circuit by
+                       comparing their stabilizer tableaux (src/equivalence.py), and a
+                       RuntimeError is raised if it does not. Only for circuits of H, CNOT
+                       and multi-target CNOT gates.
+        cost (str, CostModel or function): what makes a circuit better, see get_cost_model
+                                           of src/cost_models.py. The result, patience
+                                           and annealing use the cost instead of the
+                                           number of moments. None is the number of moments.
+                                           A function gets a cirq.Circuit on every backend
+                                           and must be picklable with n_workers != 1.
 
     Returns:
-        best_opt_circuit (cirq.Circuit): the shortest optimized circuit
-    """
-    opt_circuits = [None] * n_opt_circuits
-    for circ_ind in range(n_opt_circuits):
-        opt_circuit = circuit.unfreeze(copy=True)
-        function_ind = random.choices([i for i in range(len(_FUNCTION_LIST))],  weights=initial_probs)[0]
-        opt_circuit = _FUNCTION_LIST[function_ind](opt_circuit)
-        for i in range(n_iter):
-            function_inds_list = [j for j in range(len(_FUNCTION_LIST))]              
-            function_ind = random.choices(function_inds_list,  weights=transition_probs[function_ind])[0]
-            opt_circuit = _FUNCTION_LIST[function_ind](opt_circuit)
-
-        opt_circuits[circ_ind] = opt_circuit
-
-    opt_circuit_lens =[len(circuit) for circuit in opt_circuits]
-    best_opt_circuit_ind = opt_circuit_lens.index(min(opt_circuit_lens))
-    best_opt_circuit = opt_circuits[best_opt_circuit_ind]        
-    return best_opt_circuit
-
-    
-            
+        best_opt_circuit (cirq.Circuit): the shortest (cheapest) optimized circuit
+        stats (OptimizerStats): statistics of the run, only returned if return_stats is True
+    """
+    start_time = time.perf_counter()
+    deadline = time.time() + time_budget if time_budget is not None else None
+    cost = get_cost_model(cost, picklable=n_workers != 1)
+    registry, seeds, schedules, reweight_probs = _plan_chains(initial_probs, transition_probs, n_iter, n_opt_circuits,
+                                                              seed, backend, reweight, cache_size, temperature,
+                                                              registry)
+    stats = OptimizerStats() if return_stats else None
+    cache = TranspositionCache(cache_size) if cache_size else None
+    # Only the best chain result is kept alive, so memory does not grow with n_opt_circuits
+    best_chain, best_opt_circuit, best_cost = None, None, None
+    if n_workers == 1:
+        start_circuit = with_fanout_cnots(circuit) if backend == 'cirq' else CompactCircuit.from_circuit(circuit)
+        for chain, chain_seed in enumerate(seeds):
+            opt_circuit = _optimize_chain(start_circuit, schedules[chain], chain_seed, backend, registry, stats,
+                                          detect_fixed_point, patience, deadline, precheck, reweight_probs, cache,
+                                          temperature, cooling, cost=cost)
+            opt_cost = cost(opt_circuit)
+            if best_opt_circuit is None or opt_cost < best_cost:
+                best_chain, best_opt_circuit, best_cost = chain, opt_circuit, opt_cost
+    else:
+        tasks = [(schedule, chain_seed, backend, return_stats, detect_fixed_point, patience, deadline, precheck,
+                  reweight_probs, temperature, cooling, cost)
+                 for schedule, chain_seed in zip(schedules, seeds)]
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(CompactCircuit.from_circuit(circuit), backend, cache_size,
+                                           registry)) as executor:
+            for chain, (opt_circuit, chain_stats) in enumerate(executor.map(_optimize_chain_in_worker, tasks)):
+                opt_cost = cost(opt_circuit)
+                if best_opt_circuit is None or opt_cost < best_cost:
+                    best_chain, best_opt_circuit, best_cost = chain, opt_circuit, opt_cost
+                if stats is not None:
+                    stats.merge(chain_stats)
+
+    if verify and not circuits_are_equivalent(circuit, best_opt_circuit):
+        raise RuntimeError(f"The optimized circuit of chain {best_chain} does not have the same effect as the input")
+
+    if isinstance(best_opt_circuit, CompactCircuit):
+        best_opt_circuit = best_opt_circuit.to_circuit()
+    else:
+        # the transformers create FanoutCNOTs, which are returned as standard Cirq operations
+        best_opt_circuit = without_fanout_cnots(best_opt_circuit)
+        if best_opt_circuit is circuit:
+            best_opt_circuit = circuit.copy()
+
+    if stats is None:
+        return best_opt_circuit
+
+    stats.best_chain = best_chain
+    stats.time_s = time.perf_counter() - start_time
+    return best_opt_circuit, stats
@@ -0,0 +1,246 @@
+import sys
+import time
+import cirq
+sys.path.append('../')
+from src.batch import optimize_many
+from src.cost_models import get_cost_model
+from src.equivalence import circuits_are_equivalent
+from src.stats import OptimizerStats
+
+def _qubit_groups(moments, max_block_qubits):
+    """Splits the qubits of consecutive moments into groups that no operation of the moments
+    connects. Groups with fewer qubits are joined in the order of their smallest qubit as long
+    as they have at most max_block_qubits qubits together.
+
+    Returns:
+        group_of_qubit (dict(cirq.Qid, int)): index of the group of each qubit of the moments
+        n_groups (int): number of groups
+    """
+    parent = {}
+
+    def find(qubit):
+        while parent[qubit] is not qubit:
+            parent[qubit] = parent[parent[qubit]]
+            qubit = parent[qubit]
+        return qubit
+
+    for moment in moments:
+        for operation in moment.operations:
+            qubits = operation.qubits
+            for qubit in qubits:
+                parent.setdefault(qubit, qubit)
+            root = find(qubits[0])
+            for qubit in qubits[1:]:
+                other_root = find(qubit)
+                if other_root is not root:
+                    parent[other_root] = root
+
+    components = {}
+    for qubit in sorted(parent):
+        components.setdefault(find(qubit), []).append(qubit)
+
+    group_of_qubit = {}
+    n_groups = group_size = 0
+    for component in components.values():
+        if n_groups == 0 or group_size + len(component) > max_block_qubits:
+            n_groups += 1
+            group_size = 0
+        group_size += len(component)
+        for qubit in component:
+            group_of_qubit[qubit] = n_groups - 1
+    return group_of_qubit, n_groups
+
+def _slice_pieces(moments, max_block_qubits):
+    """Splits consecutive moments into circuits on groups of qubits that do not interact
+    in these moments, see _qubit_groups. The moments of a piece without its operations are dropped.
+    """
+    group_of_qubit, n_groups = _qubit_groups(moments, max_block_qubits)
+    piece_moments = [[] for _ in range(n_groups)]
+    for moment in moments:
+        moment_operations = [[] for _ in range(n_groups)]
+        for operation in moment.operations:
+            moment_operations[group_of_qubit[operation.qubits[0]]].append(operation)
+        for group, operations in enumerate(moment_operations):
+            if operations:
+                piece_moments[group].append(cirq.Moment(operations))
+    return [cirq.Circuit.from_moments(*moments) for moments in piece_moments]
+
+def partition_circuit(circuit, slice_depth=50, max_block_qubits=None):
+    """Cuts a circuit into time slices of slice_depth moments and each slice into pieces
+    on groups of qubits that no operation of the slice connects. The pieces of a slice are
+    independent of each other, so each of them can be optimized on its own and
+    stitch_circuit puts the results back together.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is cut
+        slice_depth (int): number of moments of each time slice, the last one can be shorter
+        max_block_qubits (int): if given, the unconnected groups of a slice are joined into
+                                pieces of at most this many qubits (larger groups stay whole).
+                                If None each slice is a single piece.
+
+    Returns:
+        slices (list(list(cirq.Circuit))): the pieces of each time slice
+    """
+    if slice_depth < 1:
+        raise ValueError(f"slice_depth must be positive, got {slice_depth}")
+    if max_block_qubits is not None and max_block_qubits < 1:
+        raise ValueError(f"max_block_qubits must be positive, got {max_block_qubits}")
+    moments = list(circuit)
+    if max_block_qubits is None:
+        return [[cirq.Circuit.from_moments(*moments[start:start+slice_depth])]
+                for start in range(0, len(moments), slice_depth)]
+    return [_slice_pieces(moments[start:start+slice_depth], max_block_qubits)
+            for start in range(0, len(moments), slice_depth)]
+
+def _stitch(slices):
+    """Returns stitch_circuit of slices and the number of moments after each slice"""
+    circuit = cirq.Circuit()
+    slice_ends = []
+    for pieces in slices:
+        circuit.append(operation for piece in pieces for operation in piece.all_operations())
+        slice_ends.append(len(circuit))
+    return circuit, slice_ends
+
+def stitch_circuit(slices):
+    """Puts the pieces of partition_circuit back together. The operations are inserted at
+    the earliest moment they fit in, like the transformers do, so when gates were removed
+    from a slice the gates of the following slices move into the freed moments.
+
+    Args:
+        slices (list(list(cirq.Circuit))): the (optimized) pieces of each time slice
+
+    Returns:
+        circuit (cirq.Circuit): circuit of the operations of the slices one after the other
+    """
+    return _stitch(slices)[0]
+
+def _optimize_pieces(pieces, initial_probs, transition_probs, n_workers, seed, stats, cost, optimize_kwargs):
+    """Optimizes each piece with optimize and returns the results, keeping a piece whose
+    result has a higher cost, which happens when every copy ends with an expanding transformer
+    """
+    opt_pieces = list(pieces)
+    for ind, opt_piece, piece_stats in optimize_many(pieces, initial_probs, transition_probs, n_workers=n_workers,
+                                                     seed=seed, return_stats=stats is not None, cost=cost,
+                                                     **optimize_kwargs):
+        if cost(opt_piece) <= cost(pieces[ind]):
+            opt_pieces[ind] = opt_piece
+        if stats is not None:
+            stats.merge(piece_stats)
+    return opt_pieces
+
+def _boundary_windows(slice_ends, boundary_depth):
+    """Returns the (start, end) moments of the windows around the cuts between the slices
+    of a stitched circuit, which reach boundary_depth moments to each side of a cut but not
+    past the middle between two cuts, so the windows do not overlap
+    """
+    cuts = slice_ends[:-1]
+    windows = []
+    for ind, cut in enumerate(cuts):
+        start = max(cut - boundary_depth, (cuts[ind-1] + cut) // 2 if ind > 0 else 0)
+        end = min(cut + boundary_depth, (cut + cuts[ind+1]) // 2 if ind + 1 < len(cuts) else slice_ends[-1])
+        if end > start:
+            windows.append((start, end))
+    return windows
+
+def _optimize_round(circuit, initial_probs, transition_probs, slice_depth, max_block_qubits, boundary_depth,
+                    n_workers, seed, stats, cost, optimize_kwargs):
+    """Optimizes the pieces of partition_circuit, stitches them and optimizes the windows
+    around the cuts
+
+    Returns:
+        opt_circuit (cirq.Circuit): the stitched circuit
+        n_pieces (int): number of pieces and window pieces that were optimized
+    """
+    slices = partition_circuit(circuit, slice_depth, max_block_qubits)
+    pieces = [piece for slice_pieces in slices for piece in slice_pieces]
+    opt_pieces = iter(_optimize_pieces(pieces, initial_probs, transition_probs, n_workers, seed, stats, cost,
+                                       optimize_kwargs))
+    opt_circuit, slice_ends = _stitch([[next(opt_pieces) for _ in slice_pieces] for slice_pieces in slices])
+
+    windows = _boundary_windows(slice_ends, boundary_depth)
+    if not windows:
+        return opt_circuit, len(pieces)
+    window_slices = [partition_circuit(opt_circuit[start:end], end - start, max_block_qubits)[0]
+                     for start, end in windows]
+    window_pieces = [piece for slice_pieces in window_slices for piece in slice_pieces]
+    # the windows get other optimize seeds than the pieces of the slices
+    window_seed = None if seed is None else seed + len(pieces)
+    opt_window_pieces = iter(_optimize_pieces(window_pieces, initial_probs, transition_probs, n_workers, window_seed,
+                                              stats, cost, optimize_kwargs))
+    stitched_slices = []
+    position = 0
+    for (start, end), slice_pieces in zip(windows, window_slices):
+        stitched_slices.append([opt_circuit[position:start]])
+        stitched_slices.append([next(opt_window_pieces) for _ in slice_pieces])
+        position = end
+    stitched_slices.append([opt_circuit[position:]])
+    return stitch_circuit(stitched_slices), len(pieces) + len(window_pieces)
+
+def optimize_partitioned(circuit, initial_probs, transition_probs, slice_depth=200, max_block_qubits=None,
+                         boundary_depth=5, max_rounds=10, n_workers=1, seed=None, return_stats=False, verify=False,
+                         cost=None, **optimize_kwargs):
+    """Optimizes a wide or deep circuit piece by piece. The circuit is cut into time slices
+    and groups of qubits that do not interact within a slice (partition_circuit), every piece
+    is optimized on its own with optimize, possibly in parallel processes, and the results
+    are stitched back together. The identities can match across the cuts, so afterwards a
+    window of boundary_depth moments to each side of every cut is optimized the same way.
+    The gates that cancel in one round let gates of different slices meet, so the rounds are
+    repeated on the shorter circuit until a round does not lower the cost. Each piece gets
+    the whole n_iter and n_opt_circuits budget of optimize, so a round takes time linear in
+    the size of the circuit, and with n_workers > 1 the pieces of one large circuit are
+    optimized on all the cores.
+
+    Args:
+        circuit (cirq.Circuit): circuit that is optimized
+        initial_probs (lis(float)): initial_probs argument of optimize
+        transition_probs (lis(lis(float))): transition_probs argument of optimize
+        slice_depth (int): number of moments of each time slice
+        max_block_qubits (int): see partition_circuit, None optimizes each slice as one piece
+        boundary_depth (int): how many moments to each side of a cut between two slices
+                              are optimized again after stitching, 0 skips the cleanup
+        max_rounds (int): at most how many times the circuit is partitioned and optimized
+        n_workers (int): how many processes optimize pieces in parallel, see optimize_many.
+                         With the same seed the result is the same regardless of n_workers.
+        seed (int): seed from which each piece gets its own optimize seed
+        return_stats (bool): if True the merged OptimizerStats of all pieces are returned
+        verify (bool): if True the result is checked to have the same effect as circuit, see
+                       optimize, and a RuntimeError is raised if it does not
+        cost (str, CostModel or function): cost model of optimize. A piece is only replaced
+                                           by its optimized version and a round is only kept
+                                           if that does not cost more.
+        optimize_kwargs: other arguments of optimize, for example n_iter, n_opt_circuits
+                         and backend
+
+    Returns:
+        opt_circuit (cirq.Circuit): the optimized circuit
+        stats (OptimizerStats): statistics of all pieces, only returned if return_stats is True
+    """
+    if boundary_depth < 0:
+        raise ValueError(f"boundary_depth must not be negative, got {boundary_depth}")
+    if max_rounds < 1:
+        raise ValueError(f"max_rounds must be positive, got {max_rounds}")
+    start_time = time.perf_counter()
+    cost = get_cost_model(cost, picklable=n_workers != 1)
+    stats = OptimizerStats() if return_stats else None
+
+    opt_circuit, opt_cost = circuit, cost(circuit)
+    n_optimized = 0
+    for _ in range(max_rounds):
+        # every piece of every round gets its own optimize seed
+        round_seed = None if seed is None else seed + n_optimized
+        round_circuit, n_pieces = _optimize_round(opt_circuit, initial_probs, transition_probs, slice_depth,
+                                                  max_block_qubits, boundary_depth, n_workers, round_seed, stats,
+                                                  cost, optimize_kwargs)
+        n_optimized += n_pieces
+        round_cost = cost(round_circuit)
+        if round_cost >= opt_cost:
+            break
+        opt_circuit, opt_cost = round_circuit, round_cost
+
+    if verify and not circuits_are_equivalent(circuit, opt_circuit):
+        raise RuntimeError("The partitioned optimization result does not have the same effect as the input")
+    opt_circuit = circuit.unfreeze(copy=True) if opt_circuit is circuit else opt_circuit
+    if stats is None:
+        return opt_circuit
+    stats.time_s = time.perf_counter() - start_time
+    return opt_circuit, stats
@@ -1,5 +1,6 @@
 import cirq
 import random
+import numpy as np
 
 def add_two_hadamards(circuit, qubits):
     """Adds two Hadamard gates to a randomly chosen qubit of 
@@ -137,4 +138,62 @@ def create_random_circuit(n_qubits, n_templates):
     for i in range(n_templates):
         circuit = random.choice(function_list)(circuit, qubits)  
 
-    return circuit
\ No newline at end of file
+    return circuit
+
+def _template_operations(template, qubit_sample, n_cnots):
+    """Returns the operations of one template in the order in which the
+    add_* functions above append them.
+
+    Args:
+        template (int): index of the template in the function list of create_random_circuit
+        qubit_sample (list(cirq.LineQubit)): randomly ordered qubits of the circuit
+        n_cnots (int): amount of CNOTs of the templates with a random amount of CNOTs
+
+    Returns:
+        operations (list(cirq.Operation)): operations of the template
+    """
+    if template == 0:
+        return [cirq.H(qubit_sample[0]), cirq.H(qubit_sample[0])]
+    if template == 1:
+        return [cirq.CNOT(qubit_sample[0], qubit_sample[1])]
+    if template == 2:
+        return [cirq.CNOT(qubit_sample[0], qubit_sample[1]), cirq.CNOT(qubit_sample[0], qubit_sample[1])]
+    if template == 3:
+        return [cirq.CNOT(qubit_sample[0], target_qubit) for target_qubit in qubit_sample[1:n_cnots+1]]
+    if template == 4:
+        hadamard_list = [cirq.H(qubit_sample[0]), cirq.H(qubit_sample[1])]
+        return hadamard_list + [cirq.CNOT(qubit_sample[0], qubit_sample[1])] + hadamard_list
+
+    control_qubits = qubit_sample[1:n_cnots+1]
+    hadamard_list = [cirq.H(qubit) for qubit in control_qubits]
+    cnot_list = [cirq.CNOT(control_qubit, qubit_sample[0]) for control_qubit in control_qubits]
+    return hadamard_list + cnot_list + hadamard_list
+
+def create_random_circuits(n_qubits, n_templates, n_circuits=1, seed=None):
+    """Creates random circuits with the same templates and template
+    distribution as create_random_circuit. All random choices of a circuit
+    are drawn at once with a NumPy Generator and the circuit is built from
+    its operation list in one pass, so the time grows linearly with n_templates.
+
+    Args:
+        n_qubits (int): amount of qubits in the circuit
+        n_templates (int): amount of templates added to each circuit
+        n_circuits (int): amount of circuits created
+        seed (int or numpy.random.Generator): seed of the random choices,
+                                              None for a random seed
+
+    Yields:
+        circuit (cirq.Circuit): the created circuits one by one
+    """
+    rng = np.random.default_rng(seed)
+    qubits = np.array(cirq.LineQubit.range(n_qubits+1), dtype=object)
+    for i in range(n_circuits):
+        templates = rng.integers(6, size=n_templates)
+        n_cnots = rng.integers(2, len(qubits), size=n_templates)
+        qubit_samples = qubits[rng.random((n_templates, len(qubits))).argsort(axis=1)]
+        operations = []
+        for template, qubit_sample, template_n_cnots in zip(templates.tolist(), qubit_samples.tolist(),
+                                                            n_cnots.tolist()):
+            operations.extend(_template_operations(template, qubit_sample, template_n_cnots))
+
+        yield cirq.Circuit(operations)
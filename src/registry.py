@@ -0,0 +1,128 @@
+import sys
+sys.path.append('../')
+from src import compact_transformers
+from src import transformers
+from src import worklist_engine
+
+class TransformerRegistry:
+    """Ordered collection of the circuit identities the optimizer chooses from.
+
+    Each identity has a transformer and a match counter for every backend it supports,
+    where a transformer with zero matches returns the circuit unchanged. The position of
+    an identity in the registry is its index in initial_probs and in the rows and columns
+    of transition_probs. Transformers must be module level functions, so that they can be
+    sent to worker processes.
+    """
+
+    def __init__(self):
+        self._names = []
+        self._functions = []
+        self._match_counters = []
+        self._expanding = []
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def names(self):
+        """Names of the identities in registration order"""
+        return list(self._names)
+
+    @property
+    def backends(self):
+        """Backends supported by every identity of the registry"""
+        if not self._functions:
+            return []
+        return [backend for backend in self._functions[0]
+                if all(backend in functions for functions in self._functions)]
+
+    def register(self, name, functions, match_counters, expanding=False):
+        """Adds an identity after the identities registered so far
+
+        Args:
+            name (str): unique name of the identity
+            functions (dict(str, function)): transformer of each supported backend
+            match_counters (dict(str, function)): match counter of each supported backend
+            expanding (bool): True if the transformer can make the circuit longer. A circuit
+                              that none of the other transformers change is a fixed point.
+        """
+        if name in self._names:
+            raise ValueError(f"An identity called {name!r} is already registered")
+        if set(functions) != set(match_counters):
+            raise ValueError(f"{name!r} needs a match counter for exactly the backends of its transformers")
+
+        self._names.append(name)
+        self._functions.append(dict(functions))
+        self._match_counters.append(dict(match_counters))
+        self._expanding.append(expanding)
+
+    def _check_backend(self, backend):
+        if backend not in self.backends:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {self.backends}")
+
+    def function_list(self, backend):
+        """Returns the transformers of backend in registration order"""
+        self._check_backend(backend)
+        return [functions[backend] for functions in self._functions]
+
+    def match_counter_list(self, backend):
+        """Returns the match counters of backend in registration order"""
+        self._check_backend(backend)
+        return [match_counters[backend] for match_counters in self._match_counters]
+
+    def non_expanding_inds(self):
+        """Returns the indices of the identities that never make the circuit longer"""
+        return {i for i, expanding in enumerate(self._expanding) if not expanding}
+
+# the identities a) - f) of the problem description in the order of the transition matrices. The
+# Cirq transformers are the variants that keep their FanoutCNOTs, see src/transformers.py.
+DEFAULT_REGISTRY = TransformerRegistry()
+DEFAULT_REGISTRY.register(
+    'remove_double_hadamards',
+    {'cirq': transformers._remove_double_hadamards,
+     'compact': compact_transformers.remove_double_hadamards,
+     'worklist': worklist_engine.remove_double_hadamards},
+    {'cirq': transformers.count_double_hadamards,
+     'compact': compact_transformers.count_double_hadamards,
+     'worklist': worklist_engine.n_candidates_of_remove_double_hadamards})
+DEFAULT_REGISTRY.register(
+    'combine_cnots',
+    {'cirq': transformers._combine_cnots,
+     'compact': compact_transformers.combine_cnots,
+     'worklist': worklist_engine.combine_cnots},
+    {'cirq': transformers.count_combinable_cnots,
+     'compact': compact_transformers.count_combinable_cnots,
+     'worklist': worklist_engine.n_candidates_of_combine_cnots})
+DEFAULT_REGISTRY.register(
+    'remove_double_cnots',
+    {'cirq': transformers._remove_double_cnots,
+     'compact': compact_transformers.remove_double_cnots,
+     'worklist': worklist_engine.remove_double_cnots},
+    {'cirq': transformers.count_double_cnots,
+     'compact': compact_transformers.count_double_cnots,
+     'worklist': worklist_engine.n_candidates_of_remove_double_cnots})
+DEFAULT_REGISTRY.register(
+    'hadamards_and_cnot_to_cnot',
+    {'cirq': transformers._hadamards_and_cnot_to_cnot,
+     'compact': compact_transformers.hadamards_and_cnot_to_cnot,
+     'worklist': worklist_engine.hadamards_and_cnot_to_cnot},
+    {'cirq': transformers.count_cnots_surrounded_by_hadamards,
+     'compact': compact_transformers.count_cnots_surrounded_by_hadamards,
+     'worklist': worklist_engine.n_candidates_of_hadamards_and_cnot_to_cnot})
+DEFAULT_REGISTRY.register(
+    'cnot_to_hadamards_and_cnot',
+    {'cirq': transformers._cnot_to_hadamards_and_cnot,
+     'compact': compact_transformers.cnot_to_hadamards_and_cnot,
+     'worklist': worklist_engine.cnot_to_hadamards_and_cnot},
+    {'cirq': transformers.count_cnots,
+     'compact': compact_transformers.count_cnots,
+     'worklist': worklist_engine.n_candidates_of_cnot_to_hadamards_and_cnot},
+    expanding=True)
+DEFAULT_REGISTRY.register(
+    'combine_cnots_with_controls_surrounded_by_hadamards',
+    {'cirq': transformers._combine_cnots_with_controls_surrounded_by_hadamards,
+     'compact': compact_transformers.combine_cnots_with_controls_surrounded_by_hadamards,
+     'worklist': worklist_engine.combine_cnots_with_controls_surrounded_by_hadamards},
+    {'cirq': transformers.count_combinable_cnots_with_controls_surrounded_by_hadamards,
+     'compact': compact_transformers.count_combinable_cnots_with_controls_surrounded_by_hadamards,
+     'worklist': worklist_engine.n_candidates_of_combine_cnots_with_controls_surrounded_by_hadamards})
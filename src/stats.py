@@ -0,0 +1,143 @@
+import time
+import sys
+from dataclasses import dataclass, field
+sys.path.append('../')
+from src.functions import n_operations
+
+@dataclass
+class TransformerStats:
+    """Totals over all calls of one transformer"""
+    name: str
+    n_calls: int = 0
+    n_skipped: int = 0
+    n_cached: int = 0
+    n_rejected: int = 0
+    time_s: float = 0.0
+    moments_before: int = 0
+    moments_after: int = 0
+    operations_before: int = 0
+    operations_after: int = 0
+
+    @property
+    def moments_removed(self):
+        """Net number of moments removed by all calls, negative if the transformer lengthened circuits"""
+        return self.moments_before - self.moments_after
+
+    def merge(self, other):
+        """Adds the totals of other to these totals"""
+        self.n_calls += other.n_calls
+        self.n_skipped += other.n_skipped
+        self.n_cached += other.n_cached
+        self.n_rejected += other.n_rejected
+        self.time_s += other.time_s
+        self.moments_before += other.moments_before
+        self.moments_after += other.moments_after
+        self.operations_before += other.operations_before
+        self.operations_after += other.operations_after
+
+@dataclass
+class OptimizerStats:
+    """Statistics collected by optimize when return_stats is True.
+
+    Attributes:
+        transformers (dict(str, TransformerStats)): totals of each transformer by function name,
+                                                    without a leading underscore
+        chain_lengths (list(list(int))): for each optimized copy of the circuit its length at
+                                         the start and after each applied transformer
+        stop_reasons (list(str)): for each copy why its optimization stopped: 'n_iter',
+                                  'fixed_point', 'patience', 'time_budget' or 'cancelled', or
+                                  'depth' for beam_search
+        cache_lookups (int): how many transformer results were looked up in the transposition cache
+        cache_hits (int): how many of the looked up results were found
+        best_chain (int): index of the copy that was returned
+        time_s (float): wall time of the whole optimize call
+    """
+    transformers: dict = field(default_factory=dict)
+    chain_lengths: list = field(default_factory=list)
+    stop_reasons: list = field(default_factory=list)
+    cache_lookups: int = 0
+    cache_hits: int = 0
+    best_chain: int = None
+    time_s: float = 0.0
+
+    @property
+    def cache_hit_rate(self):
+        """Fraction of the transposition cache lookups that were hits, None if there were none"""
+        return self.cache_hits / self.cache_lookups if self.cache_lookups else None
+
+    def start_chain(self, circuit):
+        """Starts the length trajectory of a new copy of the circuit"""
+        self.chain_lengths.append([len(circuit)])
+
+    def _transformer_stats(self, transformer):
+        """Returns the totals of transformer, creating them on first use"""
+        # the private Cirq transformers the optimizers apply are reported like the public ones
+        name = transformer.__name__.lstrip('_')
+        transformer_stats = self.transformers.get(name)
+        if transformer_stats is None:
+            transformer_stats = self.transformers[name] = TransformerStats(name)
+        return transformer_stats
+
+    def apply(self, transformer, circuit):
+        """Applies transformer to circuit and records the call
+
+        Returns:
+            mutated_circuit: output of the transformer
+        """
+        moments_before = len(circuit)
+        operations_before = n_operations(circuit)
+        start_time = time.perf_counter()
+        mutated_circuit = transformer(circuit)
+        elapsed_time = time.perf_counter() - start_time
+        moments_after = len(mutated_circuit)
+
+        transformer_stats = self._transformer_stats(transformer)
+        transformer_stats.n_calls += 1
+        transformer_stats.time_s += elapsed_time
+        transformer_stats.moments_before += moments_before
+        transformer_stats.moments_after += moments_after
+        transformer_stats.operations_before += operations_before
+        transformer_stats.operations_after += n_operations(mutated_circuit)
+        self.chain_lengths[-1].append(moments_after)
+        return mutated_circuit
+
+    def skip(self, transformer, circuit):
+        """Records that transformer was not applied because it is known not to change circuit"""
+        self._transformer_stats(transformer).n_skipped += 1
+        self.chain_lengths[-1].append(len(circuit))
+
+    def reuse(self, transformer, circuit, mutated_circuit):
+        """Records that the output mutated_circuit of transformer on circuit was taken from the transposition cache"""
+        self._transformer_stats(transformer).n_cached += 1
+        self.cache_hits += 1
+        self.chain_lengths[-1].append(len(mutated_circuit))
+
+    def reject(self, transformer, circuit):
+        """Records that the chain stayed at circuit because the output of the last call of
+        transformer was rejected by annealing
+        """
+        self._transformer_stats(transformer).n_rejected += 1
+        self.chain_lengths[-1][-1] = len(circuit)
+
+    def merge(self, other):
+        """Adds the transformer totals, chain trajectories, stop reasons and cache counts of other to these statistics"""
+        for name, transformer_stats in other.transformers.items():
+            self.transformers.setdefault(name, TransformerStats(name)).merge(transformer_stats)
+        self.chain_lengths.extend(other.chain_lengths)
+        self.stop_reasons.extend(other.stop_reasons)
+        self.cache_lookups += other.cache_lookups
+        self.cache_hits += other.cache_hits
+
+    def summary(self):
+        """Returns a table of the transformer totals sorted by total time"""
+        lines = [f"{'transformer':<52}{'calls':>7}{'skipped':>9}{'cached':>8}{'rejected':>10}{'time (s)':>11}"
+                 f"{'moments removed':>17}{'ops removed':>13}"]
+        for transformer_stats in sorted(self.transformers.values(), key=lambda stats: -stats.time_s):
+            lines.append(f"{transformer_stats.name:<52}{transformer_stats.n_calls:>7}"
+                         f"{transformer_stats.n_skipped:>9}{transformer_stats.n_cached:>8}"
+                         f"{transformer_stats.n_rejected:>10}"
+                         f"{transformer_stats.time_s:>11.4f}{transformer_stats.moments_removed:>17}"
+                         f"{transformer_stats.operations_before - transformer_stats.operations_after:>13}")
+        if self.cache_lookups:
+            lines.append(f"transposition cache hit rate {self.cache_hit_rate:.1%} of {self.cache_lookups} lookups")
+        return '\n'.join(lines)
@@ -1,40 +1,53 @@
 import cirq
+from functools import lru_cache
 from itertools import groupby
 import sys
 sys.path.append('../')
 from src.functions import (
+    FanoutCNOT,
     is_cnot_with_multiple_targets,
-    create_cnot_with_multiple_targets
+    without_fanout_cnots
 )
+from src.wire_index import WireIndex
 
 def _all_equal(iterable):
     """Checks if all values of an iterable are the same"""
     g = groupby(iterable)
     return next(g, True) and not next(g, False)
 
-def _lists_share_elements(list1, list2):
-    """Checks if two lists share any elements"""
-    return bool([i for i in list1 if i in list2])
+def _create_hadamard_conjugated_cnot_with_multiple_targets(target_qubits, control_qubit):
+    """Returns the moments of the right hand side of identity a): a multi-target-qubit
+    CNOT between Hadamards on its control qubit
+    """
+    hadamard = cirq.Moment([cirq.H(control_qubit)])
+    return (hadamard, cirq.Moment([FanoutCNOT(control_qubit, target_qubits)]), hadamard)
+
+def set_rewrite_cache_size(max_size):
+    """Sets how many rewritten blocks of each kind the transformers memoize.
+
+    The operations that the identities insert only depend on the qubits they act on,
+    and the same blocks recur in a circuit and in the circuits that the optimizer
+    derives from it. Cirq operations and moments are immutable, so the transformers
+    build each rewritten block once and share it. The least recently used blocks
+    are evicted when a cache is full.
 
-def _map_cnot_to_cnot_and_hadamards(op, _: int):
-    """Inverts CNOT-gate and adds Hadamard- 
-    gates on both qubits before and after 
-    the CNOT (identity e of project description)
+    Args:
+        max_size (int): maximum number of blocks of each kind, None for no limit
+                        and 0 to build every block again
     """
-    if op.gate == cirq.CNOT:
-        control_qubit = op.qubits[0]
-        target_qubit = op.qubits[1]
-        yield cirq.H(control_qubit)
-        yield cirq.H(target_qubit)
-        yield cirq.CNOT(target_qubit, control_qubit)
-        yield cirq.H(control_qubit)
-        yield cirq.H(target_qubit)
-    else:
-        yield op
+    global _hadamard, _cnot, _cnot_with_multiple_targets, _hadamard_conjugated_cnot_with_multiple_targets
+    _hadamard = lru_cache(maxsize=max_size)(cirq.H.on)
+    _cnot = lru_cache(maxsize=max_size)(cirq.CNOT.on)
+    _cnot_with_multiple_targets = lru_cache(maxsize=max_size)(FanoutCNOT)
+    _hadamard_conjugated_cnot_with_multiple_targets = lru_cache(maxsize=max_size)(
+        _create_hadamard_conjugated_cnot_with_multiple_targets)
 
-@cirq.transformer
-def combine_cnots_with_controls_surrounded_by_hadamards(circuit, context=None):
-    """Applies circuit identity a) to all locations of the circuit that permit it
+_DEFAULT_REWRITE_CACHE_SIZE = 4096
+set_rewrite_cache_size(_DEFAULT_REWRITE_CACHE_SIZE)
+
+def _combine_cnots_with_controls_surrounded_by_hadamards(circuit):
+    """Applies circuit identity a) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see combine_cnots_with_controls_surrounded_by_hadamards
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -43,34 +56,36 @@ def combine_cnots_with_controls_surrounded_by_hadamards(circuit, context=None):
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """
     mutated_circuit = circuit.unfreeze(copy=True)
+    wire_index = WireIndex(mutated_circuit)
     insertions = []
-    removals = []    
+    removals = set()
     for first_cnot_ind in range(1, len(mutated_circuit)-1):        
         for operation in mutated_circuit[first_cnot_ind].operations:
-            if operation.gate != cirq.CNOT or (first_cnot_ind, operation) in removals:
+            if not _is_cnot(operation) or (first_cnot_ind, operation) in removals:
                 continue
 
             control_qubit, target_qubit = operation.qubits
-            first_h_ind = mutated_circuit.prev_moment_operating_on(qubits=[control_qubit],
-                                                                   end_moment_index=first_cnot_ind)
-            h_operation = cirq.H(control_qubit)            
+            first_h_ind = wire_index.prev_moment_operating_on(qubits=[control_qubit],
+                                                              end_moment_index=first_cnot_ind)
+            h_operation = _hadamard(control_qubit)
             if (first_h_ind is None or 
-                h_operation not in mutated_circuit[first_h_ind].operations or 
+                wire_index.operation_at(control_qubit, first_h_ind) != h_operation or 
                 (first_h_ind, h_operation) in removals):
                 continue
 
-            next_h_ind = mutated_circuit.next_moment_operating_on(qubits=[control_qubit],
-                                                                  start_moment_index=first_cnot_ind+1)
+            next_h_ind = wire_index.next_moment_operating_on(qubits=[control_qubit],
+                                                             start_moment_index=first_cnot_ind+1)
             if (next_h_ind is None or 
-                h_operation not in mutated_circuit[next_h_ind].operations or 
+                wire_index.operation_at(control_qubit, next_h_ind) != h_operation or 
                 (next_h_ind, h_operation) in removals):
                 continue
 
             control_qubits = []
-            potential_removals = []
-            potential_removals.extend([(first_h_ind, h_operation), (next_h_ind, h_operation)])
-            potential_removals.append((first_cnot_ind, operation))
+            potential_removals = set()
+            potential_removals.update([(first_h_ind, h_operation), (next_h_ind, h_operation)])
+            potential_removals.add((first_cnot_ind, operation))
             control_qubits.append(control_qubit)
+            control_qubit_set = {control_qubit}
             new_removable_cnot_found = False
             cnot_ind = first_cnot_ind
             for i in range(len(mutated_circuit) - first_h_ind):                
@@ -78,52 +93,47 @@ def combine_cnots_with_controls_surrounded_by_hadamards(circuit, context=None):
                     break
 
                 new_removable_cnot_found = False
-                cnot_ind = mutated_circuit.next_moment_operating_on(qubits=[target_qubit],
-                                                                    start_moment_index=cnot_ind+1)
+                cnot_ind = wire_index.next_moment_operating_on(qubits=[target_qubit],
+                                                               start_moment_index=cnot_ind+1)
                 if cnot_ind is None:
                     continue
 
-                for operation2 in mutated_circuit[cnot_ind].operations:                    
-                    if (operation2.gate != cirq.CNOT or 
-                        operation2.qubits[0] in control_qubits or 
-                        operation2.qubits[1] != target_qubit or 
-                        (cnot_ind, operation2) in removals):
-                        continue
-
-                    control_qubit = operation2.qubits[0]
-                    prev_h_ind = mutated_circuit.prev_moment_operating_on(qubits=[control_qubit], 
-                                                                          end_moment_index=cnot_ind)
-                    new_h_operation = cirq.H(control_qubit)
-                    if (prev_h_ind is None or 
-                        new_h_operation not in mutated_circuit[prev_h_ind].operations or 
-                        (prev_h_ind, new_h_operation) in removals or
-                        prev_h_ind > first_cnot_ind):
-                        continue
-
-                    next_h_ind = mutated_circuit.next_moment_operating_on(qubits=[control_qubit],
-                                                                          start_moment_index=cnot_ind+1)
-                    if (next_h_ind is None or 
-                        new_h_operation not in mutated_circuit[next_h_ind].operations or 
-                        (next_h_ind, new_h_operation) in removals):
-                        continue
-
-                    control_qubits.append(control_qubit)
-                    potential_removals.extend([(prev_h_ind, new_h_operation), (next_h_ind, new_h_operation)])
-                    potential_removals.append((cnot_ind, operation2))
-                    new_removable_cnot_found = True
-                    break
+                operation2 = wire_index.operation_at(target_qubit, cnot_ind)
+                if (not _is_cnot(operation2) or 
+                    operation2.qubits[0] in control_qubit_set or 
+                    operation2.qubits[1] != target_qubit or 
+                    (cnot_ind, operation2) in removals):
+                    continue
+
+                control_qubit = operation2.qubits[0]
+                prev_h_ind = wire_index.prev_moment_operating_on(qubits=[control_qubit], 
+                                                                 end_moment_index=cnot_ind)
+                new_h_operation = _hadamard(control_qubit)
+                if (prev_h_ind is None or 
+                    wire_index.operation_at(control_qubit, prev_h_ind) != new_h_operation or 
+                    (prev_h_ind, new_h_operation) in removals or
+                    prev_h_ind > first_cnot_ind):
+                    continue
+
+                next_h_ind = wire_index.next_moment_operating_on(qubits=[control_qubit],
+                                                                 start_moment_index=cnot_ind+1)
+                if (next_h_ind is None or 
+                    wire_index.operation_at(control_qubit, next_h_ind) != new_h_operation or 
+                    (next_h_ind, new_h_operation) in removals):
+                    continue
+
+                control_qubits.append(control_qubit)
+                control_qubit_set.add(control_qubit)
+                potential_removals.update([(prev_h_ind, new_h_operation), (next_h_ind, new_h_operation)])
+                potential_removals.add((cnot_ind, operation2))
+                new_removable_cnot_found = True
                 
             if len(control_qubits) < 2:
                 continue
 
-            cnot_with_multiple_targets = create_cnot_with_multiple_targets(target_qubits=control_qubits,
-                                                                      control_qubit=target_qubit)
-            insertable_sub_circuit = cirq.Circuit()
-            insertable_sub_circuit.append(cirq.H(target_qubit))
-            insertable_sub_circuit.append(cnot_with_multiple_targets)
-            insertable_sub_circuit.append(cirq.H(target_qubit))
-            insertions.append((first_cnot_ind, insertable_sub_circuit))
-            removals.extend(potential_removals)
+            insertable_moments = _hadamard_conjugated_cnot_with_multiple_targets(tuple(control_qubits), target_qubit)
+            insertions.append((first_cnot_ind, insertable_moments))
+            removals.update(potential_removals)
             
     if len(insertions) != 0:
         insertions.reverse()
@@ -133,9 +143,9 @@ def combine_cnots_with_controls_surrounded_by_hadamards(circuit, context=None):
     mutated_circuit = cirq.drop_empty_moments(mutated_circuit)
     return mutated_circuit
 
-@cirq.transformer
-def remove_double_hadamards(circuit, context=None):
-    """Applies circuit identity b) to all locations of the circuit that permit it
+def _remove_double_hadamards(circuit):
+    """Applies circuit identity b) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see remove_double_hadamards
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -144,28 +154,29 @@ def remove_double_hadamards(circuit, context=None):
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """
     mutated_circuit = circuit.unfreeze(copy=True)
-    removals = []    
+    wire_index = WireIndex(mutated_circuit)
+    removals = set()
     for moment_ind in range(len(mutated_circuit)-1):        
         for operation in mutated_circuit[moment_ind].operations:            
-            if (operation.gate != cirq.H or 
+            if (not _is_hadamard(operation) or 
                (moment_ind, operation) in removals):
                 continue
                 
             qubit = operation.qubits[0]
-            moment_ind_2 = mutated_circuit.next_moment_operating_on(qubits=[qubit],
-                                                                    start_moment_index=moment_ind+1)                
+            moment_ind_2 = wire_index.next_moment_operating_on(qubits=[qubit],
+                                                               start_moment_index=moment_ind+1)                
             if (moment_ind_2 is not None and 
-                operation in mutated_circuit[moment_ind_2] and
+                wire_index.operation_at(qubit, moment_ind_2) == operation and
                 (moment_ind_2, operation) not in removals):
-                removals.extend([(moment_ind, operation), (moment_ind_2, operation)])
+                removals.update([(moment_ind, operation), (moment_ind_2, operation)])
                     
     mutated_circuit.batch_remove(removals)
     mutated_circuit = cirq.drop_empty_moments(mutated_circuit)                        
     return mutated_circuit
 
-@cirq.transformer
-def remove_double_cnots(circuit, context=None): 
-    """Applies circuit identity c) to all locations of the circuit that permit it
+def _remove_double_cnots(circuit):
+    """Applies circuit identity c) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see remove_double_cnots
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -174,30 +185,30 @@ def remove_double_cnots(circuit, context=None):
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """ 
     mutated_circuit = circuit.unfreeze(copy=True)
-    removals = []    
+    wire_index = WireIndex(mutated_circuit)
+    removals = set()
     for moment_ind in range(len(mutated_circuit)-1):
         for operation in mutated_circuit[moment_ind].operations:
-            if ((operation.gate != cirq.CNOT 
-                and is_cnot_with_multiple_targets(operation) == False) or
+            if (not _is_cnot_or_cnot_with_multiple_targets(operation) or
                 (moment_ind, operation) in removals):
                 continue
                 
             control_qubit = operation.qubits[0]
-            moment_inds_2 = mutated_circuit.next_moments_operating_on(qubits=operation.qubits,
-                                                                      start_moment_index=moment_ind+1)            
+            moment_inds_2 = wire_index.next_moments_operating_on(qubits=operation.qubits,
+                                                                 start_moment_index=moment_ind+1)            
             if (_all_equal(moment_inds_2.values()) and 
                 moment_inds_2[control_qubit] != len(mutated_circuit) and 
-                operation in mutated_circuit[moment_inds_2[control_qubit]] and
+                wire_index.operation_at(control_qubit, moment_inds_2[control_qubit]) == operation and
                 (moment_inds_2[control_qubit], operation) not in removals):
-                removals.extend([(moment_ind, operation), (moment_inds_2[control_qubit], operation)])
+                removals.update([(moment_ind, operation), (moment_inds_2[control_qubit], operation)])
                 
     mutated_circuit.batch_remove(removals)                
     mutated_circuit = cirq.drop_empty_moments(mutated_circuit)                        
     return mutated_circuit
 
-@cirq.transformer
-def combine_cnots(circuit, context=None):
-    """Applies circuit identity d) to all locations of the circuit that permit it
+def _combine_cnots(circuit):
+    """Applies circuit identity d) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see combine_cnots
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -206,22 +217,23 @@ def combine_cnots(circuit, context=None):
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """
     mutated_circuit = circuit.unfreeze(copy=True)
+    wire_index = WireIndex(mutated_circuit)
     insertions = []
-    removals = []    
+    removals = set()
     for moment_ind in range(len(mutated_circuit)-1):
         for operation in mutated_circuit[moment_ind].operations:
                         
-            if ((operation.gate != cirq.CNOT and 
-                is_cnot_with_multiple_targets(operation) == False) or
+            if (not _is_cnot_or_cnot_with_multiple_targets(operation) or
                 (moment_ind, operation) in removals):
                 continue
 
-            potential_removals = []
+            potential_removals = set()
             potential_target_qubits = []
             control_qubit = operation.qubits[0]
             current_target_qubits = operation.qubits[1:]
             potential_target_qubits.extend(current_target_qubits)            
-            potential_removals.append((moment_ind, operation))
+            potential_target_qubit_set = set(current_target_qubits)
+            potential_removals.add((moment_ind, operation))
             new_removable_cnot_found = False
             cnot_ind = moment_ind   
             for i in range(len(mutated_circuit) - moment_ind):
@@ -229,40 +241,38 @@ def combine_cnots(circuit, context=None):
                     break
 
                 new_removable_cnot_found = False
-                cnot_ind = mutated_circuit.next_moment_operating_on(qubits=[control_qubit],
-                                                                    start_moment_index=cnot_ind+1)
+                cnot_ind = wire_index.next_moment_operating_on(qubits=[control_qubit],
+                                                               start_moment_index=cnot_ind+1)
                 if cnot_ind is None:
                     continue
 
-                for operation2 in mutated_circuit[cnot_ind].operations:
-                    if ((operation2.gate != cirq.CNOT and 
-                        is_cnot_with_multiple_targets(operation2) == False) or
-                        (cnot_ind, operation2) in removals or
-                        (cnot_ind, operation2) in potential_removals):
-                        continue                    
-                    
-                    control_qubit_2 = operation2.qubits[0]
-                    target_qubits_2 = operation2.qubits[1:]
-                    if (control_qubit_2 != control_qubit or 
-                        _lists_share_elements(target_qubits_2, potential_target_qubits)):
-                        continue
-
-                    prev_moment_ind = mutated_circuit.prev_moment_operating_on(qubits=target_qubits_2, 
-                                                                               end_moment_index=cnot_ind)
-                    if prev_moment_ind is not None and prev_moment_ind >= moment_ind:
-                        continue
-
-                    new_removable_cnot_found = True
-                    potential_target_qubits.extend(target_qubits_2)
-                    potential_removals.append((cnot_ind, operation2))
-                    break
+                operation2 = wire_index.operation_at(control_qubit, cnot_ind)
+                if (not _is_cnot_or_cnot_with_multiple_targets(operation2) or
+                    (cnot_ind, operation2) in removals or
+                    (cnot_ind, operation2) in potential_removals):
+                    continue                    
+                
+                control_qubit_2 = operation2.qubits[0]
+                target_qubits_2 = operation2.qubits[1:]
+                if (control_qubit_2 != control_qubit or 
+                    not potential_target_qubit_set.isdisjoint(target_qubits_2)):
+                    continue
+
+                prev_moment_ind = wire_index.prev_moment_operating_on(qubits=target_qubits_2, 
+                                                                      end_moment_index=cnot_ind)
+                if prev_moment_ind is not None and prev_moment_ind >= moment_ind:
+                    continue
+
+                new_removable_cnot_found = True
+                potential_target_qubits.extend(target_qubits_2)
+                potential_target_qubit_set.update(target_qubits_2)
+                potential_removals.add((cnot_ind, operation2))
 
             if len(potential_removals) <= 1:
                 break           
 
-            removals.extend(potential_removals)
-            cnot_with_multiple_targets = create_cnot_with_multiple_targets(target_qubits=potential_target_qubits,
-                                                                                control_qubit=control_qubit)
+            removals.update(potential_removals)
+            cnot_with_multiple_targets = _cnot_with_multiple_targets(control_qubit, tuple(potential_target_qubits))
             insertions.append((moment_ind, cnot_with_multiple_targets))
 
     if len(removals) != 0:
@@ -272,9 +282,9 @@ def combine_cnots(circuit, context=None):
         mutated_circuit = cirq.drop_empty_moments(mutated_circuit)                    
     return mutated_circuit
 
-@cirq.transformer
-def cnot_to_hadamards_and_cnot(circuit, context=None):
-    """Applies circuit identity e) to all locations of the circuit that permit it
+def _cnot_to_hadamards_and_cnot(circuit):
+    """Applies circuit identity e) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see cnot_to_hadamards_and_cnot
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -282,11 +292,29 @@ def cnot_to_hadamards_and_cnot(circuit, context=None):
     Returns:
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """
-    return cirq.map_operations_and_unroll(circuit, _map_cnot_to_cnot_and_hadamards)
-
-@cirq.transformer
-def hadamards_and_cnot_to_cnot(circuit, context=None):
-    """Applies circuit identity f) to all locations of the circuit that permit it
+    moments = []
+    for moment in circuit:
+        if len(moment.operations) == 0:
+            continue
+
+        cnots = [operation for operation in moment.operations if _is_cnot(operation)]
+        if len(cnots) == 0:
+            # moments are immutable, so the ones without CNOTs are shared with the original circuit
+            moments.append(moment)
+            continue
+
+        # each CNOT becomes Hadamards on both qubits, the inverted CNOT and Hadamards on both qubits
+        hadamards = [_hadamard(qubit) for cnot in cnots for qubit in cnot.qubits]
+        other_operations = [operation for operation in moment.operations if not _is_cnot(operation)]
+        moments.append(cirq.Moment(other_operations + hadamards))
+        moments.append(cirq.Moment([_cnot(cnot.qubits[1], cnot.qubits[0]) for cnot in cnots]))
+        moments.append(cirq.Moment(hadamards))
+
+    return cirq.Circuit.from_moments(*moments)
+
+def _hadamards_and_cnot_to_cnot(circuit):
+    """Applies circuit identity f) to all locations of the circuit that permit it.
+    FanoutCNOTs are not converted to standard Cirq operations, see hadamards_and_cnot_to_cnot
 
     Args:
         circuit (cirq.Circuit): original circuit
@@ -295,60 +323,358 @@ def hadamards_and_cnot_to_cnot(circuit, context=None):
         mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
     """
     mutated_circuit = circuit.unfreeze(copy=True)
-    removals = [] 
+    wire_index = WireIndex(mutated_circuit)
+    removals = set()
     replacements = []   
     for moment_ind in range(len(mutated_circuit)-2):
         for operation in mutated_circuit[moment_ind].operations:
-            if operation.gate != cirq.H or (moment_ind, operation) in removals:
+            if not _is_hadamard(operation) or (moment_ind, operation) in removals:
                 continue
                 
             qubit1 = operation.qubits[0]
-            moment_ind_2 = mutated_circuit.next_moment_operating_on(qubits=[qubit1], 
-                                                                    start_moment_index=moment_ind+1)
+            moment_ind_2 = wire_index.next_moment_operating_on(qubits=[qubit1], 
+                                                               start_moment_index=moment_ind+1)
             if moment_ind_2 is None:
                 continue
 
-            for operation2 in mutated_circuit[moment_ind_2].operations:
-                if operation2.gate != cirq.CNOT: 
-                    continue
-
-                if operation2.qubits[0] != qubit1 and operation2.qubits[1] != qubit1:
-                    continue
+            operation2 = wire_index.operation_at(qubit1, moment_ind_2)
+            if not _is_cnot(operation2): 
+                continue
 
-                control_qubit = operation2.qubits[0]
-                target_qubit = operation2.qubits[1]
-                if qubit1 == control_qubit:
-                    qubit2 = target_qubit
-                else:
-                    qubit2 = control_qubit
-
-                prev_moment_ind = mutated_circuit.prev_moment_operating_on(qubits=[qubit2], 
-                                                                           end_moment_index=moment_ind_2)
-                second_H = cirq.H(qubit2)                
-                if (prev_moment_ind is None or 
-                    second_H not in mutated_circuit[prev_moment_ind] or 
-                    (prev_moment_ind, second_H) in removals):
-                    continue
-                
-                moment_inds_3 = mutated_circuit.next_moments_operating_on(qubits=[qubit1, qubit2],
-                                                                          start_moment_index=moment_ind_2+1)
-                if (moment_inds_3[qubit1] == len(mutated_circuit) or 
-                    moment_inds_3[qubit2] == len(mutated_circuit)):
-                    continue
-                
-                if (operation in mutated_circuit[moment_inds_3[qubit1]] and 
-                    second_H in mutated_circuit[moment_inds_3[qubit2]] and 
-                    (moment_inds_3[qubit1], operation) not in removals and 
-                    (moment_inds_3[qubit2], second_H) not in removals):
-                    removals.extend([(moment_ind, operation), 
-                                     (prev_moment_ind, second_H), 
-                                     (moment_inds_3[qubit1], operation), 
-                                     (moment_inds_3[qubit2], second_H)])                    
-                    replacements.append((moment_ind_2, 
-                                        cirq.CNOT(control_qubit, target_qubit), 
-                                        cirq.CNOT(target_qubit, control_qubit)))
+            control_qubit = operation2.qubits[0]
+            target_qubit = operation2.qubits[1]
+            if qubit1 == control_qubit:
+                qubit2 = target_qubit
+            else:
+                qubit2 = control_qubit
+
+            prev_moment_ind = wire_index.prev_moment_operating_on(qubits=[qubit2], 
+                                                                  end_moment_index=moment_ind_2)
+            second_H = _hadamard(qubit2)
+            if (prev_moment_ind is None or 
+                wire_index.operation_at(qubit2, prev_moment_ind) != second_H or 
+                (prev_moment_ind, second_H) in removals):
+                continue
+            
+            moment_inds_3 = wire_index.next_moments_operating_on(qubits=[qubit1, qubit2],
+                                                                 start_moment_index=moment_ind_2+1)
+            if (moment_inds_3[qubit1] == len(mutated_circuit) or 
+                moment_inds_3[qubit2] == len(mutated_circuit)):
+                continue
+            
+            if (wire_index.operation_at(qubit1, moment_inds_3[qubit1]) == operation and 
+                wire_index.operation_at(qubit2, moment_inds_3[qubit2]) == second_H and 
+                (moment_inds_3[qubit1], operation) not in removals and 
+                (moment_inds_3[qubit2], second_H) not in removals):
+                removals.update([(moment_ind, operation), 
+                                 (prev_moment_ind, second_H), 
+                                 (moment_inds_3[qubit1], operation), 
+                                 (moment_inds_3[qubit2], second_H)])                    
+                replacements.append((moment_ind_2, 
+                                    _cnot(control_qubit, target_qubit), 
+                                    _cnot(target_qubit, control_qubit)))
                     
     mutated_circuit.batch_remove(removals)
     mutated_circuit.batch_replace(replacements)                                   
     mutated_circuit = cirq.drop_empty_moments(mutated_circuit)                                        
-    return mutated_circuit
\ No newline at end of file
+    return mutated_circuit
+
+# The optimizers apply the private transformers above, which return the FanoutCNOTs they
+# create, and convert the optimized circuit once at the end. The public transformers below
+# return standard Cirq operations, which can be serialized to JSON.
+
+@cirq.transformer
+def combine_cnots_with_controls_surrounded_by_hadamards(circuit, context=None):
+    """Applies circuit identity a) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_combine_cnots_with_controls_surrounded_by_hadamards(circuit))
+
+@cirq.transformer
+def remove_double_hadamards(circuit, context=None):
+    """Applies circuit identity b) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_remove_double_hadamards(circuit))
+
+@cirq.transformer
+def remove_double_cnots(circuit, context=None):
+    """Applies circuit identity c) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_remove_double_cnots(circuit))
+
+@cirq.transformer
+def combine_cnots(circuit, context=None):
+    """Applies circuit identity d) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_combine_cnots(circuit))
+
+@cirq.transformer
+def cnot_to_hadamards_and_cnot(circuit, context=None):
+    """Applies circuit identity e) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_cnot_to_hadamards_and_cnot(circuit))
+
+@cirq.transformer
+def hadamards_and_cnot_to_cnot(circuit, context=None):
+    """Applies circuit identity f) to all locations of the circuit that permit it
+
+    Args:
+        circuit (cirq.Circuit): original circuit
+
+    Returns:
+        mutated_circuit (cirq.Circuit): circuit gotten by applying the identity
+    """
+    return without_fanout_cnots(_hadamards_and_cnot_to_cnot(circuit))
+
+# The transformers and match counters classify operations without operation.gate where
+# they can: for a cirq.ControlledOperation it builds a new ControlledGate (and for a
+# multi-target-qubit CNOT a dense Pauli string) on every call.
+
+def _is_cnot(operation):
+    """Same as operation.gate == cirq.CNOT"""
+    if isinstance(operation, cirq.ControlledOperation) and len(operation.qubits) != 2:
+        return False
+    return operation.gate == cirq.CNOT
+
+def _is_cnot_with_multiple_targets(operation):
+    """Same as is_cnot_with_multiple_targets(operation)"""
+    if type(operation) is FanoutCNOT:
+        return True
+    if isinstance(operation, cirq.ControlledOperation) and isinstance(operation.sub_operation, cirq.PauliString):
+        return all(pauli == cirq.X for pauli in operation.sub_operation.values())
+    return is_cnot_with_multiple_targets(operation)
+
+def _is_cnot_or_cnot_with_multiple_targets(operation):
+    """Checks if a Cirq operation is a CNOT or a multi-target-qubit CNOT"""
+    return _is_cnot(operation) or _is_cnot_with_multiple_targets(operation)
+
+def _next_operation(wire_index, qubit, moment_ind):
+    """Returns the moment index and the operation of the first operation on qubit
+    after moment moment_ind or (None, None) if there is none
+    """
+    next_moment_ind = wire_index.next_moment_operating_on(qubits=[qubit], start_moment_index=moment_ind+1)
+    if next_moment_ind is None:
+        return None, None
+    return next_moment_ind, wire_index.operation_at(qubit, next_moment_ind)
+
+def _prev_operation(wire_index, qubit, moment_ind):
+    """Returns the moment index and the operation of the last operation on qubit
+    before moment moment_ind or (None, None) if there is none
+    """
+    prev_moment_ind = wire_index.prev_moment_operating_on(qubits=[qubit], end_moment_index=moment_ind)
+    if prev_moment_ind is None:
+        return None, None
+    return prev_moment_ind, wire_index.operation_at(qubit, prev_moment_ind)
+
+def _is_hadamard(operation):
+    """Checks if a Cirq operation (or None) is a Hadamard gate"""
+    return (operation is not None and not isinstance(operation, cirq.ControlledOperation) and 
+            operation.gate == cirq.H)
+
+def _count_empty_moments(circuit):
+    """Returns the number of moments without operations"""
+    return sum(1 for moment in circuit if not moment.operations)
+
+def count_combinable_cnots_with_controls_surrounded_by_hadamards(circuit, wire_index=None):
+    """Counts the locations where circuit identity a) applies without copying the circuit.
+    Empty moments are counted too because combine_cnots_with_controls_surrounded_by_hadamards
+    drops them.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): index of the circuit, built if not given
+
+    Returns:
+        n_matches (int): number of CNOTs that can be combined with the next CNOT on their
+                         target qubit plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    if wire_index is None:
+        wire_index = WireIndex(circuit)
+
+    n_matches = _count_empty_moments(circuit)
+    for moment_ind, moment in enumerate(circuit):
+        for operation in moment.operations:
+            if not _is_cnot(operation):
+                continue
+
+            control_qubit, target_qubit = operation.qubits
+            if (not _is_hadamard(_prev_operation(wire_index, control_qubit, moment_ind)[1]) or
+                not _is_hadamard(_next_operation(wire_index, control_qubit, moment_ind)[1])):
+                continue
+
+            cnot_ind, operation2 = _next_operation(wire_index, target_qubit, moment_ind)
+            if (operation2 is None or not _is_cnot(operation2) or 
+                operation2.qubits[1] != target_qubit or operation2.qubits[0] == control_qubit):
+                continue
+
+            prev_h_ind, prev_h = _prev_operation(wire_index, operation2.qubits[0], cnot_ind)
+            if (_is_hadamard(prev_h) and prev_h_ind <= moment_ind and
+                _is_hadamard(_next_operation(wire_index, operation2.qubits[0], cnot_ind)[1])):
+                n_matches += 1
+
+    return n_matches
+
+def count_double_hadamards(circuit, wire_index=None):
+    """Counts the locations where circuit identity b) applies without copying the circuit.
+    Empty moments are counted too because remove_double_hadamards drops them.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): index of the circuit, built if not given
+
+    Returns:
+        n_matches (int): number of Hadamards followed by a Hadamard on the same qubit
+                         plus the number of empty moments. If zero the transformer
+                         returns the circuit unchanged.
+    """
+    if wire_index is None:
+        wire_index = WireIndex(circuit)
+
+    n_matches = _count_empty_moments(circuit)
+    for qubit in circuit.all_qubits():
+        _, operations = wire_index.operations_on(qubit)
+        for operation, next_operation in zip(operations, operations[1:]):
+            if _is_hadamard(operation) and _is_hadamard(next_operation):
+                n_matches += 1
+
+    return n_matches
+
+def count_double_cnots(circuit, wire_index=None):
+    """Counts the locations where circuit identity c) applies without copying the circuit.
+    Empty moments are counted too because remove_double_cnots drops them.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): index of the circuit, built if not given
+
+    Returns:
+        n_matches (int): number of (multi-target-qubit) CNOTs directly followed by the
+                         same CNOT plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    if wire_index is None:
+        wire_index = WireIndex(circuit)
+
+    n_matches = _count_empty_moments(circuit)
+    for moment_ind, moment in enumerate(circuit):
+        for operation in moment.operations:
+            if not _is_cnot_or_cnot_with_multiple_targets(operation):
+                continue
+
+            moment_ind_2, operation2 = _next_operation(wire_index, operation.qubits[0], moment_ind)
+            if (operation2 is not None and len(operation2.qubits) == len(operation.qubits) and
+                operation2 == operation and all(
+                wire_index.next_moment_operating_on(qubits=[qubit], start_moment_index=moment_ind+1) == moment_ind_2
+                for qubit in operation.qubits[1:])):
+                n_matches += 1
+
+    return n_matches
+
+def count_combinable_cnots(circuit, wire_index=None):
+    """Counts the locations where circuit identity d) applies without copying the circuit
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): index of the circuit, built if not given
+
+    Returns:
+        n_matches (int): number of (multi-target-qubit) CNOTs that can be combined with
+                         the next CNOT on their control qubit. If zero combine_cnots
+                         returns the circuit unchanged.
+    """
+    if wire_index is None:
+        wire_index = WireIndex(circuit)
+
+    n_matches = 0
+    for moment_ind, moment in enumerate(circuit):
+        for operation in moment.operations:
+            if not _is_cnot_or_cnot_with_multiple_targets(operation):
+                continue
+
+            control_qubit = operation.qubits[0]
+            cnot_ind, operation2 = _next_operation(wire_index, control_qubit, moment_ind)
+            if (operation2 is None or not _is_cnot_or_cnot_with_multiple_targets(operation2) or
+                operation2.qubits[0] != control_qubit or 
+                not set(operation.qubits[1:]).isdisjoint(operation2.qubits[1:])):
+                continue
+
+            prev_moment_ind = wire_index.prev_moment_operating_on(qubits=operation2.qubits[1:], 
+                                                                  end_moment_index=cnot_ind)
+            if prev_moment_ind is None or prev_moment_ind < moment_ind:
+                n_matches += 1
+
+    return n_matches
+
+def count_cnots(circuit, wire_index=None):
+    """Counts the locations where circuit identity e) applies. Empty moments are counted
+    too because cnot_to_hadamards_and_cnot drops them.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): not needed, accepted for a uniform signature
+
+    Returns:
+        n_matches (int): number of CNOTs plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    return (sum(1 for operation in circuit.all_operations() if _is_cnot(operation)) + 
+            _count_empty_moments(circuit))
+
+def count_cnots_surrounded_by_hadamards(circuit, wire_index=None):
+    """Counts the locations where circuit identity f) applies without copying the circuit.
+    Empty moments are counted too because hadamards_and_cnot_to_cnot drops them.
+
+    Args:
+        circuit (cirq.AbstractCircuit): circuit that is searched
+        wire_index (WireIndex): index of the circuit, built if not given
+
+    Returns:
+        n_matches (int): number of CNOTs with Hadamards directly before and after them on
+                         both qubits plus the number of empty moments. If zero the
+                         transformer returns the circuit unchanged.
+    """
+    if wire_index is None:
+        wire_index = WireIndex(circuit)
+
+    n_matches = _count_empty_moments(circuit)
+    for moment_ind, moment in enumerate(circuit):
+        for operation in moment.operations:
+            if not _is_cnot(operation):
+                continue
+
+            if all(_is_hadamard(_prev_operation(wire_index, qubit, moment_ind)[1]) and 
+                   _is_hadamard(_next_operation(wire_index, qubit, moment_ind)[1])
+                   for qubit in operation.qubits):
+                n_matches += 1
+
+    return n_matches
\ No newline at end of file
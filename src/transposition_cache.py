@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+class TranspositionCache:
+    """Bounded cache of transformer results shared by the chains of the optimizer.
+
+    Different chains often reach the same intermediate circuit. The cache maps the
+    structure of a circuit (see src.functions.circuit_structure) and the index of
+    a transformer to the circuit the transformer returned for it, so a chain reaching
+    a known circuit reuses the result instead of applying the transformer again.
+    The structures are compared whenever their hashes match, so a hash collision does
+    not return the result of another circuit.
+    When the cache is full the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size (int): maximum number of stored transformer results
+        """
+        if max_size < 1:
+            raise ValueError(f"max_size must be positive, got {max_size}")
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, structure, function_ind):
+        """Returns the stored result of a transformer on a circuit
+
+        Args:
+            structure (tuple): structure of the input circuit
+            function_ind (int): index of the transformer in the function list
+
+        Returns:
+            entry (tuple): the output circuit, its structure and its length,
+                           or None if the result is not stored
+        """
+        key = (structure, function_ind)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, structure, function_ind, circuit, circuit_structure):
+        """Stores the output circuit of a transformer, evicting the least recently used
+        entry if the cache is full
+
+        Args:
+            structure (tuple): structure of the input circuit
+            function_ind (int): index of the transformer in the function list
+            circuit (cirq.Circuit or CompactCircuit): output circuit of the transformer,
+                                                      which must not be modified afterwards
+            circuit_structure (tuple): structure of the output circuit
+        """
+        key = (structure, function_ind)
+        self._entries[key] = (circuit, circuit_structure, len(circuit))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,238 @@
+import argparse
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+sys.path.append('../')
+from src.functions import circuit_fingerprint, flat_probs_to_matrix
+from src.optimizer import optimize, _BACKEND_FUNCTION_LISTS
+from src.random_circuit_generator import create_random_circuits
+from src.registry import DEFAULT_REGISTRY
+
+# candidates are drawn as log-weights rounded to multiples of this, so candidates that
+# round to the same weights share their scores in the score cache
+_LOG_WEIGHT_RESOLUTION = 0.1
+# smallest standard deviation of the log-weights, which keeps the search from collapsing
+# onto the first good candidate
+_MIN_STD = 0.1
+
+# training circuits and optimize arguments of a worker process, set once per worker by _init_worker
+_worker_circuits = None
+_worker_settings = None
+
+def weights_to_probs(weights):
+    """Splits n*n weights into the arguments of optimize for n transformers
+
+    Args:
+        weights (list(float)): n weights for the first transformer followed by the n*(n-1)
+                               transition weights in the order of flat_probs_to_matrix
+
+    Returns:
+        initial_probs (list(float)): probability distribution for choosing the first transformer
+        transition_probs (list(list(float))): nxn transition matrix with 0 on the diagonal
+    """
+    weights = [float(weight) for weight in weights]
+    n_transformers = math.isqrt(len(weights))
+    return weights[:n_transformers], flat_probs_to_matrix(weights[n_transformers:])
+
+def _optimizer_seed(seed, circuit_ind):
+    """Returns the optimize seed used for one training circuit"""
+    return seed * 1000003 + circuit_ind + 1
+
+def _optimized_length(circuit, weights, seed, settings):
+    """Optimizes circuit with the probabilities given by weights and returns the length of the result"""
+    initial_probs, transition_probs = weights_to_probs(weights)
+    n_iter, n_opt_circuits, backend, registry = settings
+    return len(optimize(circuit, initial_probs, transition_probs, n_iter=n_iter, n_opt_circuits=n_opt_circuits,
+                        seed=seed, backend=backend, registry=registry))
+
+def _init_worker(circuits, settings):
+    """Stores the training circuits and the optimize arguments in a worker process"""
+    global _worker_circuits, _worker_settings
+    _worker_circuits = circuits
+    _worker_settings = settings
+
+def _optimized_length_in_worker(args):
+    """Optimizes one training circuit in a worker process, see _optimized_length"""
+    circuit_ind, weights, seed = args
+    return _optimized_length(_worker_circuits[circuit_ind], weights, seed, _worker_settings)
+
+def tune_probabilities(n_qubits=5, n_templates=30, n_circuits=5, seed=0, n_generations=10, population_size=16,
+                       n_elite=4, n_iter=50, n_opt_circuits=5, backend='compact', n_workers=1, score_cache=None,
+                       return_history=False, registry=None):
+    """Tunes initial_probs and transition_probs of optimize with the cross-entropy method.
+    Each generation draws population_size candidates for the n*n log-weights of n
+    transformers (36 for the six default identities) from a normal
+    distribution, scores them on a training set of random circuits and fits the distribution
+    to the n_elite best candidates. The first candidate of each generation is the mean of the
+    distribution, and the first mean gives all transformers weight 1. A candidate is scored by
+    the average ratio between the length of the optimized circuit and the original circuit,
+    so lower is better, and every training circuit is always optimized with the same seed.
+
+    Args:
+        n_qubits (int): qubit count of the training circuits
+        n_templates (int): template count of the training circuits
+        n_circuits (int): how many training circuits are created with create_random_circuits
+        seed (int): seed of the training circuits, the candidates and the optimizer
+        n_generations (int): how many generations of candidates are scored
+        population_size (int): how many candidates each generation has
+        n_elite (int): to how many of the best candidates the distribution is fitted
+        n_iter (int): n_iter argument of optimize
+        n_opt_circuits (int): n_opt_circuits argument of optimize
+        backend (str): backend argument of optimize
+        n_workers (int): how many processes score the candidates in parallel. 1 scores them
+                         in the calling process and None uses all available cores.
+        score_cache (dict): if given, the optimized length of each training circuit is
+                            stored in it for each candidate and the optimize arguments, and
+                            reused when a candidate is scored again. It can be passed to
+                            later calls with the same training circuits.
+        return_history (bool): if True one record per generation is also returned
+        registry (TransformerRegistry): registry argument of optimize
+
+    Returns:
+        initial_probs (list(float)): tuned probability distribution for choosing the first transformer
+        transition_probs (list(list(float))): tuned transition matrix
+        score (float): average length ratio of the tuned probabilities on the training circuits
+        history (list(dict)): for each generation the best score so far, the mean score of
+                              the elite, and how many circuits were optimized and how many
+                              lengths were taken from the score cache, only returned if
+                              return_history is True
+    """
+    registry = DEFAULT_REGISTRY if registry is None else registry
+    if backend not in registry.backends:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {registry.backends}")
+    if not 1 <= n_elite <= population_size:
+        raise ValueError(f"n_elite must be between 1 and population_size, got {n_elite}")
+
+    circuits = list(create_random_circuits(n_qubits, n_templates, n_circuits=n_circuits, seed=seed))
+    circuit_keys = [circuit_fingerprint(circuit) for circuit in circuits]
+    input_lengths = [len(circuit) for circuit in circuits]
+    optimizer_seeds = [_optimizer_seed(seed, circuit_ind) for circuit_ind in range(n_circuits)]
+    settings = (n_iter, n_opt_circuits, backend, registry)
+    n_weights = len(registry) ** 2
+    score_cache = {} if score_cache is None else score_cache
+    rng = np.random.default_rng(seed)
+    mean = np.zeros(n_weights)
+    std = np.ones(n_weights)
+    best_weights, best_score = None, float('inf')
+    history = []
+    executor = None
+    if n_workers != 1:
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                       initargs=(circuits, settings))
+    try:
+        for generation in range(n_generations):
+            samples = mean + std * rng.standard_normal((population_size, n_weights))
+            samples[0] = mean
+            steps = np.rint(samples / _LOG_WEIGHT_RESOLUTION).astype(np.int64)
+            candidates = [tuple(candidate_steps) for candidate_steps in steps.tolist()]
+
+            # the lengths that are not cached are computed at once, so the workers share all of them
+            keys = [(candidate, circuit_key, optimizer_seed, settings)
+                    for candidate in candidates
+                    for circuit_key, optimizer_seed in zip(circuit_keys, optimizer_seeds)]
+            missing = {}
+            for key_ind, key in enumerate(keys):
+                if key not in score_cache and key not in missing:
+                    missing[key] = key_ind % n_circuits
+            tasks = [(circuit_ind, np.exp(np.array(key[0]) * _LOG_WEIGHT_RESOLUTION).tolist(), key[2])
+                     for key, circuit_ind in missing.items()]
+            if executor is None:
+                lengths = [_optimized_length(circuits[circuit_ind], weights, optimizer_seed, settings)
+                           for circuit_ind, weights, optimizer_seed in tasks]
+            else:
+                lengths = list(executor.map(_optimized_length_in_worker, tasks))
+            score_cache.update(zip(missing, lengths))
+
+            scores = []
+            for candidate_ind in range(population_size):
+                candidate_keys = keys[candidate_ind * n_circuits:(candidate_ind + 1) * n_circuits]
+                scores.append(sum(score_cache[key] / input_length
+                                  for key, input_length in zip(candidate_keys, input_lengths)) / n_circuits)
+
+            # sorted is stable, so the mean wins ties and the result does not depend on the sample order
+            elite = sorted(range(population_size), key=lambda candidate_ind: scores[candidate_ind])[:n_elite]
+            if scores[elite[0]] < best_score:
+                best_weights, best_score = candidates[elite[0]], scores[elite[0]]
+            elite_samples = steps[elite] * _LOG_WEIGHT_RESOLUTION
+            mean = elite_samples.mean(axis=0)
+            std = np.maximum(elite_samples.std(axis=0), _MIN_STD)
+            history.append({'generation': generation, 'best_score': best_score,
+                            'elite_score': sum(scores[candidate_ind] for candidate_ind in elite) / n_elite,
+                            'optimized': len(tasks), 'cached': len(keys) - len(tasks)})
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    initial_probs, transition_probs = weights_to_probs(np.exp(np.array(best_weights) * _LOG_WEIGHT_RESOLUTION))
+    if return_history:
+        return initial_probs, transition_probs, best_score, history
+    return initial_probs, transition_probs, best_score
+
+def save_probabilities(path, initial_probs, transition_probs, score=None):
+    """Writes tuned probabilities to a JSON file that load_probabilities reads
+
+    Args:
+        path (str): path of the file
+        initial_probs (list(float)): probability distribution for choosing the first transformer
+        transition_probs (list(list(float))): transition matrix
+        score (float): score of the probabilities, stored for reference
+    """
+    with open(path, 'w') as file:
+        json.dump({'initial_probs': list(initial_probs),
+                   'transition_probs': [list(row) for row in transition_probs],
+                   'score': score}, file, indent=2)
+
+def load_probabilities(path, registry=None):
+    """Reads probabilities written by save_probabilities
+
+    Args:
+        path (str): path of the file
+        registry (TransformerRegistry): if given, the probabilities are checked to be for
+                                        the identities of this registry
+
+    Returns:
+        initial_probs (list(float)): probability distribution for choosing the first transformer
+        transition_probs (list(list(float))): transition matrix
+    """
+    with open(path) as file:
+        probabilities = json.load(file)
+
+    initial_probs, transition_probs = probabilities['initial_probs'], probabilities['transition_probs']
+    n_transformers = len(initial_probs) if registry is None else len(registry)
+    if (len(initial_probs) != n_transformers or len(transition_probs) != n_transformers
+            or any(len(row) != n_transformers for row in transition_probs)):
+        raise ValueError(f"{path} does not contain {n_transformers} initial probabilities and a "
+                         f"{n_transformers}x{n_transformers} transition matrix")
+    return initial_probs, transition_probs
+
+def main(argv=None):
+    """Command line entry point, tunes the probabilities and writes them to --output"""
+    parser = argparse.ArgumentParser(description='Tune the transformer probabilities of the optimizer.')
+    parser.add_argument('--n-qubits', type=int, default=5)
+    parser.add_argument('--n-templates', type=int, default=30)
+    parser.add_argument('--n-circuits', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--population', type=int, default=16)
+    parser.add_argument('--elite', type=int, default=4)
+    parser.add_argument('--n-iter', type=int, default=50)
+    parser.add_argument('--n-opt-circuits', type=int, default=5)
+    parser.add_argument('--backend', choices=list(_BACKEND_FUNCTION_LISTS), default='compact')
+    parser.add_argument('--n-workers', type=int, default=1)
+    parser.add_argument('--output', required=True, help='JSON file the tuned probabilities are written to')
+    args = parser.parse_args(argv)
+
+    initial_probs, transition_probs, score, history = tune_probabilities(
+        args.n_qubits, args.n_templates, n_circuits=args.n_circuits, seed=args.seed, n_generations=args.generations,
+        population_size=args.population, n_elite=args.elite, n_iter=args.n_iter, n_opt_circuits=args.n_opt_circuits,
+        backend=args.backend, n_workers=args.n_workers, return_history=True)
+    for record in history:
+        print(f"generation {record['generation']:>3}  best {record['best_score']:.4f}  "
+              f"elite {record['elite_score']:.4f}  {record['optimized']:>5} optimized {record['cached']:>5} cached")
+    save_probabilities(args.output, initial_probs, transition_probs, score)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
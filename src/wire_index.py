@@ -0,0 +1,104 @@
+from bisect import bisect_left
+
+class WireIndex:
+    """Index of the operations on each qubit (wire) of a Cirq circuit.
+
+    For every qubit the index keeps the sorted moment indices of the operations
+    acting on it, so finding the next or previous operation on a qubit is a binary
+    search instead of the linear scan over moments done by
+    cirq.Circuit.next_moment_operating_on and prev_moment_operating_on.
+    The index is built in one pass over the circuit at the start of each transformer
+    call. The transformers only change the circuit after they have read it, so the
+    index is not updated afterwards.
+    """
+
+    def __init__(self, circuit):
+        """
+        Args:
+            circuit (cirq.AbstractCircuit): circuit that is indexed
+        """
+        self._n_moments = len(circuit)
+        self._moment_inds = {}
+        self._operations = {}
+        for moment_ind, moment in enumerate(circuit):
+            for operation in moment.operations:
+                for qubit in operation.qubits:
+                    self._moment_inds.setdefault(qubit, []).append(moment_ind)
+                    self._operations.setdefault(qubit, []).append(operation)
+
+    def next_moment_operating_on(self, qubits, start_moment_index=0):
+        """Same as cirq.Circuit.next_moment_operating_on without max_distance
+
+        Args:
+            qubits (list(cirq.Qid)): qubits to look for
+            start_moment_index (int): index of the first moment considered
+
+        Returns:
+            moment_ind (int): index of the first moment at or after start_moment_index
+                              operating on any of the qubits or None if there is none
+        """
+        next_moment_ind = None
+        for qubit in qubits:
+            moment_inds = self._moment_inds.get(qubit, [])
+            ind = bisect_left(moment_inds, start_moment_index)
+            if ind < len(moment_inds) and (next_moment_ind is None or moment_inds[ind] < next_moment_ind):
+                next_moment_ind = moment_inds[ind]
+
+        return next_moment_ind
+
+    def prev_moment_operating_on(self, qubits, end_moment_index=None):
+        """Same as cirq.Circuit.prev_moment_operating_on without max_distance
+
+        Args:
+            qubits (list(cirq.Qid)): qubits to look for
+            end_moment_index (int): moments before this index are considered,
+                                    defaults to the length of the circuit
+
+        Returns:
+            moment_ind (int): index of the last moment before end_moment_index
+                              operating on any of the qubits or None if there is none
+        """
+        if end_moment_index is None:
+            end_moment_index = self._n_moments
+
+        prev_moment_ind = None
+        for qubit in qubits:
+            moment_inds = self._moment_inds.get(qubit, [])
+            ind = bisect_left(moment_inds, end_moment_index) - 1
+            if ind >= 0 and (prev_moment_ind is None or moment_inds[ind] > prev_moment_ind):
+                prev_moment_ind = moment_inds[ind]
+
+        return prev_moment_ind
+
+    def next_moments_operating_on(self, qubits, start_moment_index=0):
+        """Same as cirq.Circuit.next_moments_operating_on
+
+        Args:
+            qubits (list(cirq.Qid)): qubits to look for
+            start_moment_index (int): index of the first moment considered
+
+        Returns:
+            moment_inds (dict(cirq.Qid, int)): index of the first moment at or after
+                                               start_moment_index operating on each qubit
+                                               or the length of the circuit if there is none
+        """
+        next_moment_inds = {}
+        for qubit in qubits:
+            next_moment_ind = self.next_moment_operating_on([qubit], start_moment_index)
+            next_moment_inds[qubit] = self._n_moments if next_moment_ind is None else next_moment_ind
+
+        return next_moment_inds
+
+    def operations_on(self, qubit):
+        """Returns the moment indices and the operations acting on qubit in time order.
+        The returned lists are the index's own and must not be modified.
+        """
+        return self._moment_inds.get(qubit, []), self._operations.get(qubit, [])
+
+    def operation_at(self, qubit, moment_ind):
+        """Returns the operation acting on qubit in moment moment_ind or None"""
+        moment_inds = self._moment_inds.get(qubit, [])
+        ind = bisect_left(moment_inds, moment_ind)
+        if ind < len(moment_inds) and moment_inds[ind] == moment_ind:
+            return self._operations[qubit][ind]
+        return None
@@ -0,0 +1,327 @@
+import sys
+import numpy as np
+sys.path.append('../')
+from src.compact_circuit import GateKind
+from src import compact_transformers
+from src.compact_transformers import (
+    _combine_cnots_with_controls_surrounded_by_hadamards_at,
+    _remove_double_hadamards_at,
+    _remove_double_cnots_at,
+    _combine_cnots_at,
+    _hadamards_and_cnot_to_cnot_at
+)
+
+_H = int(GateKind.H)
+_CNOT = int(GateKind.CNOT)
+_MULTI_CNOT = int(GateKind.MULTI_CNOT)
+_CNOT_KINDS = {_CNOT, _MULTI_CNOT}
+
+# the identities in the order of the optimizer's function lists: name, rewrite of a single
+# location and the kinds of the operations at which the rewrite is tried. The expanding
+# identity e) has no rewrite of a single location, it rewrites every CNOT at once.
+_IDENTITIES = [
+    ('remove_double_hadamards', _remove_double_hadamards_at, {_H}),
+    ('combine_cnots', _combine_cnots_at, _CNOT_KINDS),
+    ('remove_double_cnots', _remove_double_cnots_at, _CNOT_KINDS),
+    ('hadamards_and_cnot_to_cnot', _hadamards_and_cnot_to_cnot_at, {_H}),
+    ('cnot_to_hadamards_and_cnot', None, {_CNOT}),
+    ('combine_cnots_with_controls_surrounded_by_hadamards', _combine_cnots_with_controls_surrounded_by_hadamards_at,
+     {_CNOT})
+]
+
+# moments are placed between existing ones by halving the gap of their keys, so the keys are
+# renumbered before the gaps get close to the precision of the keys
+_MIN_KEY_GAP = 2 ** -20
+
+class WorklistEngine:
+    """Incremental rewrite engine that applies the circuit identities to a CompactCircuit
+    in place.
+
+    For every identity the engine keeps a worklist of the operations at which the
+    identity may match. Initially all operations are on the worklists. Applying an
+    identity only tries the operations on its worklist, in time order like the passes
+    of src/compact_transformers.py, and empties it. A rewrite logs the operations whose
+    links it changed. Before an identity is applied, the operations logged since its
+    last application are expanded to the operations whose match can depend on those
+    links (see _affected_ops) and put on its worklist. So an empty worklist means that
+    the identity does not change the circuit, and the cost of applying an identity is
+    proportional to the size of the changes since it was last applied instead of the
+    size of the circuit. The expanding identity e) changes every CNOT and rebuilds the
+    circuit.
+
+    The engine is used by optimize with backend='worklist' through the functions below.
+    Its length is the number of non-empty moments and the result of a chain is
+    returned by compact_circuit.
+    """
+
+    def __init__(self, compact_circuit):
+        """
+        Args:
+            compact_circuit (CompactCircuit): circuit that is rewritten, it is not modified
+        """
+        self._reset(compact_circuit.compact())
+        self._version = 0
+
+    def _reset(self, circuit):
+        """Starts over from circuit with all operations on the worklists"""
+        self.circuit = circuit
+        self.circuit.track_moment_order()
+        ops = circuit.operations_in_order().tolist()
+        kinds = circuit.kind[:circuit.n_op_ids].tolist()
+        self._worklists = [{op for op in ops if kinds[op] in identity_kinds}
+                           for _, _, identity_kinds in _IDENTITIES]
+        # operations changed by rewrites, an identity takes the ones logged since it was
+        # last applied onto its worklist when it is applied
+        self._changed_log = []
+        self._log_positions = [0] * len(_IDENTITIES)
+        self._renumber = False
+
+    def __len__(self):
+        """Number of non-empty moments"""
+        return self.circuit.n_nonempty_moments
+
+    @property
+    def n_operations(self):
+        """Number of operations in the circuit"""
+        return self.circuit.n_operations
+
+    def structure(self):
+        """Returns a tuple that changes whenever a rewrite changes the circuit. Unlike
+        CompactCircuit.structure it only identifies states of the same engine.
+        """
+        return (id(self), self._version)
+
+    def fingerprint(self):
+        """Returns the hash of structure()"""
+        return hash(self.structure())
+
+    def compact_circuit(self):
+        """Returns a compacted copy of the current circuit"""
+        return self.circuit.compact()
+
+    def n_candidates(self, identity_ind):
+        """Returns the number of operations at which identity identity_ind may match.
+        If zero applying the identity does not change the circuit.
+        """
+        if _IDENTITIES[identity_ind][1] is None:
+            return self._n_cnots()
+        self._take_changed(identity_ind)
+        return len(self._worklists[identity_ind])
+
+    def apply(self, identity_ind):
+        """Applies identity identity_ind (index in _IDENTITIES) at all operations on its worklist
+
+        Returns:
+            n_rewrites (int): number of locations that were rewritten
+        """
+        rewrite_at = _IDENTITIES[identity_ind][1]
+        if rewrite_at is None:
+            return self._expand()
+
+        self._take_changed(identity_ind)
+        circuit = self.circuit
+        worklist = self._worklists[identity_ind]
+        # like a pass over the circuit the operations are tried in time order. Matches
+        # created by the rewrites of this call are left for the next call.
+        ops = np.fromiter(worklist, dtype=np.int64, count=len(worklist))
+        ops = ops[np.lexsort((ops, circuit.key[ops]))].tolist()
+        worklist.clear()
+        n_rewrites = 0
+        for op in ops:
+            if not circuit.alive[op]:
+                continue
+
+            removed_ops, new_ops = rewrite_at(circuit, op)
+            if removed_ops is not None:
+                n_rewrites += 1
+                self._log_rewrite(removed_ops, new_ops)
+
+        if n_rewrites > 0:
+            self._version += 1
+        if self._renumber:
+            self._renumber_keys()
+        return n_rewrites
+
+    def _log_rewrite(self, removed_ops, new_ops):
+        """Takes the removed operations off the worklists and logs the operations whose
+        links a rewrite changed: the new operations and the live neighbours of the removed ones
+        """
+        circuit = self.circuit
+        for worklist in self._worklists:
+            worklist.difference_update(removed_ops)
+
+        changed_log = self._changed_log
+        changed_log.extend(new_ops)
+        inc_op = circuit.inc_op
+        alive = circuit.alive
+        # the links of removed operations still point to the operations around them at the
+        # time they were removed
+        for op in removed_ops:
+            start = circuit.inc_start[op]
+            for inc in range(start, start + circuit.inc_count[op]):
+                for links in (circuit.inc_prev, circuit.inc_next):
+                    neighbour_inc = links[inc]
+                    while neighbour_inc >= 0 and not alive[inc_op[neighbour_inc]]:
+                        neighbour_inc = links[neighbour_inc]
+                    if neighbour_inc >= 0:
+                        changed_log.append(int(inc_op[neighbour_inc]))
+
+        for op in new_ops:
+            key = circuit.key[op]
+            for moment_key in (circuit.moment_key_before(key), circuit.moment_key_after(key)):
+                if moment_key is not None and abs(moment_key - key) < _MIN_KEY_GAP:
+                    self._renumber = True
+
+    def _take_changed(self, identity_ind):
+        """Puts the operations whose match can have changed since identity identity_ind was
+        last applied on its worklist
+        """
+        log_position = self._log_positions[identity_ind]
+        if log_position == len(self._changed_log):
+            return
+
+        circuit = self.circuit
+        ops = np.array(self._changed_log[log_position:], dtype=np.int64)
+        ops = self._affected_ops(ops[circuit.alive[ops]])
+        identity_kinds = list(_IDENTITIES[identity_ind][2])
+        ops = ops[np.isin(circuit.kind[ops], identity_kinds)]
+        self._worklists[identity_ind].update(ops.tolist())
+        self._log_positions[identity_ind] = len(self._changed_log)
+
+    def _affected_ops(self, logged_ops):
+        """Returns the operations whose match depends on the links of the live logged operations.
+
+        The operations whose links changed since the operations were logged are the logged
+        ones and their neighbours: a later rewrite removing a logged operation logs its
+        neighbours and one inserting an operation next to it logs the new operation. A match
+        depends on the links of the operation it starts at, of the CNOT after the Hadamard
+        for identity f) and of the CNOTs of the chains of identities a) and d).
+        """
+        circuit = self.circuit
+        kinds = circuit.kind
+        near_ops = np.unique(np.concatenate([logged_ops, self._neighbours(logged_ops)]))
+        near_cnots = near_ops[np.isin(kinds[near_ops], list(_CNOT_KINDS))]
+        near_plain_cnots = near_cnots[kinds[near_cnots] == _CNOT]
+        return np.unique(np.concatenate([near_ops, self._neighbours(near_plain_cnots),
+                                         self._chain_starts_before(near_cnots, near_plain_cnots)]))
+
+    def _renumber_keys(self):
+        """Compacts the circuit, which numbers the moments 0, 1, 2, ..., and renames the
+        operations on the worklists to their indices in the compacted circuit
+        """
+        for identity_ind, (_, rewrite_at, _) in enumerate(_IDENTITIES):
+            if rewrite_at is not None:
+                self._take_changed(identity_ind)
+        new_ids = np.cumsum(self.circuit.alive[:self.circuit.n_op_ids]) - 1
+        self.circuit = self.circuit.compact()
+        self.circuit.track_moment_order()
+        self._worklists = [set(new_ids[list(worklist)].tolist()) for worklist in self._worklists]
+        self._changed_log = []
+        self._log_positions = [0] * len(_IDENTITIES)
+        self._renumber = False
+
+    def _n_cnots(self):
+        """Number of CNOTs, the locations where identity e) applies"""
+        return len(self.circuit.operations_in_order([_CNOT]))
+
+    def _expand(self):
+        """Applies identity e) to every CNOT and starts over from the result"""
+        n_cnots = self._n_cnots()
+        if n_cnots > 0:
+            self._reset(compact_transformers.cnot_to_hadamards_and_cnot(self.circuit))
+            self._version += 1
+        return n_cnots
+
+    def _incidences(self, ops):
+        """Returns the incidences of the operations of the array ops"""
+        circuit = self.circuit
+        counts = circuit.inc_count[ops]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(circuit.inc_start[ops], counts) + offsets
+
+    def _neighbours(self, ops):
+        """Returns the operations directly before and after the operations of the array ops on their qubits"""
+        circuit = self.circuit
+        incs = self._incidences(ops)
+        neighbour_incs = np.concatenate([circuit.inc_prev[incs], circuit.inc_next[incs]])
+        return circuit.inc_op[neighbour_incs[neighbour_incs >= 0]]
+
+    def _chain_starts_before(self, cnots, plain_cnots):
+        """Returns the CNOTs at which a chain reaching one of the given CNOTs can start: the
+        (multi-target-qubit) CNOTs directly before the (multi-target-qubit) CNOTs cnots that
+        are controlled by the same qubit for identity d) and the CNOTs directly before the
+        CNOTs plain_cnots that target the same qubit for identity a)
+        """
+        circuit = self.circuit
+        # the walk back follows the incidences at the same position: the control for d) and
+        # the target for a)
+        incs = np.concatenate([circuit.inc_start[cnots], circuit.inc_start[plain_cnots] + 1])
+        qubit_pos = np.concatenate([np.zeros(len(cnots), dtype=np.int64), np.ones(len(plain_cnots), dtype=np.int64)])
+        chain_starts = []
+        while len(incs) > 0:
+            incs = circuit.inc_prev[incs]
+            ops = circuit.inc_op[incs]
+            in_chain = incs >= 0
+            in_chain &= incs - circuit.inc_start[ops] == qubit_pos
+            op_kinds = circuit.kind[ops]
+            in_chain &= np.where(qubit_pos == 0, np.isin(op_kinds, list(_CNOT_KINDS)), op_kinds == _CNOT)
+            incs, unique_inds = np.unique(incs[in_chain], return_index=True)
+            qubit_pos = qubit_pos[in_chain][unique_inds]
+            chain_starts.append(circuit.inc_op[incs])
+        return np.concatenate(chain_starts) if chain_starts else np.zeros(0, dtype=np.int64)
+
+# transformers and match counters of the engine with the names of the transformers they stand for
+
+def remove_double_hadamards(engine):
+    """Applies circuit identity b) to a WorklistEngine in place and returns the engine"""
+    engine.apply(0)
+    return engine
+
+def combine_cnots(engine):
+    """Applies circuit identity d) to a WorklistEngine in place and returns the engine"""
+    engine.apply(1)
+    return engine
+
+def remove_double_cnots(engine):
+    """Applies circuit identity c) to a WorklistEngine in place and returns the engine"""
+    engine.apply(2)
+    return engine
+
+def hadamards_and_cnot_to_cnot(engine):
+    """Applies circuit identity f) to a WorklistEngine in place and returns the engine"""
+    engine.apply(3)
+    return engine
+
+def cnot_to_hadamards_and_cnot(engine):
+    """Applies circuit identity e) to a WorklistEngine in place and returns the engine"""
+    engine.apply(4)
+    return engine
+
+def combine_cnots_with_controls_surrounded_by_hadamards(engine):
+    """Applies circuit identity a) to a WorklistEngine in place and returns the engine"""
+    engine.apply(5)
+    return engine
+
+def n_candidates_of_remove_double_hadamards(engine):
+    """Returns the number of locations of a WorklistEngine where identity b) may apply"""
+    return engine.n_candidates(0)
+
+def n_candidates_of_combine_cnots(engine):
+    """Returns the number of locations of a WorklistEngine where identity d) may apply"""
+    return engine.n_candidates(1)
+
+def n_candidates_of_remove_double_cnots(engine):
+    """Returns the number of locations of a WorklistEngine where identity c) may apply"""
+    return engine.n_candidates(2)
+
+def n_candidates_of_hadamards_and_cnot_to_cnot(engine):
+    """Returns the number of locations of a WorklistEngine where identity f) may apply"""
+    return engine.n_candidates(3)
+
+def n_candidates_of_cnot_to_hadamards_and_cnot(engine):
+    """Returns the number of locations of a WorklistEngine where identity e) may apply"""
+    return engine.n_candidates(4)
+
+def n_candidates_of_combine_cnots_with_controls_surrounded_by_hadamards(engine):
+    """Returns the number of locations of a WorklistEngine where identity a) may apply"""
+    return engine.n_candidates(5)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from src.benchmark import benchmark_grid, compare_strategies, write_results, load_results, compare_to_baseline, main
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_one_record_per_grid_point_and_function(self):
+        results = benchmark_grid([2, 3], [5], n_repeats=1, n_iter=2, n_opt_circuits=2)
+        self.assertEqual(len(results), 2 * 7)
+        self.assertEqual(results[6]['name'], 'optimize')
+        for result in results:
+            self.assertGreater(result['time_s'], 0)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+
+    def test_same_seed_gives_same_circuits(self):
+        results1 = benchmark_grid([3], [10], seed=4, n_repeats=1, n_iter=2, n_opt_circuits=2)
+        results2 = benchmark_grid([3], [10], seed=4, n_repeats=1, n_iter=2, n_opt_circuits=2)
+        self.assertEqual([(r['input_length'], r['output_length']) for r in results1],
+                         [(r['input_length'], r['output_length']) for r in results2])
+
+    def test_compare_strategies(self):
+        results = compare_strategies([3], [5, 10], n_circuits=2, n_iter=5, n_opt_circuits=2, depth=5)
+        self.assertEqual([(result['n_templates'], result['strategy']) for result in results],
+                         [(5, 'random'), (5, 'beam'), (10, 'random'), (10, 'beam')])
+        for result in results:
+            self.assertGreater(result['transformer_calls'], 0)
+            if result['strategy'] == 'beam':
+                self.assertLessEqual(result['output_length'], result['input_length'])
+
+    def test_write_and_load_results(self):
+        results = benchmark_grid([2], [5], n_repeats=1, n_iter=2, n_opt_circuits=2, backend='compact')
+        with tempfile.TemporaryDirectory() as directory:
+            for file_name in ('results.json', 'results.csv'):
+                path = os.path.join(directory, file_name)
+                write_results(results, path)
+                self.assertEqual(load_results(path), results)
+
+    def test_compare_to_baseline(self):
+        baseline = [{'backend': 'cirq', 'n_qubits': 2, 'n_templates': 5, 'name': 'optimize',
+                     'time_s': 1.0, 'peak_memory_bytes': 1000}]
+        results = [dict(baseline[0], time_s=1.1, peak_memory_bytes=2000)]
+        regressions = compare_to_baseline(results, baseline, tolerance=0.2)
+        self.assertEqual([regression['metric'] for regression in regressions], ['peak_memory_bytes'])
+        self.assertEqual(regressions[0]['ratio'], 2)
+        self.assertEqual(compare_to_baseline(results, baseline, tolerance=1.5), [])
+
+    def test_main_flags_regressions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            arguments = ['--n-qubits', '2', '--n-templates', '5', '--repeats', '1', '--n-iter', '2',
+                         '--n-opt-circuits', '2']
+            self.assertEqual(main(arguments + ['--output', path]), 0)
+            baseline = load_results(path)
+            for result in baseline:
+                result['time_s'] = 1e-9
+            write_results(baseline, path)
+            self.assertEqual(main(arguments + ['--baseline', path]), 1)
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import cirq
+import numpy as np
+from src import compact_transformers
+from src.binary_format import write_circuits, read_circuits
+from src.compact_circuit import CompactCircuit
+from src.functions import create_cnot_with_multiple_targets
+from src.random_circuit_generator import create_random_circuits
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'circuits.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        qubits = cirq.LineQubit.range(2, 6)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.H(qubits[0]), cirq.CNOT(qubits[1], qubits[2])])
+        circuit.append(create_cnot_with_multiple_targets(target_qubits=[qubits[3], qubits[1]],
+                                                         control_qubit=qubits[0]))
+        circuit.append(cirq.Moment())
+        circuit.append(cirq.H(qubits[3]))
+        circuits = [circuit, cirq.Circuit()] + list(create_random_circuits(5, 30, n_circuits=3, seed=1))
+        write_circuits(self.path, circuits)
+        batch = read_circuits(self.path)
+        self.assertEqual(len(batch), 5)
+        self.assertEqual(list(batch), circuits)
+        self.assertEqual(batch[-1], circuits[-1])
+        with self.assertRaises(IndexError):
+            batch[5]
+
+    def test_round_trip_of_rewritten_compact_circuit(self):
+        circuit = next(create_random_circuits(5, 30, seed=2))
+        compact_circuit = compact_transformers.cnot_to_hadamards_and_cnot(CompactCircuit.from_circuit(circuit))
+        compact_circuit = compact_transformers.remove_double_hadamards(compact_circuit)
+        write_circuits(self.path, [compact_circuit])
+        read_circuit = read_circuits(self.path).compact_circuit(0)
+        self.assertEqual(read_circuit.fingerprint(), compact_circuit.fingerprint())
+        self.assertEqual(read_circuit.to_circuit(), compact_circuit.to_circuit())
+
+    def test_arrays_are_memory_mapped(self):
+        write_circuits(self.path, create_random_circuits(4, 10, n_circuits=2, seed=3))
+        batch = read_circuits(self.path)
+        arrays = batch.arrays(1)
+        for name in ('qubits', 'moment', 'kind', 'qubit_count', 'qubit_ind'):
+            self.assertTrue(np.shares_memory(arrays[name], batch._memory_map))
+            self.assertFalse(arrays[name].flags.writeable)
+        self.assertEqual(arrays['qubit_count'].sum(), len(arrays['qubit_ind']))
+
+    def test_unsupported_circuits(self):
+        with self.assertRaises(ValueError):
+            write_circuits(self.path, [cirq.Circuit(cirq.X(cirq.LineQubit(0)))])
+        with self.assertRaises(ValueError):
+            write_circuits(self.path, [cirq.Circuit(cirq.H(cirq.GridQubit(0, 0)))])
+        with open(self.path, 'wb') as file:
+            file.write(b'not a circuit file' * 4)
+        with self.assertRaises(ValueError):
+            read_circuits(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import pickle
+import cirq
+from src.random_circuit_generator import create_random_circuit
+from src.functions import create_cnot_with_multiple_targets
+from src.compact_circuit import CompactCircuit, GateKind
+
+class TestCompactCircuit(unittest.TestCase):
+
+    def test_round_trip(self):
+        qubits = cirq.LineQubit.range(4)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.H(qubits[0]), cirq.CNOT(qubits[1], qubits[2])])
+        circuit.append(create_cnot_with_multiple_targets(target_qubits=[qubits[3], qubits[1]],
+                                                         control_qubit=qubits[0]))
+        circuit.append(cirq.Moment())
+        circuit.append([cirq.X(qubits[2]), cirq.H(qubits[3])])
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        self.assertEqual(len(compact_circuit), len(circuit))
+        self.assertEqual(compact_circuit.n_operations, 5)
+        self.assertEqual(compact_circuit.to_circuit(), circuit)
+
+    def test_round_trip_of_multi_control_and_0_controlled_cnots(self):
+        qubits = cirq.LineQubit.range(4)
+        circuit = cirq.Circuit([
+            cirq.ControlledOperation(qubits[:2], cirq.PauliString({qubits[2]: cirq.X})),
+            cirq.ControlledOperation(qubits[:2], cirq.PauliString({qubit: cirq.X for qubit in qubits[2:]})),
+            cirq.ControlledOperation(qubits[:1], cirq.PauliString({qubit: cirq.X for qubit in qubits[1:]}),
+                                     control_values=[0]),
+            cirq.H(qubits[0])])
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        self.assertEqual([GateKind(kind) for kind in compact_circuit.kind[:3]], [GateKind.OTHER] * 3)
+        self.assertEqual(compact_circuit.to_circuit(), circuit)
+        cirq.testing.assert_allclose_up_to_global_phase(cirq.unitary(compact_circuit.to_circuit()),
+                                                        cirq.unitary(circuit), atol=1e-8)
+
+    def test_round_trip_of_random_circuit(self):
+        circuit = create_random_circuit(7, 50)
+        self.assertEqual(CompactCircuit.from_circuit(circuit).to_circuit(), circuit)
+
+    def test_pickling(self):
+        circuit = create_random_circuit(7, 50)
+        compact_circuit = pickle.loads(pickle.dumps(CompactCircuit.from_circuit(circuit)))
+        self.assertEqual(compact_circuit.to_circuit(), circuit)
+
+    def test_fingerprint(self):
+        circuit = create_random_circuit(7, 50)
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        self.assertEqual(compact_circuit.fingerprint(), compact_circuit.compact().fingerprint())
+        self.assertEqual(compact_circuit.fingerprint(), pickle.loads(pickle.dumps(compact_circuit)).fingerprint())
+        op = int(compact_circuit.operations_in_order([GateKind.H])[0])
+        new_op = compact_circuit.replace([op], [(GateKind.H, compact_circuit.qubits_of(op),
+                                                 compact_circuit.key[op])])[0]
+        self.assertEqual(compact_circuit.fingerprint(), CompactCircuit.from_circuit(circuit).fingerprint())
+        compact_circuit.replace([new_op])
+        self.assertNotEqual(compact_circuit.fingerprint(), CompactCircuit.from_circuit(circuit).fingerprint())
+
+    def test_replace(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit([cirq.H(qubits[0]), cirq.CNOT(qubits[0], qubits[1]), cirq.H(qubits[0])])
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        first_h, cnot, last_h = compact_circuit.operations_in_order().tolist()
+        self.assertEqual(compact_circuit.next_on(first_h), cnot)
+        self.assertEqual(compact_circuit.prev_on(last_h), cnot)
+        new_cnot, = compact_circuit.replace([first_h, cnot], [(GateKind.CNOT, [1, 0], 0)])
+        self.assertEqual(compact_circuit.prev_on(last_h), new_cnot)
+        self.assertEqual(compact_circuit.next_on(new_cnot, 1), last_h)
+        self.assertEqual(compact_circuit.next_on(new_cnot, 0), -1)
+        expected_circuit = cirq.Circuit.from_moments(cirq.CNOT(qubits[1], qubits[0]), [], cirq.H(qubits[0]))
+        self.assertEqual(compact_circuit.to_circuit(), expected_circuit)
+        self.assertEqual(compact_circuit.compact().to_circuit(), cirq.drop_empty_moments(expected_circuit))
+
+    def test_copy_shares_arrays_until_written(self):
+        circuit = create_random_circuit(5, 20)
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        copied_circuit = compact_circuit.copy()
+        self.assertIs(copied_circuit.kind, compact_circuit.kind)
+        self.assertIs(compact_circuit.compact().kind, compact_circuit.kind)
+        op = int(copied_circuit.operations_in_order([GateKind.H])[0])
+        copied_circuit.replace([op])
+        self.assertIsNot(copied_circuit.kind, compact_circuit.kind)
+        self.assertEqual(compact_circuit.to_circuit(), cirq.drop_empty_moments(circuit))
+        self.assertEqual(copied_circuit.n_operations, compact_circuit.n_operations - 1)
+
+if __name__ == '__main__':
+    unittest.main()
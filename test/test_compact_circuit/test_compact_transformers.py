@@ -0,0 +1,92 @@
+import unittest
+import cirq
+from cirq.circuits import InsertStrategy
+from src.random_circuit_generator import create_random_circuit
+from src.functions import create_cnot_with_multiple_targets
+from src.compact_circuit import CompactCircuit
+from src import compact_transformers
+
+def _apply(transformer, circuit):
+    """Applies a compact transformer to a Cirq circuit and returns a Cirq circuit"""
+    return transformer(CompactCircuit.from_circuit(circuit)).to_circuit()
+
+class TestCompactTransformers(unittest.TestCase):
+
+    def test_combine_cnots_with_controls_surrounded_by_hadamards(self):
+        qubits = cirq.LineQubit.range(5)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.H(qubits[i]) for i in range(4)])
+        circuit.append([cirq.CNOT(qubits[i], qubits[4]) for i in range(4)])
+        circuit.append([cirq.H(qubits[i]) for i in range(4)])
+        circuit = _apply(compact_transformers.combine_cnots_with_controls_surrounded_by_hadamards, circuit)
+        expected_circuit = cirq.Circuit()
+        expected_circuit.append(cirq.H(qubits[4]))
+        expected_circuit.append(create_cnot_with_multiple_targets(target_qubits=qubits[:4], control_qubit=qubits[4]))
+        expected_circuit.append(cirq.H(qubits[4]))
+        self.assertEqual(circuit, expected_circuit)
+
+    def test_remove_double_hadamards(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit([cirq.H(qubits[0]), cirq.H(qubits[0]), cirq.H(qubits[1])])
+        circuit = _apply(compact_transformers.remove_double_hadamards, circuit)
+        self.assertEqual(circuit, cirq.Circuit(cirq.H(qubits[1])))
+
+    def test_remove_double_cnots(self):
+        qubits = cirq.LineQubit.range(3)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.CNOT(qubits[0], qubits[1]) for i in range(2)])
+        circuit.append([create_cnot_with_multiple_targets(target_qubits=qubits[1:], control_qubit=qubits[0]),
+                        create_cnot_with_multiple_targets(target_qubits=qubits[:0:-1], control_qubit=qubits[0])])
+        circuit = _apply(compact_transformers.remove_double_cnots, circuit)
+        self.assertEqual(circuit, cirq.Circuit())
+
+    def test_combine_cnots(self):
+        qubits = cirq.LineQubit.range(5)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.CNOT(qubits[0], qubits[i]) for i in range(1, 5)])
+        circuit = _apply(compact_transformers.combine_cnots, circuit)
+        expected_circuit = cirq.Circuit(create_cnot_with_multiple_targets(target_qubits=qubits[1:],
+                                                                          control_qubit=qubits[0]))
+        self.assertEqual(circuit, expected_circuit)
+
+    def test_cnot_to_hadamards_and_cnot(self):
+        qubits = cirq.LineQubit.range(5)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.CNOT(qubits[i], qubits[i+1]) for i in range(4)])
+        circuit = _apply(compact_transformers.cnot_to_hadamards_and_cnot, circuit)
+        expected_circuit = cirq.Circuit()
+        for i in range(4):
+            expected_circuit.append([cirq.H(qubits[i]), cirq.H(qubits[i+1])], strategy=InsertStrategy.INLINE)
+            expected_circuit.append(cirq.CNOT(qubits[i+1], qubits[i]), strategy=InsertStrategy.INLINE)
+            expected_circuit.append([cirq.H(qubits[i]), cirq.H(qubits[i+1])], strategy=InsertStrategy.INLINE)
+
+        self.assertEqual(circuit, expected_circuit)
+
+    def test_hadamards_and_cnot_to_cnot(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit()
+        circuit.append([cirq.H(qubits[0]), cirq.H(qubits[1])])
+        circuit.append(cirq.CNOT(qubits[1], qubits[0]))
+        circuit.append([cirq.H(qubits[0]), cirq.H(qubits[1])])
+        circuit = _apply(compact_transformers.hadamards_and_cnot_to_cnot, circuit)
+        self.assertEqual(circuit, cirq.Circuit(cirq.CNOT(qubits[0], qubits[1])))
+
+    def test_does_not_change_effect_of_circuit(self):
+        n_qubits = 5
+        n_templates = 30
+        transformers = [
+            compact_transformers.combine_cnots_with_controls_surrounded_by_hadamards,
+            compact_transformers.remove_double_hadamards,
+            compact_transformers.remove_double_cnots,
+            compact_transformers.combine_cnots,
+            compact_transformers.cnot_to_hadamards_and_cnot,
+            compact_transformers.hadamards_and_cnot_to_cnot
+        ]
+        for transformer in transformers:
+            circuit = create_random_circuit(n_qubits, n_templates)
+            opt_circuit = _apply(transformer, circuit)
+            cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                                   reference=circuit)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import time
+import unittest
+import cirq
+import numpy as np
+from src.compact_circuit import CompactCircuit
+from src.equivalence import clifford_tableau, circuits_are_equivalent
+from src.functions import create_cnot_with_multiple_targets, flat_probs_to_matrix
+from src.optimizer import optimize
+from src.random_circuit_generator import create_random_circuits
+from src.registry import TransformerRegistry
+
+class TestEquivalence(unittest.TestCase):
+
+    def test_tableau_of_single_gates(self):
+        q0, q1 = cirq.LineQubit.range(2)
+        x, z, r = clifford_tableau(cirq.Circuit(cirq.H(q0)))
+        # X -> Z and Z -> X
+        self.assertEqual(x.tolist(), [[False], [True]])
+        self.assertEqual(z.tolist(), [[True], [False]])
+        self.assertEqual(r.tolist(), [False, False])
+        x, z, r = clifford_tableau(cirq.Circuit(cirq.CNOT(q0, q1)))
+        # X_0 -> X_0 X_1 and Z_1 -> Z_0 Z_1
+        self.assertEqual(x.astype(int).tolist(), [[1, 1], [0, 1], [0, 0], [0, 0]])
+        self.assertEqual(z.astype(int).tolist(), [[0, 0], [0, 0], [1, 0], [1, 1]])
+        with self.assertRaises(ValueError):
+            clifford_tableau(cirq.Circuit(cirq.H(q0)), qubits=[q1])
+
+    def test_agrees_with_unitaries(self):
+        rng = np.random.default_rng(0)
+        qubits = cirq.LineQubit.range(3)
+
+        def random_circuit():
+            circuit = cirq.Circuit()
+            for _ in range(int(rng.integers(0, 8))):
+                if rng.random() < 0.4:
+                    circuit.append(cirq.H(qubits[rng.integers(3)]))
+                else:
+                    inds = rng.permutation(3)[:int(rng.integers(2, 4))]
+                    circuit.append(create_cnot_with_multiple_targets([qubits[i] for i in inds[1:]], qubits[inds[0]]))
+            return circuit
+
+        for _ in range(200):
+            circuit1, circuit2 = random_circuit(), random_circuit()
+            expected = cirq.equal_up_to_global_phase(circuit1.unitary(qubit_order=qubits),
+                                                     circuit2.unitary(qubit_order=qubits))
+            self.assertEqual(circuits_are_equivalent(circuit1, circuit2), expected)
+
+    def test_detects_changes(self):
+        circuit = next(create_random_circuits(6, 20, seed=3))
+        q0, q1 = sorted(circuit.all_qubits())[:2]
+        self.assertTrue(circuits_are_equivalent(circuit, CompactCircuit.from_circuit(circuit)))
+        self.assertFalse(circuits_are_equivalent(circuit, circuit + cirq.Circuit(cirq.CNOT(q0, q1))))
+        self.assertFalse(circuits_are_equivalent(circuit, circuit + cirq.Circuit(cirq.H(q0))))
+        self.assertFalse(circuits_are_equivalent(circuit, circuit[:-1]))
+        self.assertTrue(circuits_are_equivalent(circuit + circuit[::-1], cirq.Circuit()))
+        with self.assertRaises(ValueError):
+            circuits_are_equivalent(cirq.Circuit(cirq.X(q0)), cirq.Circuit())
+        with self.assertRaises(ValueError):
+            toffoli = cirq.ControlledOperation([q0, q1], cirq.PauliString({sorted(circuit.all_qubits())[2]: cirq.X}))
+            circuits_are_equivalent(cirq.Circuit(toffoli), cirq.Circuit())
+
+    def test_optimized_circuits_are_equivalent(self):
+        circuit = next(create_random_circuits(100, 300, seed=0))
+        opt_circuit = optimize(circuit, [1] * 6, flat_probs_to_matrix([1] * 30), n_iter=20, n_opt_circuits=2, seed=0,
+                               backend='compact', verify=True)
+        self.assertLess(len(opt_circuit), len(circuit))
+        start_time = time.perf_counter()
+        self.assertTrue(circuits_are_equivalent(circuit, opt_circuit))
+        self.assertLess(time.perf_counter() - start_time, 30)
+
+    def test_verify_detects_a_wrong_transformer(self):
+        registry = TransformerRegistry()
+        for name in ('drop_last_moment', 'drop_last_moment_again'):
+            registry.register(name, {'cirq': lambda circuit: circuit[:-1]},
+                              {'cirq': lambda circuit, wire_index=None: len(circuit)})
+        circuit = next(create_random_circuits(4, 10, seed=1))
+        self.assertLess(len(optimize(circuit, [1, 1], [[0, 1], [1, 0]], n_iter=2, n_opt_circuits=1, seed=0, registry=registry,
+                                     precheck=False)), len(circuit))
+        with self.assertRaises(RuntimeError):
+            optimize(circuit, [1, 1], [[0, 1], [1, 0]], n_iter=2, n_opt_circuits=1, seed=0, registry=registry, precheck=False,
+                     verify=True)
+
+if __name__ == '__main__':
+    unittest.main()
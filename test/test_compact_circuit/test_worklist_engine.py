@@ -0,0 +1,72 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuits
+from src.compact_circuit import CompactCircuit
+from src.worklist_engine import WorklistEngine
+from src import compact_transformers, worklist_engine
+
+_NON_EXPANDING_INDS = [0, 1, 2, 3, 5]
+
+class TestWorklistEngine(unittest.TestCase):
+
+    def test_does_not_change_effect_of_circuit(self):
+        for circuit in create_random_circuits(5, 25, n_circuits=5, seed=1):
+            engine = WorklistEngine(CompactCircuit.from_circuit(circuit))
+            for identity_ind in [4, 5, 1, 3, 0, 2, 4, 1, 0, 3]:
+                engine.apply(identity_ind)
+            cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(
+                actual=engine.compact_circuit().to_circuit(), reference=circuit)
+
+    def test_does_not_modify_input(self):
+        compact_circuit = CompactCircuit.from_circuit(next(create_random_circuits(5, 25, seed=2)))
+        expected_circuit = compact_circuit.to_circuit()
+        engine = WorklistEngine(compact_circuit)
+        for identity_ind in range(6):
+            engine.apply(identity_ind)
+        self.assertEqual(compact_circuit.to_circuit(), expected_circuit)
+
+    def test_first_application_matches_compact_transformer(self):
+        circuit = CompactCircuit.from_circuit(next(create_random_circuits(5, 25, seed=3)))
+        function_names = ['remove_double_hadamards', 'combine_cnots', 'remove_double_cnots',
+                          'hadamards_and_cnot_to_cnot', 'cnot_to_hadamards_and_cnot',
+                          'combine_cnots_with_controls_surrounded_by_hadamards']
+        for name in function_names:
+            with self.subTest(name=name):
+                engine = getattr(worklist_engine, name)(WorklistEngine(circuit))
+                expected_circuit = getattr(compact_transformers, name)(circuit)
+                self.assertEqual(engine.compact_circuit().to_circuit(), expected_circuit.to_circuit())
+                self.assertEqual(len(engine), len(expected_circuit))
+
+    def test_no_candidates_at_fixed_point(self):
+        match_counters = [compact_transformers.count_double_hadamards, compact_transformers.count_combinable_cnots,
+                          compact_transformers.count_double_cnots,
+                          compact_transformers.count_cnots_surrounded_by_hadamards, None,
+                          compact_transformers.count_combinable_cnots_with_controls_surrounded_by_hadamards]
+        for circuit in create_random_circuits(5, 25, n_circuits=5, seed=4):
+            engine = WorklistEngine(CompactCircuit.from_circuit(circuit))
+            engine.apply(4)
+            while sum(engine.apply(identity_ind) for identity_ind in _NON_EXPANDING_INDS) > 0:
+                pass
+            fingerprint = engine.fingerprint()
+            for identity_ind in _NON_EXPANDING_INDS:
+                self.assertEqual(engine.n_candidates(identity_ind), 0)
+                self.assertEqual(match_counters[identity_ind](engine.compact_circuit()), 0)
+                self.assertEqual(engine.apply(identity_ind), 0)
+            self.assertEqual(engine.fingerprint(), fingerprint)
+
+    def test_candidates_only_around_changes(self):
+        engine = WorklistEngine(CompactCircuit.from_circuit(next(create_random_circuits(5, 25, seed=5))))
+        while sum(engine.apply(identity_ind) for identity_ind in _NON_EXPANDING_INDS) > 0:
+            pass
+        circuit = engine.compact_circuit().to_circuit()
+        qubit = sorted(circuit.all_qubits())[0]
+        circuit.append([cirq.H(qubit), cirq.H(qubit)])
+        engine = WorklistEngine(CompactCircuit.from_circuit(circuit))
+        engine.apply(3)
+        self.assertEqual(engine.apply(0), 1)
+        n_hadamards = len(list(circuit.findall_operations(lambda operation: operation.gate == cirq.H)))
+        self.assertLessEqual(engine.n_candidates(3), 2)
+        self.assertGreater(n_hadamards, 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import unittest
+import cirq
+from src.async_optimizer import optimize_async, optimize_progressively
+from src.functions import flat_probs_to_matrix
+from src.optimizer import optimize
+from src.random_circuit_generator import create_random_circuits
+
+class TestAsyncOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.initial_probs = [1 for i in range(6)]
+        self.transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+
+    def test_matches_optimize(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        for backend, n_workers in (('cirq', 1), ('compact', 1), ('compact', 2)):
+            with self.subTest(backend=backend, n_workers=n_workers):
+                kwargs = dict(n_iter=10, n_opt_circuits=4, seed=3, backend=backend, n_workers=n_workers,
+                              cache_size=100)
+                opt_circuit, stats = asyncio.run(optimize_async(circuit, self.initial_probs, self.transition_probs,
+                                                                return_stats=True, **kwargs))
+                self.assertEqual(opt_circuit, optimize(circuit, self.initial_probs, self.transition_probs, **kwargs))
+                self.assertEqual(len(stats.stop_reasons), 4)
+                cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                                       reference=circuit)
+
+    def test_stats_match_optimize(self):
+        circuit = next(create_random_circuits(6, 60, seed=1))
+        for n_workers in (1, 3):
+            with self.subTest(n_workers=n_workers):
+                kwargs = dict(n_iter=30, n_opt_circuits=8, seed=1, backend='compact', n_workers=n_workers,
+                              return_stats=True)
+                _, async_stats = asyncio.run(optimize_async(circuit, self.initial_probs, self.transition_probs,
+                                                            **kwargs))
+                _, stats = optimize(circuit, self.initial_probs, self.transition_probs, **kwargs)
+                self.assertEqual(async_stats.chain_lengths, stats.chain_lengths)
+                self.assertEqual(async_stats.stop_reasons, stats.stop_reasons)
+                self.assertEqual(async_stats.best_chain, stats.best_chain)
+                self.assertEqual(min(lengths[-1] for lengths in async_stats.chain_lengths),
+                                 async_stats.chain_lengths[async_stats.best_chain][-1])
+
+    def test_progressive_results_get_shorter(self):
+        circuit = next(create_random_circuits(5, 30, seed=2))
+
+        async def collect():
+            return [(chain, opt_circuit) async for chain, opt_circuit in optimize_progressively(
+                circuit, self.initial_probs, self.transition_probs, n_iter=10, n_opt_circuits=6, seed=5,
+                backend='compact')]
+
+        results = asyncio.run(collect())
+        lengths = [len(opt_circuit) for _, opt_circuit in results]
+        self.assertEqual(lengths, sorted(set(lengths), reverse=True))
+        self.assertEqual(lengths[-1], len(optimize(circuit, self.initial_probs, self.transition_probs, n_iter=10,
+                                                   n_opt_circuits=6, seed=5, backend='compact')))
+
+    def test_deadline_returns_best_so_far(self):
+        circuit = next(create_random_circuits(10, 200, seed=3))
+        start_time = time.perf_counter()
+        opt_circuit, stats = asyncio.run(optimize_async(circuit, self.initial_probs, self.transition_probs,
+                                                        n_iter=10**5, n_opt_circuits=3, backend='compact',
+                                                        detect_fixed_point=False, time_budget=0.3, grace=0.5,
+                                                        return_stats=True))
+        self.assertLess(time.perf_counter() - start_time, 2)
+        self.assertIn('time_budget', stats.stop_reasons)
+        self.assertLessEqual(len(opt_circuit), len(circuit))
+
+    def test_cancellation_does_not_block_event_loop(self):
+        circuit = next(create_random_circuits(10, 200, seed=4))
+
+        async def cancel_after_ticks():
+            task = asyncio.create_task(optimize_async(circuit, self.initial_probs, self.transition_probs,
+                                                      n_iter=10**5, n_opt_circuits=2, backend='compact',
+                                                      detect_fixed_point=False))
+            n_ticks = 0
+            while n_ticks < 5:
+                await asyncio.sleep(0.01)
+                n_ticks += 1
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return n_ticks
+
+        start_time = time.perf_counter()
+        self.assertEqual(asyncio.run(cancel_after_ticks()), 5)
+        self.assertLess(time.perf_counter() - start_time, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import cirq
+from src.batch import optimize_many
+from src.functions import flat_probs_to_matrix
+from src.random_circuit_generator import create_random_circuits
+from src.stats import OptimizerStats
+
+class TestOptimizeMany(unittest.TestCase):
+
+    def setUp(self):
+        self.initial_probs = [1 for i in range(6)]
+        self.transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+        self.kwargs = dict(n_iter=5, n_opt_circuits=2, backend='compact', seed=4)
+
+    def test_results_in_order_with_stats(self):
+        circuits = list(create_random_circuits(3, 10, n_circuits=4, seed=1))
+        results = list(optimize_many(circuits, self.initial_probs, self.transition_probs, **self.kwargs))
+        self.assertEqual([circuit_ind for circuit_ind, _, _ in results], [0, 1, 2, 3])
+        for (circuit_ind, opt_circuit, stats), circuit in zip(results, circuits):
+            cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                                   reference=circuit)
+            self.assertIsInstance(stats, OptimizerStats)
+            self.assertEqual(stats.chain_lengths[0][0], len(circuit))
+
+    def test_parallel_matches_serial(self):
+        circuits = list(create_random_circuits(3, 10, n_circuits=5, seed=2))
+        serial = [(circuit_ind, opt_circuit) for circuit_ind, opt_circuit, _ in
+                  optimize_many(circuits, self.initial_probs, self.transition_probs, return_stats=False,
+                                **self.kwargs)]
+        for ordered in (True, False):
+            with self.subTest(ordered=ordered):
+                parallel = [(circuit_ind, opt_circuit) for circuit_ind, opt_circuit, stats in
+                            optimize_many(circuits, self.initial_probs, self.transition_probs, n_workers=2,
+                                          window=3, ordered=ordered, return_stats=False, **self.kwargs)]
+                self.assertEqual(sorted(parallel, key=lambda result: result[0]), serial)
+                if ordered:
+                    self.assertEqual(parallel, serial)
+
+    def test_reads_circuits_lazily(self):
+        n_read = []
+        def stream():
+            for circuit in create_random_circuits(3, 10, n_circuits=20, seed=3):
+                n_read.append(1)
+                yield circuit
+
+        for n_workers, window in ((1, None), (2, 3)):
+            with self.subTest(n_workers=n_workers):
+                n_read.clear()
+                results = optimize_many(stream(), self.initial_probs, self.transition_probs, n_workers=n_workers,
+                                        window=window, **self.kwargs)
+                next(results)
+                self.assertLessEqual(len(n_read), window or 1)
+                next(results)
+                self.assertLessEqual(len(n_read), (window or 1) + 1)
+                results.close()
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            next(optimize_many([], self.initial_probs, self.transition_probs, n_workers=2, window=0))
+        circuits = list(create_random_circuits(3, 10, n_circuits=2, seed=5))
+        for n_workers in (1, 2):
+            with self.assertRaises(ValueError):
+                list(optimize_many(circuits, self.initial_probs, self.transition_probs, n_workers=n_workers,
+                                   backend='numpy'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuits
+from src.beam_search import beam_search
+
+class TestBeamSearch(unittest.TestCase):
+
+    def test_does_not_change_effect_of_circuit(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        for backend in ('cirq', 'compact'):
+            with self.subTest(backend=backend):
+                opt_circuit = beam_search(circuit, beam_width=2, depth=10, backend=backend)
+                cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                                       reference=circuit)
+                self.assertLessEqual(len(opt_circuit), len(circuit))
+
+    def test_deterministic(self):
+        circuit = next(create_random_circuits(5, 30, seed=2))
+        self.assertEqual(beam_search(circuit, beam_width=3, depth=8, backend='compact'),
+                         beam_search(circuit, beam_width=3, depth=8, backend='compact'))
+
+    def test_wider_beam_is_not_worse_on_first_step(self):
+        circuit = next(create_random_circuits(5, 30, seed=3))
+        lengths = [len(beam_search(circuit, beam_width=beam_width, depth=1)) for beam_width in (1, 6)]
+        self.assertEqual(lengths[0], lengths[1])
+
+    def test_zero_depth_returns_copy(self):
+        circuit = next(create_random_circuits(5, 30, seed=4))
+        opt_circuit = beam_search(circuit, depth=0)
+        self.assertEqual(opt_circuit, circuit)
+        self.assertIsNot(opt_circuit, circuit)
+
+    def test_stats(self):
+        circuit = next(create_random_circuits(5, 30, seed=5))
+        opt_circuit, stats = beam_search(circuit, beam_width=2, depth=10, backend='compact', return_stats=True)
+        self.assertEqual(len(stats.chain_lengths), 1)
+        self.assertEqual(sum(transformer_stats.n_calls + transformer_stats.n_skipped
+                             for transformer_stats in stats.transformers.values()),
+                         len(stats.chain_lengths[0]) - 1)
+        self.assertEqual(min(stats.chain_lengths[0]), len(opt_circuit))
+        self.assertIn(stats.stop_reasons[0], ('depth', 'fixed_point'))
+
+    def test_fixed_point(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit([cirq.H(qubits[0]), cirq.H(qubits[0]), cirq.H(qubits[1])])
+        opt_circuit, stats = beam_search(circuit, depth=10, return_stats=True)
+        self.assertEqual(opt_circuit, cirq.Circuit(cirq.H(qubits[1])))
+        self.assertEqual(stats.stop_reasons, ['fixed_point'])
+
+    def test_invalid_arguments(self):
+        circuit = next(create_random_circuits(3, 5, seed=6))
+        with self.assertRaises(ValueError):
+            beam_search(circuit, backend='worklist')
+        with self.assertRaises(ValueError):
+            beam_search(circuit, beam_width=0)
+
+if __name__ == '__main__':
+    unittest.main()
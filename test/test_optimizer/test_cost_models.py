@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+import cirq
+from src import compact_transformers
+from src.async_optimizer import optimize_async
+from src.beam_search import beam_search
+from src.compact_circuit import CompactCircuit
+from src.batch import optimize_many
+from src.cost_models import CircuitCost, CostModel, circuit_metrics, get_cost_model, CNOT_COUNT, DEPTH
+from src.functions import create_cnot_with_multiple_targets, flat_probs_to_matrix
+from src.optimizer import optimize
+from src.partition import optimize_partitioned
+from src.random_circuit_generator import create_random_circuits
+from src.worklist_engine import WorklistEngine
+
+def operation_count(circuit):
+    return len(list(circuit.all_operations()))
+
+class TestCostModels(unittest.TestCase):
+
+    def setUp(self):
+        self.initial_probs = [1 for i in range(6)]
+        self.transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+
+    def test_circuit_metrics(self):
+        qubits = cirq.LineQubit.range(4)
+        circuit = cirq.Circuit([cirq.Moment(cirq.H(qubits[0]), cirq.CNOT(qubits[1], qubits[2])),
+                                cirq.Moment(create_cnot_with_multiple_targets(qubits[1:], qubits[0])), cirq.Moment(),
+                                cirq.Moment(cirq.CZ(qubits[0], qubits[1]))])
+        expected = {'depth': 4, 'gates': 4, 'cnots': 2, 'two_qubit_gates': 5}
+        self.assertEqual(circuit_metrics(circuit), expected)
+        self.assertEqual(circuit_metrics(CompactCircuit.from_circuit(circuit)), expected)
+
+    def test_metrics_are_kept_up_to_date(self):
+        circuit = next(create_random_circuits(5, 40, seed=4))
+        compact_circuit = CompactCircuit.from_circuit(circuit)
+        self.assertEqual(circuit_metrics(compact_circuit), circuit_metrics(circuit))
+        engine = WorklistEngine(compact_circuit)
+        for transformer in (compact_transformers.cnot_to_hadamards_and_cnot,
+                            compact_transformers.combine_cnots_with_controls_surrounded_by_hadamards,
+                            compact_transformers.remove_double_hadamards, compact_transformers.combine_cnots,
+                            compact_transformers.remove_double_cnots, compact_transformers.hadamards_and_cnot_to_cnot):
+            compact_circuit = transformer(compact_circuit)
+            self.assertEqual(circuit_metrics(compact_circuit), circuit_metrics(compact_circuit.to_circuit()))
+        for identity_ind in range(6):
+            engine.apply(identity_ind)
+            metrics = circuit_metrics(engine.compact_circuit().to_circuit())
+            self.assertEqual(circuit_metrics(engine), metrics)
+
+    def test_cost_model(self):
+        circuit = next(create_random_circuits(4, 10, seed=0))
+        metrics = circuit_metrics(circuit)
+        self.assertEqual(DEPTH(circuit), len(circuit))
+        self.assertEqual(CostModel(depth=2, cnots=0.5)(circuit), 2 * metrics['depth'] + 0.5 * metrics['cnots'])
+        self.assertEqual(repr(CostModel(depth=2, cnots=0.5)), "CostModel(depth=2, cnots=0.5)")
+        self.assertIs(get_cost_model(None), DEPTH)
+        self.assertIs(get_cost_model('cnot_count'), CNOT_COUNT)
+        self.assertIs(get_cost_model(CNOT_COUNT), CNOT_COUNT)
+        self.assertIsInstance(get_cost_model(len), CircuitCost)
+        self.assertEqual(get_cost_model(len)(CompactCircuit.from_circuit(circuit)), len(circuit))
+        with self.assertRaises(ValueError):
+            CostModel(gates=-1)
+        with self.assertRaises(ValueError):
+            get_cost_model('fidelity')
+        with self.assertRaises(ValueError):
+            get_cost_model(3)
+
+    def test_optimizers_select_by_cost(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        kwargs = dict(n_iter=15, n_opt_circuits=8, seed=2, backend='compact')
+        by_depth = optimize(circuit, self.initial_probs, self.transition_probs, **kwargs)
+        self.assertEqual(optimize(circuit, self.initial_probs, self.transition_probs, cost='depth', **kwargs),
+                         by_depth)
+        for cost in ('gate_count', 'cnot_count', 'two_qubit_gate_count', CostModel(depth=1, cnots=1)):
+            with self.subTest(cost=cost):
+                cost_model = get_cost_model(cost)
+                # the chains do not depend on the cost without patience and annealing
+                opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, cost=cost, **kwargs)
+                self.assertLessEqual(cost_model(opt_circuit), cost_model(by_depth))
+                self.assertEqual(optimize(circuit, self.initial_probs, self.transition_probs, cost=cost, n_workers=2,
+                                          **kwargs), opt_circuit)
+                self.assertEqual(asyncio.run(optimize_async(circuit, self.initial_probs, self.transition_probs,
+                                                            cost=cost, **kwargs)), opt_circuit)
+        longest = optimize(circuit, self.initial_probs, self.transition_probs, cost=lambda c: -len(c), **kwargs)
+        self.assertGreaterEqual(len(longest), len(by_depth))
+        annealed = optimize(circuit, self.initial_probs, self.transition_probs, cost='cnot_count', temperature=0.1,
+                            **kwargs)
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=annealed, reference=circuit)
+        beam_circuit = beam_search(circuit, depth=5, backend='compact', cost='gate_count')
+        self.assertLessEqual(circuit_metrics(beam_circuit)['gates'], circuit_metrics(circuit)['gates'])
+        with self.assertRaises(ValueError):
+            optimize(circuit, self.initial_probs, self.transition_probs, cost='fidelity')
+
+    def test_custom_cost_function_gets_a_cirq_circuit(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        for backend in ('cirq', 'compact', 'worklist'):
+            for n_workers in (1, 2):
+                with self.subTest(backend=backend, n_workers=n_workers):
+                    kwargs = dict(n_iter=10, n_opt_circuits=4, seed=2, backend=backend, n_workers=n_workers)
+                    opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, cost=operation_count,
+                                           **kwargs)
+                    self.assertEqual(opt_circuit, optimize(circuit, self.initial_probs, self.transition_probs,
+                                                           cost='gate_count', **kwargs))
+        opt_circuit = optimize_partitioned(circuit, self.initial_probs, self.transition_probs, slice_depth=10,
+                                           n_workers=2, n_iter=5, n_opt_circuits=2, backend='compact',
+                                           cost=operation_count)
+        self.assertLessEqual(operation_count(opt_circuit), operation_count(circuit))
+
+    def test_cost_function_must_be_picklable_with_workers(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        cost = lambda c: len(list(c.all_operations()))
+        with self.assertRaises(ValueError):
+            optimize(circuit, self.initial_probs, self.transition_probs, n_workers=2, cost=cost)
+        with self.assertRaises(ValueError):
+            asyncio.run(optimize_async(circuit, self.initial_probs, self.transition_probs, n_workers=2, cost=cost))
+        with self.assertRaises(ValueError):
+            list(optimize_many([circuit], self.initial_probs, self.transition_probs, n_workers=2, cost=cost))
+        with self.assertRaises(ValueError):
+            optimize_partitioned(circuit, self.initial_probs, self.transition_probs, n_workers=2, cost=cost)
+
+if __name__ == '__main__':
+    unittest.main()
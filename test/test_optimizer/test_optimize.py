@@ -0,0 +1,216 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuit, create_random_circuits
+from src.functions import flat_probs_to_matrix
+from src.optimizer import optimize
+
+class TestOptimize(unittest.TestCase):
+
+    def setUp(self):
+        self.initial_probs = [1 for i in range(6)]
+        self.transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+
+    def test_does_not_change_effect_of_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                               n_iter=10, n_opt_circuits=3)
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                               reference=circuit)
+
+    def test_same_seed_gives_same_result(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit1 = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                n_iter=10, n_opt_circuits=4, seed=3)
+        opt_circuit2 = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                n_iter=10, n_opt_circuits=4, seed=3)
+        self.assertEqual(opt_circuit1, opt_circuit2)
+
+    def test_parallel_matches_serial(self):
+        circuit = create_random_circuit(5, 30)
+        serial_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                  n_iter=10, n_opt_circuits=4, seed=7)
+        parallel_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                    n_iter=10, n_opt_circuits=4, n_workers=2, seed=7)
+        self.assertEqual(parallel_circuit, serial_circuit)
+
+    def test_compact_backend_does_not_change_effect_of_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                               n_iter=10, n_opt_circuits=3, backend='compact')
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                               reference=circuit)
+
+    def test_compact_backend_parallel_matches_serial(self):
+        circuit = create_random_circuit(5, 30)
+        serial_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                  n_iter=10, n_opt_circuits=4, seed=7, backend='compact')
+        parallel_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                    n_iter=10, n_opt_circuits=4, n_workers=2, seed=7, backend='compact')
+        self.assertEqual(parallel_circuit, serial_circuit)
+
+    def test_worklist_backend_does_not_change_effect_of_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                               n_iter=10, n_opt_circuits=3, backend='worklist')
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                               reference=circuit)
+
+    def test_worklist_backend_parallel_matches_serial(self):
+        circuit = create_random_circuit(5, 30)
+        serial_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                  n_iter=10, n_opt_circuits=4, seed=7, backend='worklist')
+        parallel_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                    n_iter=10, n_opt_circuits=4, n_workers=2, seed=7, backend='worklist')
+        self.assertEqual(parallel_circuit, serial_circuit)
+
+    def test_worklist_backend_does_not_support_transposition_cache(self):
+        circuit = create_random_circuit(5, 30)
+        with self.assertRaises(ValueError):
+            optimize(circuit, self.initial_probs, self.transition_probs, backend='worklist', cache_size=100)
+
+
+    def test_stats_do_not_change_result(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, 
+                               n_iter=10, n_opt_circuits=3, seed=5)
+        opt_circuit_with_stats, stats = optimize(circuit, self.initial_probs, self.transition_probs, 
+                                                 n_iter=10, n_opt_circuits=3, seed=5, return_stats=True)
+        self.assertEqual(opt_circuit, opt_circuit_with_stats)
+        self.assertEqual(len(stats.chain_lengths), 3)
+        self.assertEqual(sum(transformer_stats.n_calls + transformer_stats.n_skipped
+                             for transformer_stats in stats.transformers.values()),
+                         sum(len(chain_lengths) - 1 for chain_lengths in stats.chain_lengths))
+        for chain_lengths, stop_reason in zip(stats.chain_lengths, stats.stop_reasons):
+            self.assertEqual(chain_lengths[0], len(circuit))
+            self.assertEqual(len(chain_lengths) == 12, stop_reason == 'n_iter')
+        self.assertEqual(stats.chain_lengths[stats.best_chain][-1], len(opt_circuit))
+        self.assertEqual(sum(transformer_stats.moments_removed for transformer_stats in stats.transformers.values()),
+                         sum(chain_lengths[0] - chain_lengths[-1] for chain_lengths in stats.chain_lengths))
+
+    def test_parallel_stats_match_serial(self):
+        circuit = create_random_circuit(5, 30)
+        for backend in ('cirq', 'compact'):
+            with self.subTest(backend=backend):
+                serial_stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=10,
+                                        n_opt_circuits=4, seed=9, backend=backend, return_stats=True)[1]
+                parallel_stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=10,
+                                          n_opt_circuits=4, seed=9, n_workers=2, backend=backend,
+                                          return_stats=True)[1]
+                self.assertEqual(serial_stats.chain_lengths, parallel_stats.chain_lengths)
+                self.assertEqual(serial_stats.best_chain, parallel_stats.best_chain)
+                self.assertEqual({name: (transformer_stats.n_calls, transformer_stats.operations_after)
+                                  for name, transformer_stats in serial_stats.transformers.items()},
+                                 {name: (transformer_stats.n_calls, transformer_stats.operations_after)
+                                  for name, transformer_stats in parallel_stats.transformers.items()})
+
+    def test_fixed_point_detection_does_not_change_result_without_expanding_transformer(self):
+        initial_probs = [1, 1, 1, 1, 0, 1]
+        transition_probs = [[0 if j == i or j == 4 else 1 for j in range(6)] for i in range(6)]
+        circuit = create_random_circuit(5, 30)
+        for backend in ('cirq', 'compact', 'worklist'):
+            with self.subTest(backend=backend):
+                opt_circuit = optimize(circuit, initial_probs, transition_probs, n_iter=100, n_opt_circuits=3,
+                                       seed=2, backend=backend, detect_fixed_point=False)
+                detected_opt_circuit, stats = optimize(circuit, initial_probs, transition_probs, n_iter=100,
+                                                       n_opt_circuits=3, seed=2, backend=backend,
+                                                       return_stats=True)
+                self.assertEqual(opt_circuit, detected_opt_circuit)
+                self.assertEqual(stats.stop_reasons, ['fixed_point'] * 3)
+
+    def test_patience(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit, stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=100,
+                                      n_opt_circuits=3, seed=4, detect_fixed_point=False, patience=3,
+                                      return_stats=True)
+        self.assertEqual(stats.stop_reasons, ['patience'] * 3)
+        for chain_lengths in stats.chain_lengths:
+            self.assertGreaterEqual(min(chain_lengths[-3:]), min(chain_lengths[:-3]))
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                               reference=circuit)
+
+    def test_time_budget(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit, stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=100,
+                                      n_opt_circuits=3, time_budget=0, return_stats=True)
+        self.assertEqual(opt_circuit, circuit)
+        self.assertIsNot(opt_circuit, circuit)
+        self.assertEqual(stats.stop_reasons, ['time_budget'] * 3)
+
+    def test_precheck_does_not_change_result(self):
+        circuit = create_random_circuit(5, 30)
+        for backend in ('cirq', 'compact', 'worklist'):
+            with self.subTest(backend=backend):
+                opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                       n_opt_circuits=3, seed=6, backend=backend, precheck=False)
+                prechecked_opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                                  n_opt_circuits=3, seed=6, backend=backend)
+                self.assertEqual(opt_circuit, prechecked_opt_circuit)
+
+    def test_reweight_only_applies_transformers_that_change_the_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit, stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                      n_opt_circuits=3, seed=6, reweight=True, return_stats=True)
+        self.assertEqual(sum(transformer_stats.n_skipped for transformer_stats in stats.transformers.values()), 0)
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                               reference=circuit)
+
+    def test_transposition_cache_does_not_change_result(self):
+        circuit = next(create_random_circuits(5, 30, seed=0))
+        for backend in ('cirq', 'compact'):
+            with self.subTest(backend=backend):
+                opt_circuit, stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                              n_opt_circuits=5, seed=7, backend=backend, return_stats=True)
+                cached_opt_circuit, cached_stats = optimize(circuit, self.initial_probs, self.transition_probs,
+                                                            n_iter=30, n_opt_circuits=5, seed=7, backend=backend,
+                                                            return_stats=True, cache_size=100)
+                self.assertEqual(opt_circuit, cached_opt_circuit)
+                self.assertEqual(stats.chain_lengths, cached_stats.chain_lengths)
+                self.assertIsNone(stats.cache_hit_rate)
+                self.assertGreater(cached_stats.cache_hits, 0)
+                self.assertEqual(sum(transformer_stats.n_cached for transformer_stats in cached_stats.transformers.values()),
+                                 cached_stats.cache_hits)
+
+    def test_parallel_transposition_cache_matches_serial(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                               n_opt_circuits=4, seed=8, cache_size=100)
+        parallel_opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                        n_opt_circuits=4, seed=8, n_workers=2, cache_size=100)
+        self.assertEqual(opt_circuit, parallel_opt_circuit)
+
+    def test_annealing_does_not_change_effect_of_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        for backend in ('cirq', 'compact'):
+            with self.subTest(backend=backend):
+                opt_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                       n_opt_circuits=3, backend=backend, temperature=1)
+                cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit, 
+                                                                                       reference=circuit)
+                self.assertLessEqual(len(opt_circuit), len(circuit))
+
+    def test_zero_temperature_never_lengthens(self):
+        circuit = next(create_random_circuits(5, 30, seed=1))
+        opt_circuit, stats = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=30,
+                                      n_opt_circuits=5, seed=3, backend='compact', temperature=0,
+                                      return_stats=True)
+        for chain_lengths in stats.chain_lengths:
+            self.assertEqual(chain_lengths, sorted(chain_lengths, reverse=True))
+        self.assertGreater(stats.transformers['cnot_to_hadamards_and_cnot'].n_rejected, 0)
+        self.assertEqual(len(opt_circuit), min(chain_lengths[-1] for chain_lengths in stats.chain_lengths))
+
+    def test_parallel_annealing_matches_serial(self):
+        circuit = create_random_circuit(5, 30)
+        serial_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=20,
+                                  n_opt_circuits=4, seed=5, temperature=1, cooling=0.9)
+        parallel_circuit = optimize(circuit, self.initial_probs, self.transition_probs, n_iter=20,
+                                    n_opt_circuits=4, seed=5, n_workers=2, temperature=1, cooling=0.9)
+        self.assertEqual(parallel_circuit, serial_circuit)
+
+    def test_worklist_backend_does_not_support_annealing(self):
+        circuit = create_random_circuit(5, 30)
+        with self.assertRaises(ValueError):
+            optimize(circuit, self.initial_probs, self.transition_probs, backend='worklist', temperature=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuit, create_random_circuits
+from src.equivalence import circuits_are_equivalent
+from src.functions import flat_probs_to_matrix
+from src.partition import optimize_partitioned, partition_circuit, stitch_circuit
+
+class TestPartition(unittest.TestCase):
+
+    def setUp(self):
+        self.initial_probs = [1 for i in range(6)]
+        self.transition_probs = flat_probs_to_matrix([1 for i in range(30)])
+        self.circuit = next(create_random_circuits(12, 60, seed=4))
+
+    def test_pieces_of_a_slice_act_on_distinct_qubits(self):
+        slices = partition_circuit(self.circuit, slice_depth=5, max_block_qubits=3)
+        self.assertEqual(len(slices), -(-len(self.circuit) // 5))
+        self.assertTrue(any(len(pieces) > 1 for pieces in slices))
+        for pieces in slices:
+            qubit_sets = [set(piece.all_qubits()) for piece in pieces]
+            self.assertEqual(sum(len(qubits) for qubits in qubit_sets), len(set().union(*qubit_sets)))
+            for piece in pieces:
+                self.assertLessEqual(len(piece), 5)
+
+    def test_unconnected_groups_are_joined_up_to_max_block_qubits(self):
+        qubits = cirq.LineQubit.range(6)
+        circuit = cirq.Circuit([cirq.CNOT(qubits[0], qubits[1]), cirq.H(qubits[2]), cirq.CNOT(qubits[3], qubits[4]),
+                                cirq.H(qubits[5])])
+        pieces = partition_circuit(circuit, slice_depth=10, max_block_qubits=3)[0]
+        self.assertEqual([sorted(piece.all_qubits()) for piece in pieces],
+                         [qubits[:3], qubits[3:]])
+        pieces = partition_circuit(circuit, slice_depth=10, max_block_qubits=2)[0]
+        self.assertEqual([sorted(piece.all_qubits()) for piece in pieces],
+                         [qubits[:2], qubits[2:3], qubits[3:5], qubits[5:]])
+        self.assertEqual(len(partition_circuit(circuit, slice_depth=10)[0]), 1)
+
+    def test_stitching_the_pieces_gives_an_equivalent_circuit(self):
+        slices = partition_circuit(self.circuit, slice_depth=4, max_block_qubits=4)
+        stitched_circuit = stitch_circuit(slices)
+        self.assertEqual(len(list(stitched_circuit.all_operations())), len(list(self.circuit.all_operations())))
+        self.assertLessEqual(len(stitched_circuit), len(self.circuit))
+        self.assertTrue(circuits_are_equivalent(stitched_circuit, self.circuit))
+
+    def test_does_not_change_effect_of_circuit(self):
+        circuit = create_random_circuit(5, 30)
+        opt_circuit = optimize_partitioned(circuit, self.initial_probs, self.transition_probs, slice_depth=6,
+                                           max_block_qubits=3, boundary_depth=2, n_iter=10, n_opt_circuits=2)
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                               reference=circuit)
+
+    def test_does_not_make_circuit_longer(self):
+        opt_circuit, stats = optimize_partitioned(self.circuit, self.initial_probs, self.transition_probs,
+                                                  slice_depth=8, n_iter=10, n_opt_circuits=2, seed=1,
+                                                  return_stats=True, verify=True)
+        self.assertLessEqual(len(opt_circuit), len(self.circuit))
+        self.assertIsNot(opt_circuit, self.circuit)
+        self.assertGreater(len(stats.chain_lengths), 0)
+
+    def test_same_seed_gives_same_result_regardless_of_n_workers(self):
+        kwargs = dict(slice_depth=8, max_block_qubits=6, n_iter=10, n_opt_circuits=2, seed=3)
+        serial_circuit = optimize_partitioned(self.circuit, self.initial_probs, self.transition_probs, **kwargs)
+        parallel_circuit = optimize_partitioned(self.circuit, self.initial_probs, self.transition_probs,
+                                                n_workers=2, **kwargs)
+        self.assertEqual(serial_circuit, parallel_circuit)
+
+    def test_rejects_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            partition_circuit(self.circuit, slice_depth=0)
+        with self.assertRaises(ValueError):
+            partition_circuit(self.circuit, max_block_qubits=0)
+        with self.assertRaises(ValueError):
+            optimize_partitioned(self.circuit, self.initial_probs, self.transition_probs, boundary_depth=-1)
+        with self.assertRaises(ValueError):
+            optimize_partitioned(self.circuit, self.initial_probs, self.transition_probs, max_rounds=0)
+
+if __name__ == '__main__':
+    unittest.main()
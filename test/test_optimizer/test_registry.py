@@ -0,0 +1,96 @@
+import unittest
+import cirq
+import numpy as np
+from src import compact_transformers
+from src import transformers
+from src.beam_search import beam_search
+from src.functions import flat_probs_to_matrix
+from src.optimizer import optimize, _cumulative_tables, _draw_schedules
+from src.random_circuit_generator import create_random_circuits
+from src.registry import TransformerRegistry, DEFAULT_REGISTRY
+
+def _removing_registry():
+    registry = TransformerRegistry()
+    registry.register('remove_double_hadamards',
+                      {'cirq': transformers.remove_double_hadamards,
+                       'compact': compact_transformers.remove_double_hadamards},
+                      {'cirq': transformers.count_double_hadamards,
+                       'compact': compact_transformers.count_double_hadamards})
+    registry.register('remove_double_cnots',
+                      {'cirq': transformers.remove_double_cnots,
+                       'compact': compact_transformers.remove_double_cnots},
+                      {'cirq': transformers.count_double_cnots,
+                       'compact': compact_transformers.count_double_cnots})
+    return registry
+
+class TestRegistry(unittest.TestCase):
+
+    def test_flat_probs_to_matrix(self):
+        self.assertEqual(flat_probs_to_matrix([1, 2]), [[0, 1], [2, 0]])
+        matrix = flat_probs_to_matrix(list(range(30)))
+        self.assertEqual(matrix[0], [0, 0, 1, 2, 3, 4])
+        self.assertEqual(matrix[3], [15, 16, 17, 0, 18, 19])
+        self.assertEqual(sorted(value for row in matrix for value in row), [0] * 7 + list(range(1, 30)))
+        with self.assertRaises(ValueError):
+            flat_probs_to_matrix([1, 2, 3])
+
+    def test_default_registry(self):
+        self.assertEqual(len(DEFAULT_REGISTRY), 6)
+        self.assertEqual(DEFAULT_REGISTRY.backends, ['cirq', 'compact', 'worklist'])
+        self.assertEqual(DEFAULT_REGISTRY.non_expanding_inds(), {0, 1, 2, 3, 5})
+        self.assertEqual([function.__name__ for function in DEFAULT_REGISTRY.function_list('compact')],
+                         DEFAULT_REGISTRY.names)
+
+    def test_register_errors(self):
+        registry = _removing_registry()
+        self.assertEqual(registry.backends, ['cirq', 'compact'])
+        with self.assertRaises(ValueError):
+            registry.register('remove_double_cnots', {}, {})
+        with self.assertRaises(ValueError):
+            registry.register('combine_cnots', {'cirq': transformers.combine_cnots}, {})
+        with self.assertRaises(ValueError):
+            registry.function_list('worklist')
+
+    def test_optimize_with_custom_registry(self):
+        registry = _removing_registry()
+        circuit = next(create_random_circuits(4, 20, seed=5))
+        for backend in ('cirq', 'compact'):
+            with self.subTest(backend=backend):
+                opt_circuit, stats = optimize(circuit, [1, 1], flat_probs_to_matrix([1, 1]), n_iter=10,
+                                              n_opt_circuits=3, seed=2, backend=backend, registry=registry,
+                                              return_stats=True)
+                cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                                       reference=circuit)
+                self.assertLessEqual(set(stats.transformers), set(registry.names))
+                self.assertEqual(optimize(circuit, [1, 1], [[0, 1], [1, 0]], n_iter=10, n_opt_circuits=3, seed=2,
+                                          backend=backend, registry=registry, n_workers=2), opt_circuit)
+        beam_circuit = beam_search(circuit, depth=5, backend='compact', registry=registry)
+        cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=beam_circuit, reference=circuit)
+        self.assertLessEqual(len(beam_circuit), len(circuit))
+        with self.assertRaises(ValueError):
+            optimize(circuit, [1, 1], [[0, 1], [1, 0]], backend='worklist', registry=registry)
+        with self.assertRaises(ValueError):
+            optimize(circuit, [1] * 6, flat_probs_to_matrix([1] * 30), registry=registry)
+
+    def test_schedules_follow_probabilities(self):
+        initial_table, transition_table = _cumulative_tables([0, 1, 3], [[0, 1, 0], [1, 0, 1], [2, 2, 0]], 3)
+        self.assertEqual(initial_table.tolist(), [0, 0.25, 1])
+        self.assertEqual(transition_table.tolist(), [[0, 1, 1], [0.5, 0.5, 1], [0.5, 1, 1]])
+        schedules = _draw_schedules(initial_table, transition_table, np.random.default_rng(0).random((4000, 3)))
+        self.assertNotIn(0, schedules[:, 0].tolist())
+        self.assertAlmostEqual((schedules[:, 0] == 2).mean(), 0.75, delta=0.03)
+        for i in (1, 2):
+            self.assertTrue((schedules[schedules[:, i - 1] == 0, i] == 1).all())
+            self.assertTrue((schedules[:, i] != schedules[:, i - 1]).all())
+
+    def test_invalid_probabilities(self):
+        with self.assertRaises(ValueError):
+            _cumulative_tables([0, 0], [[0, 1], [1, 0]], 2)
+        with self.assertRaises(ValueError):
+            _cumulative_tables([1, -1], [[0, 1], [1, 0]], 2)
+        initial_table, transition_table = _cumulative_tables([1, 0], [[0, 0], [1, 0]], 2)
+        with self.assertRaises(ValueError):
+            _draw_schedules(initial_table, transition_table, np.zeros((1, 2)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import cirq
+from src.functions import circuit_structure
+from src.transposition_cache import TranspositionCache
+
+class _CollidingStructure(tuple):
+    """Structure whose hash collides with the hash of every other one"""
+
+    def __hash__(self):
+        return 0
+
+class TestTranspositionCache(unittest.TestCase):
+
+    def test_get_and_put(self):
+        cache = TranspositionCache(2)
+        self.assertIsNone(cache.get(1, 0))
+        cache.put(1, 0, 'ab', 2)
+        self.assertEqual(cache.get(1, 0), ('ab', 2, 2))
+        self.assertIsNone(cache.get(1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TranspositionCache(2)
+        cache.put(1, 0, 'a', 10)
+        cache.put(2, 0, 'b', 20)
+        cache.get(1, 0)
+        cache.put(3, 0, 'c', 30)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(2, 0))
+        self.assertIsNotNone(cache.get(1, 0))
+        self.assertIsNotNone(cache.get(3, 0))
+
+    def test_hash_collision_is_not_a_hit(self):
+        cache = TranspositionCache(2)
+        cache.put(_CollidingStructure((1,)), 0, 'a', 10)
+        self.assertIsNone(cache.get(_CollidingStructure((2,)), 0))
+        self.assertEqual(cache.get(_CollidingStructure((1,)), 0), ('a', 10, 1))
+
+    def test_circuits_are_stored_by_structure(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit(cirq.H(qubits[0]), cirq.CNOT(qubits[0], qubits[1]))
+        cache = TranspositionCache(2)
+        cache.put(circuit_structure(circuit), 0, circuit[:1], circuit_structure(circuit[:1]))
+        self.assertIsNotNone(cache.get(circuit_structure(circuit.copy()), 0))
+        self.assertIsNone(cache.get(circuit_structure(circuit[::-1]), 0))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            TranspositionCache(0)
+
+if __name__ == '__main__':
+    unittest.main()
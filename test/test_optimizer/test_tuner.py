@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from src.functions import flat_probs_to_matrix
+from src.registry import DEFAULT_REGISTRY
+from src.tuner import tune_probabilities, save_probabilities, load_probabilities, weights_to_probs
+
+_ARGUMENTS = dict(n_qubits=3, n_templates=10, n_circuits=2, seed=3, n_generations=2, population_size=4, n_elite=2,
+                  n_iter=10, n_opt_circuits=2)
+
+class TestTuner(unittest.TestCase):
+
+    def test_weights_to_probs(self):
+        initial_probs, transition_probs = weights_to_probs(list(range(36)))
+        self.assertEqual(initial_probs, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(transition_probs, flat_probs_to_matrix(list(range(6, 36))))
+
+    def test_not_worse_than_uniform_probabilities(self):
+        initial_probs, transition_probs, score, history = tune_probabilities(return_history=True, **_ARGUMENTS)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[-1]['best_score'], score)
+        self.assertLessEqual(history[1]['best_score'], history[0]['best_score'])
+        _, _, uniform_score = tune_probabilities(**dict(_ARGUMENTS, n_generations=1, population_size=1, n_elite=1))
+        self.assertLessEqual(score, uniform_score)
+        for i in range(6):
+            self.assertEqual(transition_probs[i][i], 0)
+
+    def test_deterministic_and_parallel(self):
+        result = tune_probabilities(**_ARGUMENTS)
+        self.assertEqual(tune_probabilities(**_ARGUMENTS), result)
+        self.assertEqual(tune_probabilities(n_workers=2, **_ARGUMENTS), result)
+
+    def test_score_cache(self):
+        score_cache = {}
+        result = tune_probabilities(score_cache=score_cache, **_ARGUMENTS)
+        n_entries = len(score_cache)
+        self.assertGreater(n_entries, 0)
+        initial_probs, transition_probs, score, history = tune_probabilities(score_cache=score_cache,
+                                                                             return_history=True, **_ARGUMENTS)
+        self.assertEqual((initial_probs, transition_probs, score), result)
+        self.assertEqual(len(score_cache), n_entries)
+        self.assertEqual(sum(record['optimized'] for record in history), 0)
+
+    def test_save_and_load(self):
+        initial_probs, transition_probs, score = tune_probabilities(**dict(_ARGUMENTS, n_generations=1))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'probs.json')
+            save_probabilities(path, initial_probs, transition_probs, score)
+            self.assertEqual(load_probabilities(path), (initial_probs, transition_probs))
+
+    def test_save_and_load_other_number_of_transformers(self):
+        initial_probs = [1 for i in range(7)]
+        transition_probs = flat_probs_to_matrix([1 for i in range(42)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'probs.json')
+            save_probabilities(path, initial_probs, transition_probs)
+            self.assertEqual(load_probabilities(path), (initial_probs, transition_probs))
+            with self.assertRaises(ValueError):
+                load_probabilities(path, registry=DEFAULT_REGISTRY)
+            with open(path, 'w') as file:
+                json.dump({'initial_probs': initial_probs, 'transition_probs': transition_probs[:6]}, file)
+            with self.assertRaises(ValueError):
+                load_probabilities(path)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            tune_probabilities(**dict(_ARGUMENTS, n_elite=5))
+        with self.assertRaises(ValueError):
+            tune_probabilities(**dict(_ARGUMENTS, backend='numpy'))
+
+if __name__ == '__main__':
+    unittest.main()
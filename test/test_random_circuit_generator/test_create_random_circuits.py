@@ -0,0 +1,32 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuits
+
+class TestCreateRandomCircuits(unittest.TestCase):
+
+    def test_seed(self):
+        circuits = list(create_random_circuits(5, 30, n_circuits=3, seed=1))
+        self.assertEqual(len(circuits), 3)
+        self.assertEqual(circuits, list(create_random_circuits(5, 30, n_circuits=3, seed=1)))
+        self.assertNotEqual(circuits[0], circuits[1])
+
+    def test_gates_and_qubits(self):
+        circuit = next(create_random_circuits(5, 50, seed=2))
+        self.assertTrue(set(circuit.all_qubits()) <= set(cirq.LineQubit.range(6)))
+        for operation in circuit.all_operations():
+            self.assertIn(operation.gate, [cirq.H, cirq.CNOT])
+
+    def test_template_distribution(self):
+        n_qubits = 6
+        n_circuits = 5
+        n_templates = 2000
+        circuits = create_random_circuits(n_qubits, n_templates, n_circuits=n_circuits, seed=3)
+        mean_n_cnots = (2 + n_qubits) / 2
+        n_hadamards = n_circuits * n_templates / 6 * (2 + 4 + 2 * mean_n_cnots)
+        n_cnots = n_circuits * n_templates / 6 * (1 + 2 + 1 + 2 * mean_n_cnots)
+        gates = [operation.gate for circuit in circuits for operation in circuit.all_operations()]
+        self.assertAlmostEqual(gates.count(cirq.H) / n_hadamards, 1, delta=0.05)
+        self.assertAlmostEqual(gates.count(cirq.CNOT) / n_cnots, 1, delta=0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,14 @@ class TestCnotToHadamardsAndCnot(unittest.TestCase):
             
         self.assertEqual(circuit, expected_circuit)
 
+    def test_reuses_moments_without_cnots(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit.from_moments(cirq.Moment([cirq.H(qubits[0])]), cirq.Moment(),
+                                            cirq.Moment([cirq.CNOT(qubits[0], qubits[1])]))
+        new_circuit = cnot_to_hadamards_and_cnot(circuit)
+        self.assertEqual(len(new_circuit), 4)
+        self.assertIs(new_circuit[0], circuit[0])
+
     def test_does_not_change_effect_of_circuit(self):
         n_qubits = 5
         n_templates = 30
@@ -0,0 +1,98 @@
+import unittest
+import cirq
+from src.beam_search import beam_search
+from src.functions import (FanoutCNOT, create_cnot_with_multiple_targets, flat_probs_to_matrix,
+                           is_cnot_with_multiple_targets, with_fanout_cnots, without_fanout_cnots)
+from src.optimizer import optimize
+from src.random_circuit_generator import create_random_circuits
+from src.stats import OptimizerStats
+from src import transformers
+
+def _fanout_cnots(circuit):
+    return [operation for operation in circuit.all_operations() if type(operation) is FanoutCNOT]
+
+class TestFanoutCNOT(unittest.TestCase):
+
+    def test_equals_cirq_operation(self):
+        qubits = cirq.LineQubit.range(4)
+        fanout_cnot = FanoutCNOT(qubits[0], (qubits[3], qubits[1], qubits[2]))
+        product = cirq.X(qubits[3]) * cirq.X(qubits[1]) * cirq.X(qubits[2])
+        cirq_operation = product.controlled_by(qubits[0])
+        for operation in (fanout_cnot, create_cnot_with_multiple_targets([qubits[3], qubits[1], qubits[2]], qubits[0])):
+            self.assertEqual(operation, cirq_operation)
+            self.assertEqual(hash(operation), hash(cirq_operation))
+            self.assertEqual(operation.qubits, cirq_operation.qubits)
+            self.assertTrue(is_cnot_with_multiple_targets(operation))
+        self.assertEqual(fanout_cnot.target_qubits, (qubits[3], qubits[1], qubits[2]))
+        cirq.testing.assert_allclose_up_to_global_phase(cirq.unitary(fanout_cnot), cirq.unitary(cirq_operation),
+                                                        atol=1e-8)
+
+    def test_conversions(self):
+        qubits = cirq.LineQubit.range(4)
+        circuit = cirq.Circuit([cirq.Moment(cirq.H(qubits[0])),
+                                cirq.Moment(create_cnot_with_multiple_targets(qubits[1:], qubits[0])),
+                                cirq.Moment(cirq.CNOT(qubits[1], qubits[2]))])
+        fanout_circuit = with_fanout_cnots(circuit)
+        self.assertEqual(fanout_circuit, circuit)
+        self.assertEqual(len(_fanout_cnots(fanout_circuit)), 1)
+        self.assertIs(fanout_circuit[0], circuit[0])
+        self.assertIs(with_fanout_cnots(fanout_circuit), fanout_circuit)
+        standard_circuit = without_fanout_cnots(fanout_circuit)
+        self.assertEqual(standard_circuit, circuit)
+        self.assertEqual(_fanout_cnots(standard_circuit), [])
+        self.assertEqual(cirq.read_json(json_text=cirq.to_json(standard_circuit)), circuit)
+        self.assertIs(without_fanout_cnots(circuit), circuit)
+
+    def test_keeps_multi_control_and_0_controlled_cnots(self):
+        qubits = cirq.LineQubit.range(4)
+        operations = [cirq.ControlledOperation(qubits[:2], cirq.PauliString({qubits[2]: cirq.X})),
+                      cirq.ControlledOperation(qubits[:2], cirq.PauliString({qubit: cirq.X for qubit in qubits[2:]})),
+                      cirq.ControlledOperation(qubits[:1], cirq.PauliString({qubit: cirq.X for qubit in qubits[1:]}),
+                                               control_values=[0])]
+        for operation in operations:
+            with self.subTest(operation=operation):
+                circuit = cirq.Circuit(operation, cirq.H(qubits[0]))
+                self.assertIs(with_fanout_cnots(circuit), circuit)
+                opt_circuit = optimize(circuit, [1] * 6, flat_probs_to_matrix([1] * 30), n_iter=20,
+                                       n_opt_circuits=3, seed=0, backend='cirq')
+                cirq.testing.assert_allclose_up_to_global_phase(cirq.unitary(opt_circuit), cirq.unitary(circuit),
+                                                                atol=1e-8)
+
+    def test_transformers_create_fanout_cnots(self):
+        qubits = cirq.LineQubit.range(4)
+        circuit = transformers._combine_cnots(cirq.Circuit(cirq.CNOT(qubits[0], qubit) for qubit in qubits[1:]))
+        self.assertEqual(len(_fanout_cnots(circuit)), 1)
+        self.assertEqual(circuit, cirq.Circuit(create_cnot_with_multiple_targets(qubits[1:], qubits[0])))
+        self.assertEqual(transformers._combine_cnots.__name__, '_combine_cnots')
+        stats = OptimizerStats()
+        stats.start_chain(circuit)
+        stats.apply(transformers._combine_cnots, circuit)
+        self.assertEqual(list(stats.transformers), ['combine_cnots'])
+
+    def test_public_transformers_return_cirq_operations(self):
+        circuit = next(create_random_circuits(6, 40, seed=3))
+        for transformer in (transformers.combine_cnots_with_controls_surrounded_by_hadamards,
+                            transformers.remove_double_hadamards, transformers.remove_double_cnots,
+                            transformers.combine_cnots, transformers.cnot_to_hadamards_and_cnot,
+                            transformers.hadamards_and_cnot_to_cnot):
+            with self.subTest(transformer=transformer.__name__):
+                for input_circuit in (circuit, with_fanout_cnots(transformers._combine_cnots(circuit))):
+                    mutated_circuit = transformer(input_circuit)
+                    self.assertEqual(_fanout_cnots(mutated_circuit), [])
+                    self.assertEqual(cirq.read_json(json_text=cirq.to_json(mutated_circuit)), mutated_circuit)
+
+    def test_optimizers_return_cirq_operations(self):
+        circuit = with_fanout_cnots(transformers._combine_cnots(next(create_random_circuits(6, 40, seed=3))))
+        self.assertTrue(_fanout_cnots(circuit))
+        opt_circuits = [optimize(circuit, [1] * 6, flat_probs_to_matrix([1] * 30), n_iter=20, n_opt_circuits=3,
+                                 seed=0, n_workers=n_workers) for n_workers in (1, 2)]
+        opt_circuits.append(beam_search(circuit, depth=5))
+        for opt_circuit in opt_circuits:
+            self.assertEqual(_fanout_cnots(opt_circuit), [])
+            self.assertEqual(cirq.read_json(json_text=cirq.to_json(opt_circuit)), opt_circuit)
+            cirq.testing.assert_circuits_with_terminal_measurements_are_equivalent(actual=opt_circuit,
+                                                                                   reference=circuit)
+        self.assertEqual(opt_circuits[0], opt_circuits[1])
+
+if __name__ == '__main__':
+    unittest.main()
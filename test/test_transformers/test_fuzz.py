@@ -0,0 +1,70 @@
+import unittest
+import cirq
+from src import transformers
+from src.fuzz import check_schedule, fuzz_transformers, shrink_failure
+from src.random_circuit_generator import create_random_circuits
+from src.registry import TransformerRegistry
+
+def remove_hadamard_pairs_across_gates(circuit):
+    """Wrong version of remove_double_hadamards that removes pairs of consecutive Hadamards on
+    a qubit even if another gate acts on the qubit between them
+    """
+    removed = set()
+    for qubit in sorted(circuit.all_qubits()):
+        hadamards = [(moment_ind, op) for moment_ind, moment in enumerate(circuit) for op in moment
+                     if op.qubits == (qubit,)]
+        removed.update(hadamards[:len(hadamards) // 2 * 2])
+    return cirq.Circuit(cirq.Moment(op for op in moment if (moment_ind, op) not in removed)
+                        for moment_ind, moment in enumerate(circuit))
+
+def count_hadamard_pairs_across_gates(circuit, wire_index=None):
+    """Match counter of remove_hadamard_pairs_across_gates"""
+    return sum(1 for moment in circuit for op in moment if len(op.qubits) == 1) // 2
+
+def _registry(wrong):
+    registry = TransformerRegistry()
+    registry.register('remove_double_hadamards',
+                      {'cirq': remove_hadamard_pairs_across_gates if wrong else transformers.remove_double_hadamards},
+                      {'cirq': count_hadamard_pairs_across_gates if wrong else transformers.count_double_hadamards})
+    registry.register('combine_cnots', {'cirq': transformers.combine_cnots},
+                      {'cirq': transformers.count_combinable_cnots})
+    return registry
+
+class TestFuzz(unittest.TestCase):
+
+    def test_no_failures_in_transformers(self):
+        self.assertEqual(fuzz_transformers(n_circuits=20, n_qubits=4, n_templates=8, seed=1), [])
+
+    def test_check_schedule(self):
+        q0, q1 = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit(cirq.H(q0), cirq.CNOT(q0, q1), cirq.H(q0))
+        self.assertIsNone(check_schedule(circuit, [0, 1], backend='cirq', registry=_registry(False)))
+        failure = check_schedule(circuit, [1, 0], backend='cirq', registry=_registry(True))
+        self.assertEqual((failure['kind'], failure['step'], failure['transformer']),
+                         ('not_equivalent', 1, 'remove_double_hadamards'))
+
+    def test_failures_are_shrunk(self):
+        registry = _registry(True)
+        failures = fuzz_transformers(n_circuits=10, n_qubits=4, n_templates=10, seed=0, registry=registry)
+        self.assertTrue(failures)
+        for failure in failures:
+            self.assertEqual(failure['kind'], 'not_equivalent')
+            self.assertEqual(failure['transformer'], 'remove_double_hadamards')
+            # two Hadamards on a qubit with a CNOT on the qubit between them
+            self.assertEqual(failure['schedule'], [0])
+            self.assertEqual(sum(len(moment) for moment in failure['circuit']), 3)
+            self.assertIsNotNone(check_schedule(failure['circuit'], failure['schedule'], 'cirq', registry))
+        self.assertEqual([(failure['circuit_ind'], failure['circuit']) for failure in failures],
+                         [(failure['circuit_ind'], failure['circuit']) for failure in
+                          fuzz_transformers(n_circuits=10, n_qubits=4, n_templates=10, seed=0, registry=registry,
+                                            n_workers=2)])
+
+    def test_shrink_failure_errors(self):
+        circuit = next(create_random_circuits(3, 5, seed=0))
+        with self.assertRaises(ValueError):
+            shrink_failure(circuit, [0], backend='cirq', registry=_registry(False))
+        with self.assertRaises(ValueError):
+            fuzz_transformers(n_circuits=1, backends=['worklist'], registry=_registry(False))
+
+if __name__ == '__main__':
+    unittest.main()
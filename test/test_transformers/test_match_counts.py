@@ -0,0 +1,73 @@
+import random
+import unittest
+import cirq
+from src.random_circuit_generator import (
+    add_two_hadamards,
+    add_cnot,
+    add_two_cnots,
+    add_cnots_with_different_targets,
+    add_hadamards_and_cnot,
+    add_hadamards_and_cnots_with_different_targets,
+    create_random_circuit
+)
+from src.compact_circuit import CompactCircuit
+from src.functions import circuit_fingerprint
+from src import transformers
+from src import compact_transformers
+
+# (template adder, transformer name, match counter name) of each identity
+_IDENTITIES = [
+    (add_hadamards_and_cnots_with_different_targets, 'combine_cnots_with_controls_surrounded_by_hadamards',
+     'count_combinable_cnots_with_controls_surrounded_by_hadamards'),
+    (add_two_hadamards, 'remove_double_hadamards', 'count_double_hadamards'),
+    (add_two_cnots, 'remove_double_cnots', 'count_double_cnots'),
+    (add_cnots_with_different_targets, 'combine_cnots', 'count_combinable_cnots'),
+    (add_cnot, 'cnot_to_hadamards_and_cnot', 'count_cnots'),
+    (add_hadamards_and_cnot, 'hadamards_and_cnot_to_cnot', 'count_cnots_surrounded_by_hadamards')
+]
+
+class TestMatchCounts(unittest.TestCase):
+
+    def test_template_is_matched(self):
+        qubits = cirq.LineQubit.range(5)
+        for add_template, transformer_name, counter_name in _IDENTITIES:
+            with self.subTest(transformer=transformer_name):
+                circuit = add_template(cirq.Circuit(), qubits)
+                self.assertGreater(getattr(transformers, counter_name)(circuit), 0)
+                self.assertGreater(getattr(compact_transformers, counter_name)(CompactCircuit.from_circuit(circuit)), 0)
+
+    def test_no_matches_in_empty_circuit(self):
+        for _, transformer_name, counter_name in _IDENTITIES:
+            with self.subTest(transformer=transformer_name):
+                self.assertEqual(getattr(transformers, counter_name)(cirq.Circuit()), 0)
+                self.assertEqual(getattr(compact_transformers, counter_name)(CompactCircuit.from_circuit(cirq.Circuit())), 0)
+
+    def test_zero_matches_means_unchanged_circuit(self):
+        for i in range(20):
+            circuit = create_random_circuit(random.randint(2, 5), random.randint(1, 10))
+            compact_circuit = CompactCircuit.from_circuit(circuit)
+            for j in range(8):
+                for _, transformer_name, counter_name in _IDENTITIES:
+                    if getattr(transformers, counter_name)(circuit) == 0:
+                        self.assertEqual(getattr(transformers, transformer_name)(circuit), circuit)
+                    if getattr(compact_transformers, counter_name)(compact_circuit) == 0:
+                        opt_compact_circuit = getattr(compact_transformers, transformer_name)(compact_circuit)
+                        self.assertEqual(circuit_fingerprint(opt_compact_circuit),
+                                         circuit_fingerprint(compact_circuit))
+
+                transformer_name = random.choice(_IDENTITIES)[1]
+                circuit = getattr(transformers, transformer_name)(circuit)
+                compact_circuit = getattr(compact_transformers, transformer_name)(compact_circuit)
+
+    def test_empty_moments_are_matches_of_transformers_that_drop_them(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit.from_moments(cirq.Moment([cirq.H(qubits[0])]), cirq.Moment(),
+                                            cirq.Moment([cirq.CNOT(qubits[0], qubits[1])]))
+        self.assertEqual(transformers.count_double_hadamards(circuit), 1)
+        self.assertEqual(transformers.count_combinable_cnots(circuit), 0)
+        self.assertEqual(transformers.count_cnots(circuit), 2)
+        self.assertEqual(len(transformers.remove_double_hadamards(circuit)), 2)
+        self.assertEqual(compact_transformers.count_double_hadamards(CompactCircuit.from_circuit(circuit)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
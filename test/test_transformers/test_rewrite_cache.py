@@ -0,0 +1,33 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuit
+from src import transformers
+
+class TestRewriteCache(unittest.TestCase):
+
+    def tearDown(self):
+        transformers.set_rewrite_cache_size(transformers._DEFAULT_REWRITE_CACHE_SIZE)
+
+    def test_rewritten_operations_are_shared(self):
+        qubits = cirq.LineQubit.range(2)
+        circuit = cirq.Circuit([cirq.CNOT(qubits[0], qubits[1])])
+        first_circuit = transformers.cnot_to_hadamards_and_cnot(circuit)
+        second_circuit = transformers.cnot_to_hadamards_and_cnot(circuit)
+        self.assertEqual(first_circuit, second_circuit)
+        self.assertIs(first_circuit[1].operations[0], second_circuit[1].operations[0])
+
+    def test_cache_size_does_not_change_result(self):
+        circuit = create_random_circuit(5, 40)
+        functions = [
+            transformers.combine_cnots_with_controls_surrounded_by_hadamards,
+            transformers.combine_cnots,
+            transformers.cnot_to_hadamards_and_cnot,
+            transformers.hadamards_and_cnot_to_cnot
+        ]
+        cached_circuits = [function(circuit) for function in functions]
+        transformers.set_rewrite_cache_size(0)
+        for function, cached_circuit in zip(functions, cached_circuits):
+            self.assertEqual(function(circuit), cached_circuit)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import unittest
+import random
+import sys
+import time
+from src.random_circuit_generator import create_random_circuit
+from src.transformers import (
+    remove_double_hadamards,
+    combine_cnots,
+    remove_double_cnots,
+    hadamards_and_cnot_to_cnot,
+    cnot_to_hadamards_and_cnot,
+    combine_cnots_with_controls_surrounded_by_hadamards
+)
+
+def _best_time(transformer, circuit, n_repeats=3):
+    """Returns the shortest CPU time of n_repeats applications of the transformer"""
+    best_time = float('inf')
+    for i in range(n_repeats):
+        start_time = time.process_time()
+        transformer(circuit)
+        best_time = min(best_time, time.process_time() - start_time)
+
+    return best_time
+
+def _call_count(transformer, circuit):
+    """Returns the number of Python and C function calls of one application of the transformer"""
+    n_calls = 0
+
+    def profile(frame, event, arg):
+        nonlocal n_calls
+        if event in ('call', 'c_call'):
+            n_calls += 1
+
+    sys.setprofile(profile)
+    try:
+        transformer(circuit)
+    finally:
+        sys.setprofile(None)
+    return n_calls
+
+class TestTransformerScaling(unittest.TestCase):
+    """Applies each transformer to a circuit and to a four times larger one. A linear
+    transformer does about four times more work on the larger circuit and a quadratic one
+    about sixteen times, so the ratio is required to stay below eight.
+    """
+
+    def setUp(self):
+        random.seed(0)
+        self.small_circuit = create_random_circuit(20, 100)
+        self.large_circuit = create_random_circuit(20, 400)
+        self.max_ratio = 8
+        self.transformers = [
+            remove_double_hadamards,
+            combine_cnots,
+            remove_double_cnots,
+            hadamards_and_cnot_to_cnot,
+            cnot_to_hadamards_and_cnot,
+            combine_cnots_with_controls_surrounded_by_hadamards
+        ]
+
+    def test_transformer_calls_scale_linearly(self):
+        # function calls do not depend on the load of the machine, but work done inside C
+        # functions, like scanning a list of tuples, is not counted
+        for transformer in self.transformers:
+            with self.subTest(transformer=transformer.__name__):
+                small_count = _call_count(transformer, self.small_circuit)
+                large_count = _call_count(transformer, self.large_circuit)
+                self.assertLess(large_count / small_count, self.max_ratio)
+
+    @unittest.skipUnless(os.environ.get('RUN_TIMING_TESTS'), "timing tests run only with RUN_TIMING_TESTS=1")
+    def test_transformers_scale_linearly(self):
+        for transformer in self.transformers:
+            with self.subTest(transformer=transformer.__name__):
+                small_time = _best_time(transformer, self.small_circuit)
+                large_time = _best_time(transformer, self.large_circuit)
+                self.assertLess(large_time / small_time, self.max_ratio)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import cirq
+from src.random_circuit_generator import create_random_circuit
+from src.wire_index import WireIndex
+
+class TestWireIndex(unittest.TestCase):
+
+    def test_matches_circuit_queries(self):
+        circuit = create_random_circuit(5, 30)
+        wire_index = WireIndex(circuit)
+        qubits = sorted(circuit.all_qubits())
+        for moment_ind in range(len(circuit) + 1):
+            for qubit in qubits:
+                self.assertEqual(wire_index.next_moment_operating_on([qubit], moment_ind),
+                                 circuit.next_moment_operating_on([qubit], moment_ind))
+                self.assertEqual(wire_index.prev_moment_operating_on([qubit], moment_ind),
+                                 circuit.prev_moment_operating_on([qubit], moment_ind))
+
+            self.assertEqual(wire_index.next_moment_operating_on(qubits[:2], moment_ind),
+                             circuit.next_moment_operating_on(qubits[:2], moment_ind))
+            self.assertEqual(wire_index.prev_moment_operating_on(qubits[1:3], moment_ind),
+                             circuit.prev_moment_operating_on(qubits[1:3], moment_ind))
+            self.assertEqual(wire_index.next_moments_operating_on(qubits, moment_ind),
+                             circuit.next_moments_operating_on(qubits, moment_ind))
+
+    def test_operation_at(self):
+        qubits = cirq.LineQubit.range(3)
+        circuit = cirq.Circuit([cirq.H(qubits[0]), cirq.CNOT(qubits[1], qubits[2])])
+        wire_index = WireIndex(circuit)
+        self.assertEqual(wire_index.operation_at(qubits[2], 0), cirq.CNOT(qubits[1], qubits[2]))
+        self.assertIsNone(wire_index.operation_at(qubits[0], 1))
+
+if __name__ == '__main__':
+    unittest.main()